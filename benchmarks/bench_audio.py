@@ -0,0 +1,99 @@
+"""Benchmark streaming audio normalization and noise suppression.
+
+Usage:
+    python -m benchmarks.bench_audio [--seconds 60] [--model models/vosk-model-small-en-us-0.15]
+
+Synthetic audio is generated in each archive format and pushed through
+``AudioNormalizer`` in 4000-frame chunks. With ``--model``, the normalized
+audio is also decoded by Vosk so the normalization cost can be read as a
+fraction of decoding. Noise suppression is timed on 16 kHz mono audio in
+1024-sample capture chunks and reported as a share of one core.
+"""
+import argparse
+import time
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from src.audio import AudioNormalizer, NoiseSuppressor
+
+# (label, sample rate, channels, bytes per sample)
+FORMATS = [
+    ("8 kHz 16-bit mono", 8000, 1, 2),
+    ("16 kHz 16-bit mono", 16000, 1, 2),
+    ("44.1 kHz 16-bit stereo", 44100, 2, 2),
+    ("48 kHz 24-bit stereo", 48000, 2, 3),
+    ("48 kHz 32-bit mono", 48000, 1, 4),
+]
+
+def synth_pcm(rate: int, channels: int, sampwidth: int, seconds: float) -> bytes:
+    """Speech-like test signal: a gliding tone with noise, in the given PCM layout."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(rate * seconds)) / rate
+    audio = 0.3 * np.sin(2 * np.pi * (200 + 100 * np.sin(2 * np.pi * 0.5 * t)) * t)
+    audio += 0.02 * rng.standard_normal(len(t))
+    audio = np.repeat(audio[:, None], channels, axis=1).ravel()
+    if sampwidth == 1:
+        return (audio * 127 + 128).astype(np.uint8).tobytes()
+    scaled = (audio * (2 ** (8 * sampwidth - 1) - 1)).astype("<i4")
+    if sampwidth == 3:
+        return scaled.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return scaled.astype("<i2" if sampwidth == 2 else "<i4").tobytes()
+
+def normalize(data: bytes, rate: int, channels: int, sampwidth: int,
+              chunk_frames: int = 4000) -> bytes:
+    normalizer = AudioNormalizer(rate, channels, sampwidth, 16000)
+    step = chunk_frames * channels * sampwidth
+    return b"".join(normalizer.process(data[i:i + step]) for i in range(0, len(data), step))
+
+def decode_seconds(model_path: str, audio: bytes) -> float:
+    from src.stt import SpeechToText
+    stt = SpeechToText(model_path=model_path, sample_rate=16000)
+    start = time.perf_counter()
+    for _ in stt.stream_audio(audio[i:i + 8000] for i in range(0, len(audio), 8000)):
+        pass
+    return time.perf_counter() - start
+
+def denoise_seconds(data: bytes, chunk_samples: int = 1024) -> float:
+    suppressor = NoiseSuppressor(16000)
+    step = chunk_samples * 2
+    start = time.perf_counter()
+    for i in range(0, len(data), step):
+        suppressor.process(data[i:i + step])
+    suppressor.flush()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio preprocessing benchmark")
+    parser.add_argument('--seconds', type=float, default=60.0, help='Audio length per format')
+    parser.add_argument('--model', default=None, help='Vosk model to time decoding against')
+    args = parser.parse_args()
+
+    table = Table(title=f"Normalization of {args.seconds:.0f}s of audio to 16 kHz mono")
+    for column in ("Format", "Seconds", "x real time"):
+        table.add_column(column)
+    if args.model:
+        table.add_column("% of decode")
+
+    for label, rate, channels, sampwidth in FORMATS:
+        data = synth_pcm(rate, channels, sampwidth, args.seconds)
+        start = time.perf_counter()
+        audio = normalize(data, rate, channels, sampwidth)
+        elapsed = time.perf_counter() - start
+        row = [label, f"{elapsed:.3f}", f"{args.seconds / max(elapsed, 1e-9):.0f}"]
+        if args.model:
+            row.append(f"{100 * elapsed / decode_seconds(args.model, audio):.1f}")
+        table.add_row(*row)
+
+    elapsed = denoise_seconds(synth_pcm(16000, 1, 2, args.seconds))
+    denoise = Table(title=f"Noise suppression of {args.seconds:.0f}s of 16 kHz mono")
+    for column in ("Seconds", "x real time", "% of one core"):
+        denoise.add_column(column)
+    denoise.add_row(f"{elapsed:.3f}", f"{args.seconds / max(elapsed, 1e-9):.0f}",
+                    f"{100 * elapsed / args.seconds:.2f}")
+
+    console = Console()
+    console.print(table)
+    console.print(denoise)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Find how many real-time streams the transcription server sustains per core.
+
+Usage:
+    python -m benchmarks.load_server [--model models/vosk-model-small-en-us-0.15]
+                                     [--wav speech.wav] [--workers 4] [--url ws://host:port]
+
+Each client streams the audio at real-time pace in ``--chunk-ms`` messages,
+then sends ``{"eof": 1}`` and waits for the final result. A load level passes
+when no client is refused, every chunk is sent within ``--max-lag`` of its
+real-time schedule (the server applies backpressure when it falls behind), and
+every final result arrives within ``--max-lag`` of the end of the audio. The
+number of clients is doubled until a level fails, then bisected.
+
+Without ``--url`` the server runs in this process with ``--workers`` decoding
+threads. Pass ``--url`` to load a server started with ``--mode server`` and
+give ``--workers`` so the per-core figure is right. Use real speech with
+``--wav``: the generated tone decodes faster than speech does.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from rich.console import Console
+from rich.table import Table
+from websockets.asyncio.client import connect
+from websockets.exceptions import InvalidStatus
+from benchmarks.bench_audio import synth_pcm
+from src.audio import open_wav, read_normalized
+
+RATE = 16000
+
+async def stream_client(url: str, audio: bytes, chunk_ms: int, delay: float) -> dict:
+    """Stream ``audio`` in real time and time the server's responses."""
+    await asyncio.sleep(delay)
+    step = RATE * chunk_ms // 1000 * 2
+    try:
+        async with connect(url) as websocket:
+            async def receive():
+                finals = 0
+                async for message in websocket:
+                    finals += json.loads(message)["type"] == "final"
+                return finals
+
+            receiver = asyncio.create_task(receive())
+            start = time.perf_counter()
+            send_lag = 0.0
+            for i in range(0, len(audio), step):
+                due = start + i / 2 / RATE
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                await websocket.send(audio[i:i + step])
+                send_lag = max(send_lag, time.perf_counter() - due)
+            eof = time.perf_counter()
+            await websocket.send(json.dumps({"eof": 1}))
+            finals = await receiver
+            return {"rejected": False, "send_lag": send_lag,
+                    "final_lag": time.perf_counter() - eof, "finals": finals}
+    except InvalidStatus:
+        return {"rejected": True}
+
+async def run_level(url: str, clients: int, audio: bytes, chunk_ms: int, max_lag: float) -> dict:
+    # Stagger starts across one chunk so sends don't all land together
+    delays = [i * chunk_ms / 1000 / clients for i in range(clients)]
+    results = await asyncio.gather(*(stream_client(url, audio, chunk_ms, d) for d in delays))
+    served = [r for r in results if not r["rejected"]]
+    level = {
+        "clients": clients,
+        "rejected": len(results) - len(served),
+        "send_lag": max((r["send_lag"] for r in served), default=0.0),
+        "final_lag": max((r["final_lag"] for r in served), default=0.0),
+    }
+    level["ok"] = (not level["rejected"] and level["send_lag"] <= max_lag
+                   and level["final_lag"] <= max_lag)
+    return level
+
+async def find_capacity(url: str, audio: bytes, chunk_ms: int, max_lag: float,
+                        limit: int, console: Console) -> tuple:
+    levels = []
+
+    async def attempt(clients):
+        level = await run_level(url, clients, audio, chunk_ms, max_lag)
+        levels.append(level)
+        console.print(f"{clients:4d} streams: send lag {level['send_lag']:.3f}s, "
+                      f"final lag {level['final_lag']:.3f}s, rejected {level['rejected']} "
+                      f"-> {'ok' if level['ok'] else 'behind'}")
+        return level["ok"]
+
+    good, bad = 0, None
+    clients = 1
+    while clients <= limit:
+        if not await attempt(clients):
+            bad = clients
+            break
+        good = clients
+        clients *= 2
+    while bad is not None and bad - good > 1:
+        middle = (good + bad) // 2
+        if await attempt(middle):
+            good = middle
+        else:
+            bad = middle
+    return good, levels
+
+def load_audio(wav: Path, seconds: float) -> bytes:
+    if wav is None:
+        return synth_pcm(RATE, 1, 2, seconds)
+    with open_wav(wav) as wf:
+        return b"".join(read_normalized(wf, RATE))
+
+async def main_async(args, console: Console) -> int:
+    audio = load_audio(args.wav, args.seconds)
+    workers = args.workers or os.cpu_count()
+    server = None
+    url = args.url
+    if url is None:
+        from src.server import TranscriptionServer
+        from src.stt import get_recognizer_pool
+        if not Path(args.model).exists():
+            console.print(f"[red]Vosk model not found: {args.model}[/]")
+            return 1
+        transcription = TranscriptionServer(get_recognizer_pool(args.model, RATE),
+                                            workers=workers, max_sessions=args.limit)
+        server = await transcription.start("127.0.0.1", 0)
+        url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    try:
+        capacity, levels = await find_capacity(url, audio, args.chunk_ms, args.max_lag,
+                                               args.limit, console)
+    finally:
+        if server:
+            server.close()
+            await server.wait_closed()
+            transcription.close()
+
+    table = Table(title=f"Real-time streams ({len(audio) / 2 / RATE:.0f}s audio, "
+                        f"{args.chunk_ms} ms chunks, max lag {args.max_lag}s)")
+    for column in ("Streams", "Send lag (s)", "Final lag (s)", "Rejected", ""):
+        table.add_column(column)
+    for level in sorted(levels, key=lambda level: level["clients"]):
+        table.add_row(str(level["clients"]), f"{level['send_lag']:.3f}",
+                      f"{level['final_lag']:.3f}", str(level["rejected"]),
+                      "ok" if level["ok"] else "[red]behind[/]")
+    console.print(table)
+    console.print(f"Max concurrent real-time streams: {capacity} "
+                  f"on {workers} workers = [bold]{capacity / workers:.1f} per core[/]")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcription server load test")
+    parser.add_argument('--model', default='models/vosk-model-small-en-us-0.15',
+                        help='Vosk model for the in-process server')
+    parser.add_argument('--url', default=None, help='Load an already running server instead')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Server decoding threads (default: CPU count)')
+    parser.add_argument('--wav', type=Path, default=None,
+                        help='Audio each client streams (default: generated tone)')
+    parser.add_argument('--seconds', type=float, default=20.0, help='Length of generated audio')
+    parser.add_argument('--chunk-ms', type=int, default=100, help='Audio per message')
+    parser.add_argument('--max-lag', type=float, default=0.5,
+                        help='Largest acceptable delay behind real time, in seconds')
+    parser.add_argument('--limit', type=int, default=256, help='Most streams to try')
+    args = parser.parse_args()
+    return asyncio.run(main_async(args, Console()))
+
+if __name__ == "__main__":
+    exit(main())
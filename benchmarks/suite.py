@@ -0,0 +1,358 @@
+"""Offline benchmark suite for STT, LLM and end-to-end latency.
+
+Usage:
+    python -m benchmarks.suite [--stt-model models/vosk-model-small-en-us-0.15]
+                               [--llm-model PATH] [--replay conversation.wav]
+                               [--output results.json] [--baseline baseline.json]
+
+Nothing is downloaded:
+- STT: transcribes generated WAVs (or ``--wav-dir``) with the local Vosk
+  model and reports real-time factor and peak memory. It is skipped when the
+  model is missing.
+- LLM: times ``NLPHandler`` prefill, decode and per-turn latency on a tiny
+  random LLaMA built on the spot (or ``--llm-model``).
+- End to end: replays audio in real time through ``AIAssistant.run``, with
+  the microphone and TTS replaced by stand-ins. It reports latency from the
+  end of each utterance to the first spoken reply. Without a Vosk model, a
+  scripted recognizer stands in for STT.
+
+Results are written as JSON. With ``--baseline`` they are compared
+metric-by-metric against a previous run.
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from benchmarks.bench_audio import synth_pcm
+from benchmarks.tiny_lm import build_tiny_lm
+
+console = Console()
+
+TRANSCRIPTS = ["what time is it", "tell me a joke", "what is the weather like",
+               "repeat that please", "thank you"]
+
+def write_wav(path: Path, pcm: bytes, rate: int, channels: int = 1, sampwidth: int = 2) -> Path:
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return path
+
+def synth_conversation(path: Path, utterances: int = 5, speech_s: float = 1.5,
+                       pause_s: float = 3.0, rate: int = 16000) -> Path:
+    """Alternate speech-like bursts with quiet pauses, starting with a pause."""
+    rng = np.random.default_rng(0)
+    speech = np.frombuffer(synth_pcm(rate, 1, 2, speech_s), dtype=np.int16)
+    parts = []
+    for _ in range(utterances):
+        parts.append(rng.normal(0, 30, int(pause_s * rate)).astype(np.int16))
+        parts.append(speech)
+    parts.append(rng.normal(0, 30, int(pause_s * rate)).astype(np.int16))
+    return write_wav(path, np.concatenate(parts).tobytes(), rate)
+
+def speech_ends(wav_file: Path) -> List[float]:
+    """Times (s) at which each utterance's speech stops, found with the VAD."""
+    from src.vad import VoiceActivityDetector
+    with wave.open(str(wav_file), "rb") as wf:
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    vad = VoiceActivityDetector(sample_rate=rate)
+    energy, _ = vad.frame_features(audio[:len(audio) // vad.frame_len * vad.frame_len])
+    ends, in_speech = [], False
+    for i in range(len(energy)):
+        _, end_of_utterance = vad.process(audio[i * vad.frame_len:(i + 1) * vad.frame_len].tobytes())
+        in_speech = in_speech or vad.in_speech
+        if end_of_utterance:
+            # The VAD reports the end after its hangover; the user stopped earlier
+            ends.append((i + 1) * vad.frame_len / rate - vad.hangover_frames * vad.frame_len / rate)
+    return ends
+
+def peak_memory(fn):
+    """Run ``fn`` and return (result, seconds, traced peak MB, process max RSS MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result, elapsed, peak / 2 ** 20, max_rss
+
+def bench_stt(model_path: str, work: Path, wav_dir: Optional[Path] = None) -> dict:
+    """Real-time factor and memory of ``transcribe_wav``."""
+    from src.stt import SpeechToText
+    if not Path(model_path).exists():
+        return {"skipped": f"Vosk model not found: {model_path}"}
+
+    if wav_dir:
+        wavs = sorted(Path(wav_dir).glob("*.wav"))
+    else:
+        wavs = [write_wav(work / f"stt_{seconds}s.wav", synth_pcm(16000, 1, 2, seconds), 16000)
+                for seconds in (5, 30, 120)]
+        wavs.append(write_wav(work / "stt_44k_stereo.wav", synth_pcm(44100, 2, 2, 30), 44100, 2))
+
+    stt = SpeechToText(model_path=model_path)
+    files = {}
+    for wav_file in wavs:
+        with wave.open(str(wav_file), "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        _, elapsed, traced, rss = peak_memory(lambda: stt.transcribe_wav(str(wav_file)))
+        files[wav_file.name] = {"audio_s": duration, "seconds": elapsed, "rtf": elapsed / duration,
+                                "peak_traced_mb": traced, "max_rss_mb": rss}
+    return {
+        "rtf": statistics.median(f["rtf"] for f in files.values()),
+        "peak_traced_mb": max(f["peak_traced_mb"] for f in files.values()),
+        "max_rss_mb": max(f["max_rss_mb"] for f in files.values()),
+        "files": files,
+    }
+
+def bench_llm(model_path: str, backend: str, runs: int, turns: int = 5) -> dict:
+    """Prefill and decode throughput plus per-turn latency of ``NLPHandler``."""
+    import torch
+    from src.nlp import NLPHandler
+    torch.manual_seed(0)
+    nlp = NLPHandler(model_path, backend=backend, decoding="greedy")
+    nlp.max_new_tokens = 32
+    results = {"backend": backend}
+    results.update(nlp.benchmark(max_new_tokens=32, runs=runs))
+
+    latencies = []
+    for text in TRANSCRIPTS[:turns]:
+        start = time.perf_counter()
+        nlp.process_input(text)
+        latencies.append(time.perf_counter() - start)
+    results["turn_latency_s"] = statistics.median(latencies)
+    return results
+
+class ReplayMic:
+    """Microphone stand-in that plays back a WAV file in real time."""
+
+    def __init__(self, wav_file: Path, chunk_size: int = 1024):
+        with wave.open(str(wav_file), "rb") as wf:
+            self.rate = wf.getframerate()
+            self.audio = wf.readframes(wf.getnframes())
+        self.chunk_bytes = chunk_size * 2
+        self.recording = False
+        self.started = None
+        self._pos = 0
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / 2 / self.rate
+
+    def start_recording(self):
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop_recording(self):
+        self.recording = False
+
+    def finished(self) -> bool:
+        return self._pos >= len(self.audio)
+
+    def get_audio(self) -> Optional[bytes]:
+        if self.started is None or self.finished():
+            return None
+        # Release only the audio a real microphone would have captured by now
+        due = int((time.perf_counter() - self.started) * self.rate) * 2
+        if due - self._pos < self.chunk_bytes:
+            return None
+        data = self.audio[self._pos:self._pos + self.chunk_bytes]
+        self._pos += len(data)
+        return data
+
+class RecordingTTS:
+    """TTS stand-in that records when each sentence would start playing."""
+
+    def __init__(self):
+        self.spoken = []  # (perf_counter time, text)
+
+    def speak(self, text: str, wait: bool = False):
+        self.spoken.append((time.perf_counter(), text))
+        done = threading.Event()
+        done.set()
+        return done
+
+    def busy(self) -> bool:
+        return False
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+class ScriptedSTT:
+    """Recognizer stand-in that returns a scripted transcript per utterance."""
+
+    def __init__(self, transcripts: List[str]):
+        self.transcripts = list(transcripts)
+        self.last_utterance = {}
+        self._turn = 0
+
+    def transcribe_audio(self, audio_data: bytes) -> str:
+        return ""
+
+    def partial(self) -> str:
+        return ""
+
+    def finalize(self) -> str:
+        text = self.transcripts[self._turn % len(self.transcripts)]
+        self._turn += 1
+        return text
+
+def bench_e2e(stt_model: str, llm_model: str, backend: str, replay: Path, speculative: bool) -> dict:
+    """Replay audio through ``AIAssistant.run`` and time each reply."""
+    from src.main import AIAssistant
+    mic = ReplayMic(replay)
+    tts = RecordingTTS()
+    ends = speech_ends(replay)
+
+    assistant = AIAssistant(model_path=stt_model, llm_model=llm_model, llm_backend=backend,
+                            decoding="greedy", cache_responses=False)
+    assistant.console = Console(quiet=True)
+    assistant._components["mic"] = mic
+    assistant._components["tts"] = tts
+    stt_kind = "vosk"
+    if not Path(stt_model).exists():
+        assistant._components["stt"] = ScriptedSTT(TRANSCRIPTS)
+        stt_kind = "scripted"
+    assistant.nlp.max_new_tokens = 32
+
+    stop = threading.Event()
+
+    def watch():
+        # Stop once the audio is done and no reply has started for two seconds
+        while not mic.finished():
+            time.sleep(0.1)
+        last = time.perf_counter()
+        while time.perf_counter() - last < 2.0:
+            time.sleep(0.1)
+            if tts.spoken:
+                last = max(last, tts.spoken[-1][0])
+        stop.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    assistant.run(warm_up=False, speculative=speculative, stop_event=stop)
+
+    latencies = []
+    for end in ends:
+        end_time = mic.started + end
+        first = next((t for t, _ in tts.spoken if t >= end_time), None)
+        if first is not None:
+            latencies.append(first - end_time)
+    if not latencies:
+        return {"stt": stt_kind, "utterances": len(ends), "replies": 0}
+    return {
+        "stt": stt_kind,
+        "speculative": speculative,
+        "utterances": len(ends),
+        "replies": len(latencies),
+        "latency_p50_s": float(np.percentile(latencies, 50)),
+        "latency_p90_s": float(np.percentile(latencies, 90)),
+        "latency_p99_s": float(np.percentile(latencies, 99)),
+    }
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Print a comparison table; return False if any metric regressed."""
+    current, previous = flatten(results), flatten(baseline)
+    table = Table(title=f"Against baseline (tolerance {tolerance:.0%})")
+    for column in ("Metric", "Baseline", "Current", "Change", ""):
+        table.add_column(column)
+    ok = True
+    for name in sorted(set(current) & set(previous)):
+        if name.startswith("meta.") or not previous[name]:
+            continue
+        change = current[name] / previous[name] - 1
+        # Rates are better higher; times, ratios and memory are better lower
+        higher_is_better = "per_s" in name
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        table.add_row(name, f"{previous[name]:.4g}", f"{current[name]:.4g}", f"{change:+.1%}",
+                      "[red]regressed[/]" if regressed else "")
+    console.print(table)
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline STT, LLM and end-to-end benchmarks")
+    parser.add_argument('--stt-model', default='models/vosk-model-small-en-us-0.15',
+                        help='Local Vosk model (STT section is skipped if missing)')
+    parser.add_argument('--wav-dir', type=Path, default=None,
+                        help='Directory of WAV files to use instead of generated audio')
+    parser.add_argument('--llm-model', default=None,
+                        help='Local LLM path (default: build a tiny random LLaMA)')
+    parser.add_argument('--llm-backend', default='fp32', help='NLPHandler backend')
+    parser.add_argument('--runs', type=int, default=5, help='Timed LLM runs')
+    parser.add_argument('--replay', type=Path, default=None,
+                        help='Conversation WAV for the end-to-end replay (default: generated)')
+    parser.add_argument('--speculative', action='store_true',
+                        help='Replay with speculative generation enabled')
+    parser.add_argument('--sections', default='stt,llm,e2e', help='Comma-separated sections to run')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'),
+                        help='Where to write the JSON results')
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help='Previous results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative change that counts as a regression')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    sections = args.sections.split(',')
+
+    import torch
+    results = {"meta": {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "threads": torch.get_num_threads(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        llm_model = args.llm_model or str(build_tiny_lm(work / "tiny-lm"))
+        if "stt" in sections:
+            console.print("[blue]STT...[/]")
+            results["stt"] = bench_stt(args.stt_model, work, args.wav_dir)
+        if "llm" in sections:
+            console.print("[blue]LLM...[/]")
+            results["llm"] = bench_llm(llm_model, args.llm_backend, args.runs)
+        if "e2e" in sections:
+            console.print("[blue]End to end (real-time replay)...[/]")
+            replay = args.replay or synth_conversation(work / "conversation.wav")
+            results["e2e"] = bench_e2e(args.stt_model, llm_model, args.llm_backend, replay,
+                                       args.speculative)
+
+    args.output.write_text(json.dumps(results, indent=2))
+    console.print_json(data={k: v for k, v in results.items() if k != "meta"})
+    console.print(f"[green]Results written to {args.output}[/]")
+    if args.baseline:
+        if not compare(results, json.loads(args.baseline.read_text()), args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,52 @@
+"""Build a tiny randomly initialized causal LM that NLPHandler can load offline.
+
+The weights are random, so the output is gibberish, but the architecture,
+tokenizer and generate() path match a real LLaMA checkpoint. That makes it
+suitable for timing the surrounding code and relative throughput.
+"""
+from pathlib import Path
+
+CORPUS = [
+    "Human: hello there, what time is it?\nAssistant: It is almost noon. How can I help you today?\n",
+    "Human: tell me about the weather.\nAssistant: The weather is sunny with a light breeze.\n",
+    "Human: repeat that please.\nAssistant: Sure. The quick brown fox jumps over the lazy dog.\n",
+]
+
+def build_tiny_lm(directory: Path, vocab_size: int = 512, hidden_size: int = 64, layers: int = 2,
+                  heads: int = 4, max_positions: int = 1024, seed: int = 0) -> Path:
+    """Train a small BPE tokenizer and save a random LlamaForCausalLM next to it.
+
+    Args:
+        directory (Path): Where to save the model and tokenizer
+        vocab_size (int): Target BPE vocabulary size
+        hidden_size (int): Model width
+        layers (int): Decoder layers
+        heads (int): Attention heads
+        max_positions (int): Context length
+        seed (int): Seed for the random weights
+
+    Returns:
+        Path: ``directory``, loadable with ``from_pretrained``
+    """
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    directory = Path(directory)
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(CORPUS * 20, trainers.BpeTrainer(
+        vocab_size=vocab_size, special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>",
+                                   unk_token="<unk>", model_input_names=["input_ids", "attention_mask"])
+    fast.save_pretrained(directory)
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(vocab_size=len(fast), hidden_size=hidden_size,
+                         intermediate_size=hidden_size * 2, num_hidden_layers=layers,
+                         num_attention_heads=heads, max_position_embeddings=max_positions,
+                         bos_token_id=fast.bos_token_id, eos_token_id=fast.eos_token_id)
+    LlamaForCausalLM(config).save_pretrained(directory)
+    return directory
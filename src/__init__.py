@@ -1,10 +1,16 @@
-import argparse
-import logging
-from pathlib import Path
-from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
-from rich.console import Console
-# Using relative imports
-from .mic import MicrophoneHandler 
-from .stt import SpeechToText
-from .nlp import NLPHandler
-from .tts import TextToSpeech
\ No newline at end of file
+import importlib
+
+# Components are imported on first access so importing the package stays fast
+_LAZY_IMPORTS = {
+    "MicrophoneHandler": ".mic",
+    "SpeechToText": ".stt",
+    "NLPHandler": ".nlp",
+    "TextToSpeech": ".tts",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        return getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
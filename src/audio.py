@@ -0,0 +1,437 @@
+import logging
+import os
+import struct
+import wave
+from functools import partial
+from math import gcd
+from typing import Iterable, Iterator
+import numpy as np
+
+SAMPLE_WIDTHS = (1, 2, 3, 4)
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def pcm_to_float(data: bytes, sampwidth: int, channels: int = 1) -> np.ndarray:
+    """Decode interleaved PCM to float32 in [-1, 1), downmixed to mono.
+
+    Args:
+        data (bytes): PCM frames; 8-bit is unsigned, wider widths are signed little-endian
+        sampwidth (int): Bytes per sample (1, 2, 3 or 4)
+        channels (int): Interleaved channels
+
+    Returns:
+        np.ndarray: float32 mono samples
+    """
+    if sampwidth == 1:
+        audio = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sampwidth == 2:
+        audio = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    elif sampwidth == 3:
+        # Place each 3-byte sample in the top of an int32, then shift back down
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(raw), 4), dtype=np.uint8)
+        wide[:, 1:] = raw
+        audio = (wide.view("<i4")[:, 0] >> 8).astype(np.float32) / 8388608.0
+    elif sampwidth == 4:
+        audio = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sampwidth * 8}-bit")
+
+    if channels > 1:
+        audio = audio[:len(audio) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return audio
+
+def float_to_pcm16(audio: np.ndarray) -> bytes:
+    """Encode float samples in [-1, 1) as 16-bit PCM, clipping overs."""
+    return np.clip(audio * 32768.0, -32768, 32767).astype(np.int16).tobytes()
+
+class StreamResampler:
+    def __init__(self, in_rate: int, out_rate: int, taps_per_phase: int = 16, rolloff: float = 0.9):
+        """Polyphase FIR resampler that works one chunk at a time.
+
+        The rate ratio is reduced to ``up / down``; a Kaiser-windowed sinc
+        low-pass at the upsampled rate is split into ``up`` phases of
+        ``taps_per_phase`` taps each. Only the last ``taps_per_phase - 1``
+        input samples are carried between chunks, so memory stays constant.
+
+        Args:
+            in_rate (int): Input sample rate in Hz
+            out_rate (int): Output sample rate in Hz
+            taps_per_phase (int): Filter taps applied per output sample
+            rolloff (float): Cutoff as a fraction of the lower Nyquist frequency
+        """
+        div = gcd(in_rate, out_rate)
+        self.up = out_rate // div
+        self.down = in_rate // div
+        self.taps = taps_per_phase
+
+        # Low-pass at the upsampled rate, cut off below the lower Nyquist
+        length = self.up * taps_per_phase
+        cutoff = rolloff * 0.5 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, 8.0) * self.up
+        # phases[p, k] = h[p + k * up]; reversed so windows dot in input order
+        self.phases = np.ascontiguousarray(h.reshape(taps_per_phase, self.up).T[:, ::-1], dtype=np.float32)
+
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._consumed = 0  # input samples seen so far
+        self._produced = 0  # output samples emitted so far
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Resample the next chunk of float32 samples."""
+        if self.up == self.down or not len(audio):
+            return audio
+        buf = np.concatenate([self._history, audio])
+        end = self._consumed + len(audio)
+        # Output n uses input samples up to floor(n * down / up)
+        last = (end * self.up - 1) // self.down
+        n = np.arange(self._produced, last + 1, dtype=np.int64)
+        pos = n * self.down
+        base = pos // self.up - (self._consumed - len(self._history))
+        phase = pos % self.up
+
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps)
+        out = np.einsum("nk,nk->n", windows[base - self.taps + 1], self.phases[phase])
+
+        self._produced = last + 1
+        self._consumed = end
+        self._history = buf[len(buf) - (self.taps - 1):].copy()
+        return out.astype(np.float32, copy=False)
+
+    def reset(self) -> None:
+        self._history[:] = 0
+        self._consumed = 0
+        self._produced = 0
+
+class AudioNormalizer:
+    def __init__(self, in_rate: int, channels: int = 1, sampwidth: int = 2, out_rate: int = 16000):
+        """Convert PCM of any common layout to 16-bit mono at ``out_rate``.
+
+        Args:
+            in_rate (int): Input sample rate in Hz
+            channels (int): Input channels, averaged to mono
+            sampwidth (int): Input bytes per sample (1, 2, 3 or 4)
+            out_rate (int): Output sample rate in Hz
+        """
+        if sampwidth not in SAMPLE_WIDTHS:
+            raise ValueError(f"Unsupported sample width: {sampwidth * 8}-bit")
+        self.channels = channels
+        self.sampwidth = sampwidth
+        self.passthrough = channels == 1 and sampwidth == 2 and in_rate == out_rate
+        self.resampler = StreamResampler(in_rate, out_rate)
+        if not self.passthrough:
+            logging.debug(f"Normalizing {in_rate}Hz {sampwidth * 8}-bit x{channels} "
+                          f"to {out_rate}Hz 16-bit mono")
+
+    def process(self, data: bytes) -> bytes:
+        """Convert a chunk of whole input frames."""
+        if self.passthrough:
+            return data
+        audio = pcm_to_float(data, self.sampwidth, self.channels)
+        return float_to_pcm16(self.resampler.process(audio))
+
+class WavReader:
+    def __init__(self, path):
+        """Read PCM frames from a WAV file by parsing its RIFF chunks directly.
+
+        The stdlib ``wave`` module only accepts WAVE_FORMAT_PCM headers, but
+        most 24-bit and multichannel files are written as
+        WAVE_FORMAT_EXTENSIBLE. This reader takes either, and offers the
+        parts of ``wave.Wave_read`` the decoders use. Malformed or non-PCM
+        files raise ``wave.Error``.
+
+        Args:
+            path (str | Path): WAV file to open
+        """
+        self._file = open(path, "rb")
+        try:
+            self._parse()
+        except (struct.error, ValueError) as e:
+            self._file.close()
+            raise wave.Error(f"Invalid WAV file: {e}")
+        except Exception:
+            self._file.close()
+            raise
+
+    def _parse(self) -> None:
+        riff, _, form = struct.unpack("<4sI4s", self._file.read(12))
+        if riff != b"RIFF" or form != b"WAVE":
+            raise wave.Error("file does not start with RIFF id")
+        fmt = None
+        while True:
+            header = self._file.read(8)
+            if len(header) < 8:
+                raise wave.Error("data chunk missing")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"data":
+                break
+            if chunk_id == b"fmt ":
+                fmt = self._file.read(size)
+                self._file.seek(size % 2, os.SEEK_CUR)
+            else:
+                # Chunks are padded to an even length
+                self._file.seek(size + size % 2, os.SEEK_CUR)
+        if fmt is None:
+            raise wave.Error("fmt chunk missing")
+
+        tag, channels, rate, _, block_align, _ = struct.unpack("<HHIIHH", fmt[:16])
+        if tag == WAVE_FORMAT_EXTENSIBLE:
+            # The SubFormat GUID starts with the actual format code
+            tag = struct.unpack("<H", fmt[24:26])[0]
+        if tag != WAVE_FORMAT_PCM:
+            raise wave.Error(f"unsupported format: {tag}")
+        if not channels or not block_align:
+            raise wave.Error("bad fmt chunk")
+
+        self._channels = channels
+        self._rate = rate
+        # Container width; 20-bit audio in 24-bit containers reads as 24-bit
+        self._sampwidth = block_align // channels
+        self._block_align = block_align
+        self._data_start = self._file.tell()
+        # Streaming writers may leave the size unset, so trust the file length
+        available = os.fstat(self._file.fileno()).st_size - self._data_start
+        self._nframes = min(size, available) // block_align
+        self._pos = 0
+
+    def getnchannels(self) -> int:
+        return self._channels
+
+    def getsampwidth(self) -> int:
+        return self._sampwidth
+
+    def getframerate(self) -> int:
+        return self._rate
+
+    def getnframes(self) -> int:
+        return self._nframes
+
+    def tell(self) -> int:
+        return self._pos
+
+    def setpos(self, pos: int) -> None:
+        if pos < 0 or pos > self._nframes:
+            raise wave.Error("position not in range")
+        self._file.seek(self._data_start + pos * self._block_align)
+        self._pos = pos
+
+    def readframes(self, n: int) -> bytes:
+        n = max(0, min(n, self._nframes - self._pos))
+        data = self._file.read(n * self._block_align)
+        self._pos += len(data) // self._block_align
+        return data
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "WavReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def open_wav(path):
+    """Open a WAV file for reading with ``wave``, or ``WavReader`` for headers it rejects.
+
+    Raises:
+        wave.Error: If neither can read the file as PCM
+    """
+    try:
+        return wave.open(str(path), "rb")
+    except wave.Error:
+        return WavReader(path)
+
+def read_normalized(wf: wave.Wave_read, out_rate: int, chunk_frames: int = 4000,
+                    frames: int = None) -> Iterator[bytes]:
+    """Read a WAV file as 16-bit mono chunks at ``out_rate``.
+
+    Args:
+        wf (wave.Wave_read): Open WAV file from ``open_wav``, positioned where reading starts
+        out_rate (int): Output sample rate in Hz
+        chunk_frames (int): Input frames read per chunk
+        frames (int): Input frames to read (None for the rest of the file)
+
+    Yields:
+        bytes: 16-bit mono PCM
+    """
+    normalizer = AudioNormalizer(wf.getframerate(), wf.getnchannels(), wf.getsampwidth(), out_rate)
+    remaining = wf.getnframes() if frames is None else frames
+    while remaining > 0:
+        data = wf.readframes(min(chunk_frames, remaining))
+        if not data:
+            break
+        remaining -= len(data) // (wf.getsampwidth() * wf.getnchannels())
+        out = normalizer.process(data)
+        if out:
+            yield out
+
+class NoiseSuppressor:
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 32, over_subtraction: float = 3.0,
+                 gain_floor: float = 0.1, noise_rise: float = 0.03, noise_fall: float = 0.05,
+                 gain_smoothing: float = 0.5, init_frames: int = 8):
+        """Streaming spectral-subtraction noise suppressor.
+
+        Audio is analysed in half-overlapping frames with a square-root Hann
+        window, attenuated per frequency bin against a running noise-spectrum
+        estimate and resynthesized by overlap-add. The estimate follows
+        changing background noise, but each update is capped at four times
+        the current estimate, so bursts of speech barely move it. Gains never drop below
+        ``gain_floor``, which keeps residual noise from turning musical.
+        Output is aligned with the input but held back by ``latency``
+        samples; ``flush`` returns the rest at the end of a stream.
+        Transforms run in single precision through scipy, since numpy
+        before 2.0 computes every FFT in complex128.
+
+        Args:
+            sample_rate (int): Audio sample rate in Hz
+            frame_ms (int): Analysis frame length, rounded to a power of two samples
+            over_subtraction (float): Multiple of the noise power removed from each bin
+            gain_floor (float): Minimum per-bin amplitude gain
+            noise_rise (float): Noise estimate smoothing when a bin gets louder
+            noise_fall (float): Noise estimate smoothing when a bin gets quieter
+            gain_smoothing (float): Weight of the previous frame's gain
+            init_frames (int): Leading frames averaged into the first noise estimate
+        """
+        self.frame_len = 1 << int(round(np.log2(sample_rate * frame_ms / 1000)))
+        self.hop = self.frame_len // 2
+        self.latency = self.frame_len - self.hop
+        self.over_subtraction = over_subtraction
+        self.gain_floor = gain_floor
+        self.noise_rise = noise_rise
+        self.noise_fall = noise_fall
+        self.gain_smoothing = gain_smoothing
+        self.init_frames = init_frames
+
+        # Periodic sqrt-Hann: analysis * synthesis windows sum to one at 50% overlap
+        n = np.arange(self.frame_len)
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * n / self.frame_len)).astype(np.float32)
+
+        bins = self.frame_len // 2 + 1
+        self._input = np.zeros(self.frame_len, dtype=np.float32)
+        self._output = np.zeros(self.frame_len, dtype=np.float32)
+        self._windowed = np.zeros(self.frame_len, dtype=np.float32)
+        self._power = np.zeros(bins, dtype=np.float32)
+        self._scratch = np.zeros(bins, dtype=np.float32)
+        self._noise = np.zeros(bins, dtype=np.float32)
+        self._gain = np.ones(bins, dtype=np.float32)
+        self._frames = 0
+        self._rfft, self._irfft = self._transforms(bins)
+        self._restart()
+
+    def _transforms(self, bins: int):
+        """Forward and inverse real FFTs for one frame, allocating as little as possible."""
+        try:
+            import scipy.fft
+            return (partial(scipy.fft.rfft, workers=1),
+                    partial(scipy.fft.irfft, n=self.frame_len, workers=1))
+        except ImportError:
+            pass
+        if np.lib.NumpyVersion(np.__version__) >= "2.0.0":
+            # Single precision, written into buffers reused for every frame
+            return (partial(np.fft.rfft, out=np.zeros(bins, dtype=np.complex64)),
+                    partial(np.fft.irfft, n=self.frame_len,
+                            out=np.zeros(self.frame_len, dtype=np.float32)))
+        return np.fft.rfft, partial(np.fft.irfft, n=self.frame_len)
+
+    def _restart(self) -> None:
+        """Drop buffered audio, keeping the noise estimate."""
+        self._input[:] = 0
+        self._output[:] = 0
+        self._count = 0  # samples of the current hop already in _input
+        self._skip = self.latency  # leading output that only holds the frame delay
+        self._held = 0  # input samples not yet returned
+
+    def reset(self) -> None:
+        """Forget buffered audio and the noise estimate."""
+        self._noise[:] = 0
+        self._gain[:] = 1
+        self._frames = 0
+        self._restart()
+
+    def process(self, audio_data: bytes) -> bytes:
+        """Denoise a chunk of 16-bit mono PCM.
+
+        Returns whole hops of output only, so the returned length can differ
+        from the input length by up to one hop.
+        """
+        audio = np.frombuffer(audio_data, dtype=np.int16)
+        out = np.empty((self._count + len(audio)) // self.hop * self.hop, dtype=np.int16)
+        start = self.frame_len - self.hop
+        pos = written = 0
+        while pos < len(audio):
+            take = min(self.hop - self._count, len(audio) - pos)
+            offset = start + self._count
+            np.multiply(audio[pos:pos + take], 1 / 32768, out=self._input[offset:offset + take],
+                        casting="unsafe")
+            self._count += take
+            pos += take
+            if self._count == self.hop:
+                self._process_frame(out[written:written + self.hop])
+                written += self.hop
+                self._count = 0
+
+        skip = min(self._skip, len(out))
+        self._skip -= skip
+        self._held += len(audio) - (len(out) - skip)
+        return out[skip:].tobytes()
+
+    def flush(self) -> bytes:
+        """Return the held-back end of the stream and start a new one."""
+        held = self._held
+        pad = -(-(self._count + self.latency) // self.hop) * self.hop - self._count
+        tail = self.process(bytes(2 * pad))[:2 * held]
+        self._restart()
+        return tail
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Denoise a stream of chunks, flushing at the end."""
+        for data in chunks:
+            out = self.process(data)
+            if out:
+                yield out
+        tail = self.flush()
+        if tail:
+            yield tail
+
+    def _process_frame(self, out: np.ndarray) -> None:
+        np.multiply(self._input, self.window, out=self._windowed)
+        spectrum = self._rfft(self._windowed)
+        np.square(spectrum.real, out=self._power, casting="same_kind")
+        self._power += np.square(spectrum.imag, out=self._scratch, casting="same_kind")
+
+        if self._frames < self.init_frames:
+            # Digital silence (header padding, device warm-up) says nothing about the noise
+            if self._power.any():
+                self._frames += 1
+                self._noise += (self._power - self._noise) / self._frames
+        else:
+            # Track each bin, clipping loud frames so speech does not leak in
+            rate = np.where(self._power < self._noise, self.noise_fall, self.noise_rise)
+            np.minimum(self._power, 4 * self._noise, out=self._scratch)
+            self._scratch -= self._noise
+            self._scratch *= rate
+            self._noise += self._scratch
+            # A zero estimate could never rise again
+            np.maximum(self._noise, 1e-10, out=self._noise)
+
+        # Power subtraction gain, floored and smoothed over time
+        np.divide(self._noise, np.maximum(self._power, 1e-12), out=self._scratch)
+        self._scratch *= -self.over_subtraction
+        self._scratch += 1
+        np.maximum(self._scratch, self.gain_floor ** 2, out=self._scratch)
+        np.sqrt(self._scratch, out=self._scratch)
+        self._gain *= self.gain_smoothing
+        self._gain += (1 - self.gain_smoothing) * self._scratch
+        spectrum *= self._gain
+
+        np.multiply(self._irfft(spectrum), self.window, out=self._windowed,
+                    casting="same_kind")
+        self._output += self._windowed
+        np.multiply(self._output[:self.hop], 32768, out=self._scratch[:self.hop])
+        np.clip(self._scratch[:self.hop], -32768, 32767, out=out, casting="unsafe")
+
+        # Slide both buffers by one hop
+        self._output[:-self.hop] = self._output[self.hop:]
+        self._output[-self.hop:] = 0
+        self._input[:-self.hop] = self._input[self.hop:]
@@ -0,0 +1,357 @@
+import glob
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from .audio import open_wav, pcm_to_float
+
+# Per-process recognizer, created once by the pool initializer
+_worker_stt = None
+
+def _init_worker(model_path: str, sample_rate: int, chunk_frames: int = 4000,
+                 denoise: bool = False, noise_floor: float = 0.1) -> None:
+    """Load the Vosk model once for this worker process."""
+    global _worker_stt
+    from .stt import SpeechToText
+    _worker_stt = SpeechToText(model_path=model_path, sample_rate=sample_rate,
+                               chunk_frames=chunk_frames, denoise=denoise,
+                               noise_floor=noise_floor)
+
+def _transcribe_one(wav_file: str) -> Tuple[str, List[dict], Optional[str]]:
+    """Transcribe a single file inside a worker process."""
+    try:
+        return wav_file, list(_worker_stt.stream_wav(wav_file)), None
+    except Exception as e:
+        return wav_file, [], str(e)
+
+def _transcribe_span(wav_file: str, start_frame: int, end_frame: int) -> list:
+    """Transcribe one segment of a long file inside a worker process."""
+    return _worker_stt.transcribe_segment(wav_file, start_frame, end_frame)
+
+def collect_inputs(source) -> List[Path]:
+    """Resolve a directory, glob pattern or single file into WAV paths.
+
+    Args:
+        source (str | Path): Directory, glob pattern or file path
+
+    Returns:
+        list: Sorted list of WAV file paths
+    """
+    source = Path(source)
+    if source.is_dir():
+        files = [p for p in source.rglob("*") if p.suffix.lower() == ".wav"]
+    elif source.is_file():
+        files = [source]
+    else:
+        files = [Path(p) for p in glob.glob(str(source), recursive=True)]
+    return sorted(p for p in files if p.is_file())
+
+def input_root(source) -> Path:
+    """Directory that ``collect_inputs(source)`` paths are relative to."""
+    source = Path(source)
+    if source.is_dir():
+        return source
+    if source.is_file():
+        return source.parent
+    # Leading part of a glob pattern before the first wildcard
+    parts = []
+    for part in source.parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+def output_path(wav_file, root: Path, directory: Path, suffix: str) -> Path:
+    """Mirror an input's path below ``root`` into ``directory`` with a new suffix.
+
+    Keeping the subdirectories means ``a/x.wav`` and ``b/x.wav`` get
+    separate outputs.
+    """
+    wav_file = Path(wav_file)
+    try:
+        relative = wav_file.relative_to(root)
+    except ValueError:
+        relative = Path(wav_file.name)
+    return Path(directory) / relative.with_suffix(suffix)
+
+class BatchTranscriber:
+    def __init__(self, model_path="models/vosk-model-small-en-us-0.15", sample_rate=16000,
+                 workers: Optional[int] = None, chunk_frames: int = 4000,
+                 denoise: bool = False, noise_floor: float = 0.1):
+        """Initialize batch transcriber.
+
+        Args:
+            model_path (str): Path to Vosk model directory
+            sample_rate (int): Audio sample rate in Hz
+            workers (int): Number of worker processes (default: CPU count)
+            chunk_frames (int): File frames per decode call
+            denoise (bool): Run audio through a noise suppressor before decoding
+            noise_floor (float): Lowest gain the noise suppressor applies
+        """
+        self.model_path = str(model_path)
+        self.sample_rate = sample_rate
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_frames = chunk_frames
+        self.denoise = denoise
+        self.noise_floor = noise_floor
+
+    def run(self, files: List[Path]) -> Iterator[Tuple[str, List[dict], Optional[str]]]:
+        """Transcribe files in parallel, yielding results as they complete.
+
+        Args:
+            files (list): WAV files to transcribe
+
+        Yields:
+            tuple: (file path, final results with word timings, error message or None)
+        """
+        workers = min(self.workers, len(files)) or 1
+        logging.info(f"Transcribing {len(files)} files with {workers} workers")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.sample_rate, self.chunk_frames,
+                          self.denoise, self.noise_floor)
+        ) as pool:
+            futures = [pool.submit(_transcribe_one, str(f)) for f in files]
+            for future in as_completed(futures):
+                yield future.result()
+
+class BatchWriter:
+    def __init__(self, output: Optional[Path], root: Path = Path(".")):
+        """Stream batch results to a JSONL file or a directory of text files.
+
+        A JSONL file is rewritten on each run. In a directory, each input's
+        text file mirrors its path below ``root``.
+
+        Args:
+            output (Path): ``.jsonl`` file, output directory, or None for no output
+            root (Path): Directory the inputs were collected from
+        """
+        self.output = output
+        self.root = root
+        self.jsonl = None
+        if output is None:
+            return
+        if output.suffix.lower() == ".jsonl":
+            output.parent.mkdir(parents=True, exist_ok=True)
+            self.jsonl = open(output, "w", encoding="utf-8")
+        else:
+            output.mkdir(parents=True, exist_ok=True)
+
+    def write(self, wav_file: str, text: str, error: Optional[str] = None) -> None:
+        """Write a single result as soon as it is available."""
+        if self.jsonl:
+            record = {"file": wav_file, "text": text}
+            if error:
+                record["error"] = error
+            self.jsonl.write(json.dumps(record) + "\n")
+            self.jsonl.flush()
+        elif self.output is not None and not error:
+            path = output_path(wav_file, self.root, self.output, ".txt")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+
+    def close(self) -> None:
+        if self.jsonl:
+            self.jsonl.close()
+            self.jsonl = None
+
+def plan_segments(wav_file: str, window: float = 30.0, overlap: float = 1.0,
+                  split_on_silence: bool = True, search: float = 5.0,
+                  frame_ms: int = 30) -> List[Tuple[int, int]]:
+    """Split a WAV file into frame ranges for parallel decoding.
+
+    With ``split_on_silence`` each cut is placed at the quietest frame in the
+    last ``search`` seconds of the window; cuts that land on silence need no
+    overlap. Otherwise fixed windows overlapping by ``overlap`` seconds are used.
+
+    Args:
+        wav_file (str): Path to a PCM WAV file
+        window (float): Target segment length in seconds
+        overlap (float): Overlap in seconds when a cut is not silent
+        split_on_silence (bool): Cut at detected silences instead of fixed windows
+        search (float): Seconds before each window end searched for silence
+        frame_ms (int): Energy frame length in milliseconds
+
+    Returns:
+        list: (start_frame, end_frame) tuples in file order
+    """
+    if overlap >= window:
+        raise ValueError(f"Segment overlap ({overlap}s) must be shorter than "
+                         f"the window ({window}s)")
+    # The silence search has to stay inside the window it cuts
+    search = min(search, window)
+    with open_wav(wav_file) as wf:
+        rate = wf.getframerate()
+        total = wf.getnframes()
+        win = int(window * rate)
+        ov = int(overlap * rate)
+        if total <= win:
+            return [(0, total)]
+
+        if not split_on_silence:
+            segments, start = [], 0
+            while True:
+                end = min(start + win, total)
+                segments.append((start, end))
+                if end >= total:
+                    return segments
+                start = end - ov
+
+        # Mean-square energy of each frame across the whole file
+        hop = max(1, rate * frame_ms // 1000)
+        energies = []
+        while True:
+            data = wf.readframes(hop * 1000)
+            if not data:
+                break
+            audio = pcm_to_float(data, wf.getsampwidth(), wf.getnchannels())
+            frames = audio[:len(audio) // hop * hop].reshape(-1, hop).astype(np.float32)
+            energies.append(np.mean(frames * frames, axis=1))
+        energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+        # Frames 10 dB below the median count as silence
+        silence = 0.1 * np.median(energy) if len(energy) else 0.0
+
+    segments, start = [], 0
+    while total - start > win:
+        lo = max((start + win - int(search * rate)) // hop, start // hop + 1)
+        hi = (start + win) // hop
+        if hi <= lo or hi > len(energy):
+            cut = start + win
+            pad = ov
+        else:
+            idx = lo + int(np.argmin(energy[lo:hi]))
+            cut = idx * hop
+            pad = 0 if energy[idx] <= silence else ov
+        segments.append((start, min(cut + pad, total)))
+        start = max(cut - pad, start + 1)
+    segments.append((start, total))
+    return segments
+
+def merge_segments(segments: List[Tuple[int, int]], results: List[list],
+                   sample_rate: int) -> List[dict]:
+    """Join per-segment words in order, dropping words duplicated in overlaps.
+
+    Each overlap is split at its midpoint: words centred before it belong to
+    the earlier segment, the rest to the later one.
+
+    Args:
+        segments (list): (start_frame, end_frame) tuples from ``plan_segments``
+        results (list): Word lists returned by ``transcribe_segment``, in order
+        sample_rate (int): Audio sample rate in Hz
+
+    Returns:
+        list: Segment dicts with ``start``, ``end``, ``text`` and ``words``
+    """
+    merged = []
+    for i, ((start, end), words) in enumerate(zip(segments, results)):
+        lo = start / sample_rate
+        hi = end / sample_rate
+        if i > 0:
+            lo = (segments[i - 1][1] + start) / 2 / sample_rate
+        if i + 1 < len(segments):
+            hi = (end + segments[i + 1][0]) / 2 / sample_rate
+        kept = [w for w in words if lo <= (w["start"] + w["end"]) / 2 < hi]
+        merged.append({
+            "start": lo,
+            "end": hi,
+            "text": " ".join(w["word"] for w in kept),
+            "words": kept
+        })
+    return merged
+
+class LongFileTranscriber:
+    def __init__(self, model_path="models/vosk-model-small-en-us-0.15", sample_rate=16000,
+                 workers: Optional[int] = None, window: float = 30.0, overlap: float = 1.0,
+                 split_on_silence: bool = True, chunk_frames: int = 4000,
+                 denoise: bool = False, noise_floor: float = 0.1):
+        """Initialize long-file transcriber.
+
+        Args:
+            model_path (str): Path to Vosk model directory
+            sample_rate (int): Audio sample rate in Hz
+            workers (int): Number of worker processes (default: CPU count)
+            window (float): Target segment length in seconds
+            overlap (float): Segment overlap in seconds
+            split_on_silence (bool): Cut at detected silences instead of fixed windows
+            chunk_frames (int): File frames per decode call
+            denoise (bool): Run audio through a noise suppressor before decoding
+            noise_floor (float): Lowest gain the noise suppressor applies
+        """
+        if overlap >= window:
+            raise ValueError(f"Segment overlap ({overlap}s) must be shorter than "
+                             f"the window ({window}s)")
+        self.model_path = str(model_path)
+        self.sample_rate = sample_rate
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window
+        self.overlap = overlap
+        self.split_on_silence = split_on_silence
+        self.chunk_frames = chunk_frames
+        self.denoise = denoise
+        self.noise_floor = noise_floor
+
+    def plan(self, wav_file: str) -> List[Tuple[int, int]]:
+        """Return the segment plan for a file."""
+        return plan_segments(wav_file, self.window, self.overlap, self.split_on_silence)
+
+    def run(self, wav_file: str, segments: Optional[List[Tuple[int, int]]] = None,
+            on_segment: Optional[Callable[[int], None]] = None,
+            completed: Optional[Dict[int, list]] = None,
+            on_result: Optional[Callable[[int, list], None]] = None) -> List[dict]:
+        """Transcribe segments of one file in parallel and merge them.
+
+        Args:
+            wav_file (str): Path to WAV file
+            segments (list): Precomputed segment plan (default: ``plan(wav_file)``)
+            on_segment (callable): Called with the segment index as each one finishes
+            completed (dict): Word lists of segments finished by an earlier run, by index
+            on_result (callable): Called with the index and word list of each
+                newly decoded segment, e.g. to checkpoint it
+
+        Returns:
+            list: Merged segment dicts with timestamps
+        """
+        wav_file = str(wav_file)
+        segments = segments or self.plan(wav_file)
+        completed = completed or {}
+        pending = [i for i in range(len(segments)) if i not in completed]
+        workers = min(self.workers, len(pending)) or 1
+        logging.info(f"Transcribing {wav_file} as {len(segments)} segments with {workers} workers"
+                     + (f" ({len(segments) - len(pending)} already done)" if completed else ""))
+
+        with open_wav(wav_file) as wf:
+            rate = wf.getframerate()
+
+        results = [completed.get(i) for i in range(len(segments))]
+        if on_segment:
+            for i in range(len(segments)):
+                if i in completed:
+                    on_segment(i)
+        if pending:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.model_path, self.sample_rate, self.chunk_frames,
+                          self.denoise, self.noise_floor)
+            ) as pool:
+                futures = {pool.submit(_transcribe_span, wav_file, *segments[i]): i
+                           for i in pending}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    if on_result:
+                        on_result(i, results[i])
+                    if on_segment:
+                        on_segment(i)
+        # Segments are in file frames, which may differ from the model rate
+        return merge_segments(segments, results, rate)
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as HH:MM:SS.ss."""
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:05.2f}"
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+def context_fingerprint(messages: List[dict], turns: int = 2) -> str:
+    """Short hash of the last few conversation messages."""
+    recent = "\n".join(normalize_text(m["content"]) for m in messages[-turns:]) if turns else ""
+    return hashlib.sha1(recent.encode("utf-8")).hexdigest()[:12]
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 1 << 20, ttl: float = 3600.0,
+                 path: Optional[Path] = None, context_turns: int = 2):
+        """LRU/TTL cache of LLM responses keyed by normalized text and context.
+
+        Args:
+            max_entries (int): Maximum cached responses
+            max_bytes (int): Approximate bound on cached key and response bytes
+            ttl (float): Seconds before an entry expires (None to never expire)
+            path (Path): JSON file to load from and save to (None for memory only)
+            context_turns (int): Recent messages included in the key fingerprint
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.context_turns = context_turns
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (created, response)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if self.path and self.path.exists():
+            self.load()
+
+    def key(self, text: str, messages: List[dict]) -> str:
+        """Cache key for a user message given the conversation before it."""
+        return f"{context_fingerprint(messages, self.context_turns)}:{normalize_text(text)}"
+
+    def get(self, text: str, messages: List[dict]) -> Optional[str]:
+        """Look up a response, counting the hit or miss."""
+        key = self.key(text, messages)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text: str, messages: List[dict], response: str) -> None:
+        """Store a response, evicting least recently used entries past the bounds."""
+        key = self.key(text, messages)
+        self._insert(key, time.time(), response)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def load(self) -> None:
+        """Load unexpired entries from ``path``."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading response cache: {e}")
+            return
+        for key, created, response in entries:
+            if not self._expired(created):
+                self._insert(key, created, response)
+        logging.info(f"Loaded {len(self._entries)} cached responses from {self.path}")
+
+    def save(self) -> None:
+        """Write entries to ``path`` atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, created, response] for key, (created, response) in self._entries.items()]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def _insert(self, key: str, created: float, response: str) -> None:
+        size = len(key) + len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (created, response)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, response = self._entries.pop(key)
+        self._bytes -= len(key) + len(response.encode("utf-8"))
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+class AudioCache:
+    def __init__(self, directory: Path, max_bytes: int = 64 << 20, suffix: str = ".wav"):
+        """Disk-backed LRU cache of rendered audio files.
+
+        Recency is kept in the files' modification times, so the LRU order
+        survives restarts.
+
+        Args:
+            directory (Path): Directory holding the cached files
+            max_bytes (int): Total size above which the oldest files are deleted
+            suffix (str): File extension of cached files
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # path -> size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        for path in sorted(self.directory.glob(f"*{suffix}"), key=lambda p: p.stat().st_mtime):
+            if ".tmp" in path.suffixes:
+                path.unlink(missing_ok=True)
+                continue
+            self._entries[path] = path.stat().st_size
+            self._bytes += self._entries[path]
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable key for the settings that determine the rendered audio."""
+        return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the cached file for ``key``, or None."""
+        path = self.directory / f"{key}{self.suffix}"
+        with self._lock:
+            if path not in self._entries or not path.exists():
+                self._entries.pop(path, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+        os.utime(path)
+        return path
+
+    def temp_path(self, key: str) -> Path:
+        """Where to render a file before handing it to ``put``."""
+        return self.directory / f"{key}.tmp{self.suffix}"
+
+    def put(self, key: str, rendered: Path) -> Path:
+        """Move a rendered file into the cache and evict past the size bound."""
+        path = self.directory / f"{key}{self.suffix}"
+        os.replace(rendered, path)
+        size = path.stat().st_size
+        with self._lock:
+            self._bytes -= self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                old.unlink(missing_ok=True)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "files": len(self._entries), "bytes": self._bytes}
+
+class TranscriptCache:
+    def __init__(self, path: Path = Path("cache/transcripts.sqlite")):
+        """Persistent transcription cache keyed by audio content and model settings.
+
+        Finished transcripts are stored whole; long jobs also store each
+        segment as it completes, so an interrupted job resumes from the
+        segments already decoded. Content hashes are remembered per path,
+        size and mtime, so an unchanged file is recognized without reading it.
+        Writes are committed immediately and survive a crash.
+
+        Args:
+            path (Path): SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY, result TEXT, created REAL);
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT, idx INTEGER, result TEXT, PRIMARY KEY (key, idx));
+        """)
+        self._db.commit()
+
+    def digest(self, audio_file: Path) -> str:
+        """SHA-256 of a file's bytes, reused while its size and mtime are unchanged."""
+        path = os.path.abspath(str(audio_file))
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?",
+                                   (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                             (path, stat.st_size, stat.st_mtime_ns, digest))
+            self._db.commit()
+        return digest
+
+    def key(self, audio_file: Path, *settings) -> str:
+        """Key for a file's content under the settings that affect its transcript."""
+        parts = [self.digest(audio_file)] + [str(s) for s in settings]
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Cached transcript for ``key``, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT result FROM transcripts WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result) -> None:
+        """Store a finished transcript and drop its segment checkpoints."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?)",
+                             (key, json.dumps(result), time.time()))
+            self._db.execute("DELETE FROM segments WHERE key = ?", (key,))
+            self._db.commit()
+
+    def segments(self, key: str) -> Dict[int, object]:
+        """Segments checkpointed so far for an unfinished job."""
+        with self._lock:
+            rows = self._db.execute("SELECT idx, result FROM segments WHERE key = ?",
+                                    (key,)).fetchall()
+        return {idx: json.loads(result) for idx, result in rows}
+
+    def put_segment(self, key: str, index: int, result) -> None:
+        """Checkpoint one finished segment of a job."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO segments VALUES (?, ?, ?)",
+                             (key, index, json.dumps(result)))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
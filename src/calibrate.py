@@ -0,0 +1,138 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from rich.table import Table
+from .audio import NoiseSuppressor
+from .config import Config
+from .vad import VoiceActivityDetector
+
+# Candidates tried for each setting, smallest first
+CHUNK_SIZES = (256, 512, 1024, 2048, 4096)
+FILE_CHUNK_FRAMES = (1000, 2000, 4000, 8000, 16000)
+# Share of a chunk's duration its processing may take on the capture path
+CHUNK_BUDGET = 0.5
+# A larger setting must beat a smaller one by this much to be preferred
+MARGIN = 0.05
+
+def test_audio(sample_rate: int, seconds: float) -> bytes:
+    """Speech-like test signal: a gliding tone over noise, as 16-bit mono PCM."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    audio = 0.3 * np.sin(2 * np.pi * (200 + 100 * np.sin(2 * np.pi * 0.5 * t)) * t)
+    audio += 0.02 * rng.standard_normal(len(t))
+    return (audio * 32767).astype("<i2").tobytes()
+
+def thread_counts(cpus: Optional[int] = None) -> List[int]:
+    """Powers of two up to the CPU count, plus the CPU count itself."""
+    cpus = cpus or os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+def calibrate_llm_threads(config: Config, table: Table) -> Optional[int]:
+    """Thread count with the best decode throughput, or None if the LLM can't load."""
+    import torch
+    from .nlp import NLPHandler
+    try:
+        nlp = NLPHandler(config.llm_model, backend=config.llm_backend, decoding="greedy")
+    except Exception as e:
+        logging.warning(f"Skipping LLM thread calibration: {e}")
+        return None
+
+    original = torch.get_num_threads()
+    best = None
+    try:
+        for threads in thread_counts():
+            torch.set_num_threads(threads)
+            rate = nlp.benchmark(max_new_tokens=32, runs=2)["decode_tokens_per_s"]
+            table.add_row("LLM threads", str(threads), f"{rate:.1f} tokens/s")
+            # More threads only win if clearly faster; extra threads cost the other stages
+            if best is None or rate > best[1] * (1 + MARGIN):
+                best = (threads, rate)
+    finally:
+        torch.set_num_threads(original)
+    return best[0]
+
+def calibrate_file_chunks(stt, audio: bytes, seconds: float, table: Table) -> int:
+    """File chunk size with the lowest decoding real-time factor."""
+    best = None
+    for frames in FILE_CHUNK_FRAMES:
+        step = frames * 2
+        start = time.perf_counter()
+        for _ in stt.stream_audio((audio[i:i + step] for i in range(0, len(audio), step)),
+                                  partials=False):
+            pass
+        rtf = (time.perf_counter() - start) / seconds
+        table.add_row("File chunk frames", str(frames), f"{rtf:.3f} x real time")
+        if best is None or rtf < best[1] * (1 - MARGIN):
+            best = (frames, rtf)
+    return best[0]
+
+def calibrate_chunk_size(config: Config, stt, audio: bytes, table: Table) -> int:
+    """Smallest microphone chunk whose processing fits in ``CHUNK_BUDGET`` of its duration.
+
+    Each chunk goes through what the capture path does with it: noise
+    suppression (if enabled), the VAD and, with a model, the live recognizer.
+    """
+    for chunk_size in CHUNK_SIZES:
+        vad = VoiceActivityDetector(sample_rate=config.sample_rate)
+        suppressor = NoiseSuppressor(config.sample_rate) if config.denoise else None
+        step = chunk_size * 2
+        costs = []
+        for i in range(0, len(audio) - step + 1, step):
+            start = time.perf_counter()
+            data = audio[i:i + step]
+            if suppressor:
+                data = suppressor.process(data)
+            speech, _ = vad.process(data)
+            if stt is not None:
+                stt.transcribe_audio(data)
+            costs.append(time.perf_counter() - start)
+        if stt is not None:
+            stt.finalize()
+        load = float(np.percentile(costs, 99)) / (chunk_size / config.sample_rate)
+        table.add_row("Microphone chunk", str(chunk_size), f"{100 * load:.1f}% of chunk (p99)")
+        if load <= CHUNK_BUDGET:
+            return chunk_size
+    return CHUNK_SIZES[-1]
+
+def calibrate(config: Config, seconds: float = 10.0) -> Tuple[Config, Table]:
+    """Benchmark this host and return ``config`` with the best chunk and thread settings.
+
+    Speech recognition steps need the Vosk model at ``config.model_path`` and
+    the thread step needs the LLM; steps whose model is missing are skipped
+    and leave their settings unchanged.
+
+    Args:
+        config (Config): Settings to start from
+        seconds (float): Length of the test audio
+
+    Returns:
+        tuple: (calibrated Config, table of measurements)
+    """
+    table = Table(title="Calibration")
+    for column in ("Setting", "Value", "Measured"):
+        table.add_column(column)
+    audio = test_audio(config.sample_rate, seconds)
+    changes = {}
+
+    stt = None
+    if Path(config.model_path).exists():
+        from .stt import SpeechToText
+        stt = SpeechToText(str(config.model_path), config.sample_rate)
+        changes["file_chunk_frames"] = calibrate_file_chunks(stt, audio, seconds, table)
+    else:
+        logging.warning(f"Skipping decode calibration, Vosk model not found: {config.model_path}")
+    changes["chunk_size"] = calibrate_chunk_size(config, stt, audio, table)
+
+    threads = calibrate_llm_threads(config, table)
+    if threads:
+        changes["llm_threads"] = threads
+
+    logging.info(f"Calibrated settings: {changes}")
+    return config.replace(**changes), table
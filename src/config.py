@@ -1,20 +1,143 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from pathlib import Path
+from typing import Optional
 import json
 
+# Named starting points for Config.load; each overrides a few defaults
+PROFILES = {
+    # Small capture and decode chunks and short replies, for the quickest turn-around
+    "low-latency": {
+        "chunk_size": 512,
+        "file_chunk_frames": 1600,
+        "vad_hangover_ms": 200,
+        "stable_ms": 80,
+        "decoding": "greedy",
+        "max_new_tokens": 128,
+        "queue_size": 8,
+    },
+    # Large reads and long segments, for batch jobs and the transcription server
+    "high-throughput": {
+        "chunk_size": 4096,
+        "file_chunk_frames": 16000,
+        "segment_window": 60.0,
+        "decoding": "greedy",
+        "queue_size": 64,
+    },
+    # Quantized LLM, one decoding process and small buffers and caches
+    "low-memory": {
+        "llm_backend": "int8",
+        "workers": 1,
+        "mic_buffer_seconds": 10.0,
+        "file_chunk_frames": 2000,
+        "max_new_tokens": 128,
+        "response_cache_entries": 256,
+        "response_cache_bytes": 256 << 10,
+        "response_cache_ttl": 600.0,
+        "tts_cache_bytes": 16 << 20,
+    },
+}
+
+_PATH_FIELDS = ("model_path", "mic_spill_path", "response_cache_path", "tts_cache_dir",
+                "transcript_cache_path")
+
 @dataclass
 class Config:
+    # Speech recognition and capture
     model_path: Path = Path("models/vosk-model-small-en-us-0.15")
     sample_rate: int = 16000
-    chunk_size: int = 1024
+    chunk_size: int = 1024  # microphone frames per read
     channels: int = 1
-    noise_threshold: float = 0.1
-    
+    denoise: bool = False
+    denoise_gain_floor: float = 0.1  # lowest per-bin gain of the noise suppressor
+    file_chunk_frames: int = 4000  # WAV frames per decode call
+    mic_buffer_seconds: float = 30.0
+    mic_spill_path: Optional[Path] = None  # WAV file that keeps the whole capture session
+    vad_hangover_ms: int = 300
+    vad_max_utterance_ms: int = 15000  # longest utterance before the VAD ends it
+    workers: Optional[int] = None  # batch, long-file and server workers (None: CPU count)
+    segment_window: float = 30.0
+    segment_overlap: float = 1.0
+    max_sessions: Optional[int] = None  # server sessions (None: 4 per worker)
+    min_confidence: float = 0.0  # drop segments with a lower mean word confidence
+
+    # Language model
+    llm_model: str = "TheBloke/Llama-2-7b-chat-ggml"
+    llm_backend: str = "auto"
+    llm_threads: Optional[int] = None  # None: torch's choice
+    decoding: str = "sample"
+    draft_model: Optional[str] = None
+    max_new_tokens: int = 256
+    temperature: float = 0.7
+    top_p: float = 0.9
+    repetition_penalty: float = 1.2
+
+    # Speech synthesis
+    voice_id: Optional[str] = None
+    tts_rate: int = 175
+
+    # Interactive pipeline
+    queue_size: int = 32
+    stable_ms: int = 120  # partial stability before speculating; below vad_hangover_ms
+
+    # Caches
+    cache_responses: bool = True
+    response_cache_path: Optional[Path] = None
+    response_cache_entries: int = 1024
+    response_cache_bytes: int = 1 << 20
+    response_cache_ttl: Optional[float] = 3600.0  # seconds (None: never expire)
+    tts_cache_dir: Optional[Path] = Path("cache/tts")
+    tts_cache_bytes: int = 64 << 20
+    transcript_cache_path: Optional[Path] = Path("cache/transcripts.sqlite")
+
+    def __post_init__(self):
+        for name in _PATH_FIELDS:
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, Path):
+                setattr(self, name, Path(value))
+        if self.segment_overlap >= self.segment_window:
+            raise ValueError(f"segment_overlap ({self.segment_overlap}) must be below "
+                             f"segment_window ({self.segment_window})")
+        # Speculation only gains time if it can start before the VAD ends the utterance
+        if self.stable_ms >= self.vad_hangover_ms:
+            raise ValueError(f"stable_ms ({self.stable_ms}) must be below "
+                             f"vad_hangover_ms ({self.vad_hangover_ms})")
+
     @classmethod
-    def load(cls, path: Path) -> "Config":
-        with open(path) as f:
-            return cls(**json.load(f))
-            
+    def profile(cls, name: str) -> "Config":
+        """Defaults with a named profile from ``PROFILES`` applied."""
+        if name not in PROFILES:
+            raise ValueError(f"Unknown profile: {name} (choose from {', '.join(PROFILES)})")
+        return cls(**PROFILES[name])
+
+    @classmethod
+    def load(cls, source) -> "Config":
+        """Load a named profile or a JSON file of settings.
+
+        A JSON file may set ``"profile"`` to start from a named profile and
+        override any of its fields; fields it leaves out keep their defaults.
+
+        Args:
+            source (str | Path): Profile name or JSON file path
+
+        Returns:
+            Config: The loaded settings
+        """
+        if str(source) in PROFILES:
+            return cls.profile(str(source))
+        with open(source) as f:
+            settings = json.load(f)
+        base = cls.profile(settings.pop("profile")) if "profile" in settings else cls()
+        return base.replace(**settings)
+
+    def replace(self, **changes) -> "Config":
+        """Copy with some fields changed."""
+        unknown = set(changes) - {f.name for f in fields(self)}
+        if unknown:
+            raise ValueError(f"Unknown config settings: {', '.join(sorted(unknown))}")
+        return replace(self, **changes)
+
     def save(self, path: Path) -> None:
+        settings = {f.name: getattr(self, f.name) for f in fields(self)}
         with open(path, 'w') as f:
-            json.dump(self.__dict__, f, indent=2)
\ No newline at end of file
+            json.dump({k: str(v) if isinstance(v, Path) else v for k, v in settings.items()},
+                      f, indent=2)
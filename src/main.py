@@ -1,59 +1,324 @@
+import time
+_START = time.perf_counter()
+
 import argparse
+import importlib
+import itertools
+import json
 import logging
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+from rich.progress import (Progress, SpinnerColumn, TextColumn, TimeElapsedColumn,
+                           BarColumn, MofNCompleteColumn)
 from rich.console import Console
-from src.mic import MicrophoneHandler 
-from src.stt import SpeechToText
-from src.nlp import NLPHandler
-from src.tts import TextToSpeech
+from rich.table import Table
+from src.cache import ResponseCache, TranscriptCache
+from src.config import PROFILES, Config
+from src.metrics import metrics
+from src.vad import VoiceActivityDetector
+from src.words import WordWriter, keep_result, transcript_text
+from src.batch import (BatchTranscriber, BatchWriter, LongFileTranscriber, collect_inputs,
+                       format_timestamp, input_root, output_path)
+
+_IMPORT_TIME = time.perf_counter() - _START
+
+# Components are imported and built on first use: (module, class)
+COMPONENTS = {
+    "mic": ("src.mic", "MicrophoneHandler"),
+    "stt": ("src.stt", "SpeechToText"),
+    "nlp": ("src.nlp", "NLPHandler"),
+    "tts": ("src.tts", "TextToSpeech"),
+}
 
 def create_cli():
     """Create command line interface parser."""
     parser = argparse.ArgumentParser(description="AI Assistant with speech recognition")
-    parser.add_argument('--mode', choices=['interactive', 'file'], default='interactive',
-                       help='Run in interactive or file transcription mode')
-    parser.add_argument('--input', type=Path, help='Input WAV file to transcribe')
-    parser.add_argument('--output', type=Path, help='Output text file for transcription')
+    parser.add_argument('--mode', choices=['interactive', 'file', 'batch', 'long', 'llm-bench',
+                                           'server', 'calibrate'],
+                       default='interactive',
+                       help='Run in interactive, file, batch or long-file transcription mode, '
+                            'benchmark LLM backends, serve streaming transcription, or '
+                            'calibrate chunk and thread settings for this host')
+    parser.add_argument('--config', default=None,
+                       help='Settings file (JSON) or profile name: ' + ', '.join(PROFILES) +
+                            '. Options below override it')
+    parser.add_argument('--input', type=Path,
+                       help='Input WAV file to transcribe (batch mode: directory or glob)')
+    parser.add_argument('--output', type=Path,
+                       help='Output text file (batch mode: output directory or .jsonl file; '
+                            'calibrate mode: settings file, default config.json)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes for batch/long mode, decoding threads for '
+                            'server mode (default: CPU count)')
+    parser.add_argument('--words', type=Path, default=None,
+                       help='Word timing and confidence sidecar: .jsonl (one line per segment) '
+                            'or .tsv (one row per word); batch mode: directory of sidecars')
+    parser.add_argument('--words-format', choices=['jsonl', 'tsv'], default='jsonl',
+                       help='Sidecar format in batch mode (default: jsonl)')
+    parser.add_argument('--min-confidence', type=float, default=None,
+                       help='Drop segments whose mean word confidence is below this (0-1)')
+    parser.add_argument('--window', type=float, default=None,
+                       help='Segment length in seconds for long mode (default: 30)')
+    parser.add_argument('--overlap', type=float, default=None,
+                       help='Segment overlap in seconds for long mode (default: 1)')
+    parser.add_argument('--fixed-windows', action='store_true',
+                       help='Split long files at fixed windows instead of silences')
+    parser.add_argument('--host', default='127.0.0.1',
+                       help='Address for server mode to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=2700,
+                       help='Port for server mode (default: 2700)')
+    parser.add_argument('--max-sessions', type=int, default=None,
+                       help='Concurrent streams admitted in server mode (default: 4 per worker)')
+    parser.add_argument('--mic-spill', type=Path, default=None,
+                       help='WAV file that receives all captured microphone audio, so '
+                            'recordings are not limited to the capture buffer')
+    parser.add_argument('--denoise', action='store_true', default=None,
+                       help='Suppress background noise in microphone and file audio')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging')
-    parser.add_argument('--model', default='models/vosk-model-small-en-us-0.15',
+    parser.add_argument('--model', default=None,
                        help='Path to speech recognition model')
-    parser.add_argument('--voice', type=str, 
-                       default="HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Speech\\Voices\\Tokens\\TTS_MS_EN-US_ZIRA_11.0",
-                       help='Windows TTS voice to use')
-    parser.add_argument('--rate', type=int, default=175,
+    parser.add_argument('--llm-model', default=None,
+                       help='Hugging Face model id or path for the language model')
+    parser.add_argument('--llm-backend', choices=['auto', 'fp16', 'bf16', 'int8', 'fp32'],
+                       default=None,
+                       help='LLM inference backend (default: fp16 on GPU, bf16 on CPU)')
+    parser.add_argument('--llm-threads', type=int, default=None,
+                       help='Intra-op threads for CPU inference')
+    parser.add_argument('--decoding', choices=['greedy', 'sample', 'beam', 'assisted'],
+                       default=None, help='LLM decoding profile (default: sample)')
+    parser.add_argument('--draft-model', default=None,
+                       help='Small draft model for the assisted decoding profile')
+    parser.add_argument('--llm-backends', default='fp16,bf16,int8',
+                       help='Comma-separated backends compared in llm-bench mode')
+    parser.add_argument('--llm-profiles', default='greedy',
+                       help='Comma-separated decoding profiles compared in llm-bench mode')
+    parser.add_argument('--response-cache', type=Path, default=None,
+                       help='JSON file that keeps cached LLM responses across restarts')
+    parser.add_argument('--transcript-cache', type=Path, default=None,
+                       help='SQLite cache of finished transcripts and long-job checkpoints '
+                            '(default: cache/transcripts.sqlite)')
+    parser.add_argument('--no-transcript-cache', action='store_true',
+                       help='Always decode, and do not checkpoint long jobs')
+    parser.add_argument('--no-response-cache', action='store_true',
+                       help='Always run the LLM, even for repeated queries')
+    parser.add_argument('--voice', type=str, default=None,
+                       help='TTS voice id, e.g. HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Speech'
+                            '\\Voices\\Tokens\\TTS_MS_EN-US_ZIRA_11.0 (default: system voice)')
+    parser.add_argument('--rate', type=int, default=None,
                        help='Speech rate (default: 175)')
+    parser.add_argument('--no-barge-in', action='store_true',
+                       help='Do not interrupt replies when the user starts speaking')
+    parser.add_argument('--speculative', action='store_true',
+                       help='Start replying from stable partial transcripts before speech ends')
+    parser.add_argument('--no-warm-up', action='store_true',
+                       help='Do not preload models in the background in interactive mode')
+    parser.add_argument('--startup-report', action='store_true',
+                       help='Print import and component load times on exit')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                       help='Serve Prometheus metrics on this local port')
+    parser.add_argument('--metrics-file', type=Path, default=None,
+                       help='Append per-utterance timings and a final summary to this JSONL file')
+    parser.add_argument('--profile', choices=['cprofile', 'torch'], default=None,
+                       help='Profile the session with cProfile (all threads) or the torch profiler')
+    parser.add_argument('--profile-output', type=Path, default=None,
+                       help='Profile output file (default: profile.prof or profile.trace.json)')
     return parser
 
-class AIAssistant:
-    def __init__(self, voice_id: str = None, rate: int = 175):
-        """Initialize all components of the AI assistant."""
+@contextmanager
+def profiled(kind: str = None, output: Path = None):
+    """Profile the enclosed block and write the result to ``output``.
+
+    "cprofile" profiles every thread started inside the block and writes
+    merged pstats; "torch" writes a Chrome trace of torch operators.
+    """
+    if kind is None:
+        yield
+        return
+    if kind == "torch":
+        import torch
+        output = output or Path("profile.trace.json")
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+        profiler.start()
         try:
-            self.console = Console()
-            
-            self.mic = MicrophoneHandler()
-            logging.info("Microphone initialized")
-            
-            self.stt = SpeechToText()
-            logging.info("Speech-to-text initialized")
-            
-            # Use a different model that's publicly available
-            # Change this line in AIAssistant.__init__()
-            self.nlp = NLPHandler(model_name="TheBloke/Llama-2-7b-chat-ggml")
-            logging.info("NLP handler initialized with OPT model")
-            
-            self.tts = TextToSpeech(voice_id=voice_id, rate=rate)
-            logging.info("Text-to-speech initialized")
-            
-            logging.info("AI Assistant initialized successfully")
-        except Exception as e:
-            logging.error(f"Error initializing AI Assistant: {e}")
-            raise
+            yield
+        finally:
+            profiler.stop()
+            profiler.export_chrome_trace(str(output))
+            logging.info(f"Wrote torch profile to {output}")
+        return
+
+    import cProfile
+    import pstats
+    output = output or Path("profile.prof")
+    profiles = [cProfile.Profile()]
+
+    def profile_thread(*args):
+        # Runs on the first event of each new thread and swaps in a profiler
+        profile = cProfile.Profile()
+        profiles.append(profile)
+        profile.enable()
+
+    threading.setprofile(profile_thread)
+    profiles[0].enable()
+    try:
+        yield
+    finally:
+        profiles[0].disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(str(output))
+        logging.info(f"Wrote cProfile stats for {len(profiles)} threads to {output}")
+
+class AIAssistant:
+    def __init__(self, config: Config = None, **overrides):
+        """Initialize the AI assistant.
+
+        Components are loaded lazily on first access, so each mode only pays
+        for what it uses (file mode never touches the microphone or the LLM).
+        Every component is built from the one ``Config``. Repeated queries
+        are answered from a response cache, and transcripts of unchanged
+        files are reused from the transcript cache.
+
+        Args:
+            config (Config): Settings for all components (default: ``Config()``)
+            **overrides: Config fields to change, e.g. ``decoding="greedy"``
+        """
+        self.config = config = (config or Config()).replace(**overrides)
+        self.console = Console()
+        self.vad = VoiceActivityDetector(sample_rate=config.sample_rate,
+                                         hangover_ms=config.vad_hangover_ms,
+                                         max_utterance_ms=config.vad_max_utterance_ms)
+        self.response_cache = ResponseCache(
+            max_entries=config.response_cache_entries, max_bytes=config.response_cache_bytes,
+            ttl=config.response_cache_ttl,
+            path=config.response_cache_path) if config.cache_responses else None
+        self._transcript_cache = None
 
-    def transcribe_file(self, input_path: Path, output_path: Path):
-        """Transcribe an audio file with progress bar."""
+        self._component_args = {
+            "mic": {"rate": config.sample_rate, "chunk_size": config.chunk_size,
+                    "channels": config.channels, "buffer_seconds": config.mic_buffer_seconds,
+                    "spill_path": config.mic_spill_path,
+                    "denoise": config.denoise, "noise_floor": config.denoise_gain_floor},
+            "stt": {"model_path": str(config.model_path), "sample_rate": config.sample_rate,
+                    "denoise": config.denoise, "chunk_frames": config.file_chunk_frames,
+                    "noise_floor": config.denoise_gain_floor},
+            "nlp": {"model_name": config.llm_model, "backend": config.llm_backend,
+                    "num_threads": config.llm_threads, "decoding": config.decoding,
+                    "draft_model": config.draft_model, "response_cache": self.response_cache,
+                    "max_new_tokens": config.max_new_tokens, "temperature": config.temperature,
+                    "top_p": config.top_p, "repetition_penalty": config.repetition_penalty},
+            "tts": {"voice_id": config.voice_id, "rate": config.tts_rate,
+                    "cache_dir": str(config.tts_cache_dir) if config.tts_cache_dir else None,
+                    "cache_max_bytes": config.tts_cache_bytes},
+        }
+        self._components = {}
+        self._locks = {name: threading.Lock() for name in COMPONENTS}
+        self.timings = {"import src.main": _IMPORT_TIME}
+
+    @property
+    def mic(self):
+        return self._load("mic")
+
+    @property
+    def stt(self):
+        return self._load("stt")
+
+    @property
+    def nlp(self):
+        return self._load("nlp")
+
+    @property
+    def tts(self):
+        return self._load("tts")
+
+    @property
+    def transcript_cache(self):
+        if self._transcript_cache is None and self.config.transcript_cache_path:
+            self._transcript_cache = TranscriptCache(self.config.transcript_cache_path)
+        return self._transcript_cache
+
+    def _transcript_key(self, input_path: Path, kind: str, *settings):
+        """Cache key for a file's transcript, or None with caching disabled.
+
+        The denoise settings are always part of the key, since they change
+        what the recognizer hears.
+        """
+        if self.transcript_cache is None:
+            return None
+        denoise = (True, self.config.denoise_gain_floor) if self.config.denoise else (False,)
+        return self.transcript_cache.key(input_path, kind, os.path.abspath(self.config.model_path),
+                                         self.config.sample_rate, *settings, *denoise)
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether a component has been built yet."""
+        return name in self._components
+
+    def _load(self, name: str):
+        """Import and build a component once, timing both steps."""
+        with self._locks[name]:
+            if name not in self._components:
+                module_name, class_name = COMPONENTS[name]
+                try:
+                    start = time.perf_counter()
+                    module = importlib.import_module(module_name)
+                    imported = time.perf_counter()
+                    self._components[name] = getattr(module, class_name)(**self._component_args[name])
+                    ready = time.perf_counter()
+                except Exception as e:
+                    logging.error(f"Error initializing {class_name}: {e}")
+                    raise
+                self.timings[f"import {module_name}"] = imported - start
+                self.timings[f"init {name}"] = ready - imported
+                self.timings[f"{name} ready (since start)"] = ready - _START
+                logging.info(f"{class_name} initialized in {ready - start:.2f}s")
+        return self._components[name]
+
+    def warm_up(self, names=("stt", "tts", "nlp")) -> threading.Thread:
+        """Preload components on a background thread.
+
+        Returns:
+            threading.Thread: The warm-up thread
+        """
+        def load():
+            for name in names:
+                try:
+                    self._load(name)
+                except Exception:
+                    return
+
+        thread = threading.Thread(target=load, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def startup_report(self) -> None:
+        """Print import and initialization times."""
+        table = Table(title="Startup timings")
+        table.add_column("Step")
+        table.add_column("Seconds", justify="right")
+        for step, seconds in self.timings.items():
+            table.add_row(step, f"{seconds:.3f}")
+        self.console.print(table)
+
+    def transcribe_file(self, input_path: Path, output_path: Path, words_path: Path = None):
+        """Transcribe an audio file with progress bar.
+
+        A file transcribed before with the same model and settings is
+        answered from the transcript cache without loading the model. With
+        ``words_path``, word timings and confidences are streamed to a
+        sidecar as each segment is recognized. Segments below
+        ``config.min_confidence`` are left out of both outputs.
+        """
         if not input_path.exists():
             raise FileNotFoundError(f"Input file not found: {input_path}")
+        key = self._transcript_key(input_path, "file")
+        cached = self.transcript_cache.get(key) if key else None
             
         with Progress(
             SpinnerColumn(),
@@ -62,40 +327,308 @@ class AIAssistant:
             console=self.console
         ) as progress:
             task = progress.add_task("Transcribing...", total=None)
+            out = open(output_path, "w", encoding="utf-8") if output_path else None
+            words = WordWriter(words_path) if words_path else None
             try:
-                text = self.stt.transcribe_wav(str(input_path))
+                # Write each final result as soon as it is recognized
+                results = []
+                for result in cached if cached is not None else self.stt.stream_wav(str(input_path)):
+                    results.append(result)
+                    if not keep_result(result, self.config.min_confidence):
+                        continue
+                    if words:
+                        words.write(result)
+                    if out:
+                        out.write(result["text"] + "\n")
+                        out.flush()
+                    else:
+                        self.console.print(f"[yellow]Transcription:[/] {result['text']}")
                 progress.update(task, completed=100)
-                
+                if cached is not None:
+                    logging.info(f"Unchanged since last run, used cached transcript: {input_path}")
+                elif key:
+                    self.transcript_cache.put(key, results)
+
                 if output_path:
-                    output_path.write_text(text)
                     self.console.print(f"[green]Transcription saved to {output_path}[/]")
-                else:
-                    self.console.print(f"[yellow]Transcription:[/] {text}")
+                if words:
+                    self.console.print(f"[green]Word timings saved to {words_path}[/]")
             except Exception as e:
                 self.console.print(f"[red]Error transcribing file: {e}[/]")
                 raise
+            finally:
+                if out:
+                    out.close()
+                if words:
+                    words.close()
+
+    def transcribe_batch(self, source: Path, output: Path = None, workers: int = None,
+                         words_dir: Path = None, words_format: str = "jsonl"):
+        """Transcribe a directory or glob of WAV files across a process pool.
 
-    def run(self):
-        """Run interactive mode."""
+        With ``words_dir``, each file also gets a ``<stem>.words.<format>``
+        sidecar of word timings and confidences, written from the decode
+        results as each file finishes. Outputs mirror each input's path
+        below ``source``.
+        """
+        files = collect_inputs(source)
+        if not files:
+            raise FileNotFoundError(f"No WAV files found for: {source}")
+
+        transcriber = BatchTranscriber(model_path=self.config.model_path,
+                                       sample_rate=self.config.sample_rate,
+                                       workers=workers or self.config.workers,
+                                       chunk_frames=self.config.file_chunk_frames,
+                                       denoise=self.config.denoise,
+                                       noise_floor=self.config.denoise_gain_floor)
+        root = input_root(source)
+        writer = BatchWriter(output, root)
+        failed = 0
+        # Unchanged files are answered from the cache; only the rest are decoded.
+        # Workers decode exactly as file mode does, so they share its cache entries.
+        keys = {str(f): self._transcript_key(f, "file") for f in files}
+        cached = {f: self.transcript_cache.get(key) for f, key in keys.items() if key}
+        cached = {f: results for f, results in cached.items() if results is not None}
+        pending = [f for f in files if str(f) not in cached]
+        if cached:
+            logging.info(f"{len(cached)} of {len(files)} files unchanged, using cached transcripts")
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TimeElapsedColumn(),
+            console=self.console
+        ) as progress:
+            task = progress.add_task("Transcribing...", total=len(files))
+            try:
+                decoded = transcriber.run(pending) if pending else ()
+                for wav_file, results, error in itertools.chain(
+                        ((f, results, None) for f, results in cached.items()), decoded):
+                    text = ""
+                    if error:
+                        failed += 1
+                        logging.error(f"Error transcribing {wav_file}: {error}")
+                    else:
+                        if wav_file not in cached and keys[wav_file]:
+                            self.transcript_cache.put(keys[wav_file], results)
+                        kept = [r for r in results if keep_result(r, self.config.min_confidence)]
+                        text = transcript_text(kept)
+                        if output is None:
+                            self.console.print(f"[yellow]{wav_file}:[/] {text}")
+                        if words_dir:
+                            sidecar = output_path(wav_file, root, words_dir, f".words.{words_format}")
+                            with WordWriter(sidecar, words_format) as words:
+                                for result in kept:
+                                    words.write(result)
+                    writer.write(wav_file, text, error)
+                    progress.advance(task)
+            finally:
+                writer.close()
+
+        self.console.print(f"[green]Transcribed {len(files) - failed}/{len(files)} files[/]")
+
+    def transcribe_long(self, input_path: Path, output_path: Path = None, workers: int = None,
+                        window: float = None, overlap: float = None,
+                        split_on_silence: bool = True, words_path: Path = None):
+        """Transcribe one long file as parallel segments with timestamps.
+
+        Each finished segment is checkpointed in the transcript cache, so a
+        run that was interrupted resumes with the segments still missing.
+        As in file mode, segments below ``config.min_confidence`` are left
+        out and ``words_path`` gets a sidecar of word timings and confidences.
+        """
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+        window = window or self.config.segment_window
+        overlap = self.config.segment_overlap if overlap is None else overlap
+
+        key = self._transcript_key(input_path, "long", window, overlap, split_on_silence)
+        results = self.transcript_cache.get(key) if key else None
+        if results is not None:
+            logging.info(f"Unchanged since last run, used cached transcript: {input_path}")
+        else:
+            results = self._transcribe_long_segments(input_path, key, workers, window, overlap,
+                                                     split_on_silence)
+        results = [seg for seg in results if keep_result(seg, self.config.min_confidence)]
+        if words_path:
+            with WordWriter(words_path) as words:
+                for segment in results:
+                    words.write(segment)
+            self.console.print(f"[green]Word timings saved to {words_path}[/]")
+
+        if output_path and output_path.suffix.lower() == ".jsonl":
+            with open(output_path, "w", encoding="utf-8") as f:
+                for segment in results:
+                    f.write(json.dumps(segment) + "\n")
+        else:
+            lines = [f"[{format_timestamp(seg['start'])} - {format_timestamp(seg['end'])}] {seg['text']}"
+                     for seg in results if seg["text"]]
+            if output_path:
+                output_path.write_text("\n".join(lines))
+            else:
+                for line in lines:
+                    self.console.print(line)
+        if output_path:
+            self.console.print(f"[green]Transcription saved to {output_path}[/]")
+
+    def serve(self, host: str = "127.0.0.1", port: int = 2700, workers: int = None,
+              max_sessions: int = None):
+        """Serve streaming transcription over WebSocket until interrupted."""
+        from src.server import TranscriptionServer
+        from src.stt import get_recognizer_pool
+
+        pool = get_recognizer_pool(self.config.model_path, self.config.sample_rate)
+        server = TranscriptionServer(pool, workers=workers or self.config.workers,
+                                     max_sessions=max_sessions or self.config.max_sessions)
+        self.console.print(f"[green]Serving transcription on ws://{host}:{port}[/]")
+        server.run(host, port)
+
+    def _transcribe_long_segments(self, input_path: Path, key, workers, window, overlap,
+                                  split_on_silence) -> list:
+        transcriber = LongFileTranscriber(model_path=self.config.model_path,
+                                          sample_rate=self.config.sample_rate,
+                                          workers=workers or self.config.workers,
+                                          window=window, overlap=overlap,
+                                          split_on_silence=split_on_silence,
+                                          chunk_frames=self.config.file_chunk_frames,
+                                          denoise=self.config.denoise,
+                                          noise_floor=self.config.denoise_gain_floor)
+        segments = transcriber.plan(str(input_path))
+        cache = self.transcript_cache if key else None
+        completed = cache.segments(key) if cache else {}
+        if completed:
+            self.console.print(f"[blue]Resuming: {len(completed)}/{len(segments)} "
+                               f"segments already transcribed[/]")
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TimeElapsedColumn(),
+            console=self.console
+        ) as progress:
+            task = progress.add_task("Transcribing segments...", total=len(segments))
+            results = transcriber.run(
+                str(input_path), segments, on_segment=lambda i: progress.advance(task),
+                completed=completed,
+                on_result=(lambda i, words: cache.put_segment(key, i, words)) if cache else None)
+        if cache:
+            cache.put(key, results)
+        return results
+
+    def calibrate(self, output: Path) -> Config:
+        """Benchmark this host and save the best chunk and thread settings."""
+        from src.calibrate import calibrate
+
+        config, table = calibrate(self.config)
+        config.save(output)
+        self.console.print(table)
+        self.console.print(f"[green]Calibrated settings saved to {output}; "
+                           f"use them with --config {output}[/]")
+        return config
+
+    def benchmark_llm(self, backends, profiles=("greedy",)) -> None:
+        """Compare latency and throughput across LLM backends and decoding profiles."""
+        import gc
+        from src.nlp import NLPHandler
+
+        args = self._component_args["nlp"]
+        table = Table(title=f"LLM throughput: {args['model_name']}")
+        for column in ("Backend", "Profile", "Device", "Threads", "Prefill (s)", "Latency (s)",
+                       "Tokens/s", "Speedup"):
+            table.add_column(column, justify="right")
+        baseline = None
+        for backend in backends:
+            try:
+                nlp = NLPHandler(**dict(args, backend=backend))
+            except Exception as e:
+                logging.error(f"Backend {backend} failed: {e}")
+                continue
+            for profile in profiles:
+                try:
+                    stats = nlp.benchmark(profile=profile)
+                except Exception as e:
+                    logging.error(f"Profile {profile} on {backend} failed: {e}")
+                    continue
+                baseline = baseline or stats["decode_tokens_per_s"]
+                table.add_row(stats["backend"], stats["profile"], stats["device"],
+                              str(stats["threads"]), f"{stats['prefill_s']:.3f}",
+                              f"{stats['total_s']:.3f}", f"{stats['decode_tokens_per_s']:.1f}",
+                              f"{stats['decode_tokens_per_s'] / baseline:.2f}x")
+            del nlp
+            gc.collect()
+        self.console.print(table)
+
+    def run(self, barge_in: bool = True, warm_up: bool = True, speculative: bool = False,
+            stop_event: threading.Event = None):
+        """Run interactive mode with capture, STT, NLP and TTS in concurrent stages.
+
+        Runs until Ctrl+C, or until ``stop_event`` is set.
+        """
         self.console.print("[blue]Starting interactive mode... Press Ctrl+C to exit[/]")
-        try:
+        if warm_up:
+            # Load models while the ring buffer already captures the user's speech
+            self.warm_up()
             self.mic.start_recording()
-            while True:
-                audio_data = self.mic.get_audio()
-                if audio_data:
-                    text = self.stt.transcribe_audio(audio_data)
-                    if text and text.strip():  # Only process non-empty text
-                        self.console.print(f"[green]You:[/] {text}")
-                        response = self.nlp.process_input(text)
-                        if response and response.strip():
-                            # Clean up the response
-                            response = response.replace("Human:", "").replace("Assistant:", "").strip()
-                            self.console.print(f"[blue]AI:[/] {response}")
-                            self.tts.speak(response)
+            self.console.print("[yellow]Loading models... you can start speaking[/]")
+        from src.pipeline import Pipeline
+        pipeline = Pipeline(
+            self.mic, self.stt, self.nlp, self.tts, self.vad,
+            queue_size=self.config.queue_size,
+            stable_ms=self.config.stable_ms,
+            barge_in=barge_in,
+            speculative=speculative,
+            on_transcript=lambda text: self.console.print(f"[green]You:[/] {text}"),
+            on_response=lambda text: self.console.print(f"[blue]AI:[/] {text}")
+        )
+        try:
+            pipeline.start()
+            self.timings["interactive ready (since start)"] = time.perf_counter() - _START
+            stop_event = stop_event or threading.Event()
+            while not stop_event.wait(1):
+                logging.debug(f"Queue depths: {pipeline.queue_depths()}")
         except KeyboardInterrupt:
             self.console.print("\n[yellow]Stopping recording...[/]")
         finally:
-            self.mic.stop_recording()
+            pipeline.stop()
+            self.tts.close()
+            if speculative:
+                logging.info(f"Speculation: {pipeline.speculation_stats}")
+            if self.is_loaded("nlp"):
+                logging.info(f"LLM profiles: {self.nlp.profile_report()}")
+            if self.response_cache is not None:
+                logging.info(f"Response cache: {self.response_cache.stats()}")
+                self.response_cache.save()
+
+def config_from_args(args) -> Config:
+    """Load ``--config`` and apply the command-line options that were given."""
+    config = Config.load(args.config) if args.config else Config()
+    overrides = {
+        "model_path": args.model,
+        "workers": args.workers,
+        "segment_window": args.window,
+        "segment_overlap": args.overlap,
+        "max_sessions": args.max_sessions,
+        "mic_spill_path": args.mic_spill,
+        "min_confidence": args.min_confidence,
+        "denoise": args.denoise,
+        "llm_model": args.llm_model,
+        "llm_backend": args.llm_backend,
+        "llm_threads": args.llm_threads,
+        "decoding": args.decoding,
+        "draft_model": args.draft_model,
+        "response_cache_path": args.response_cache,
+        "transcript_cache_path": args.transcript_cache,
+        "voice_id": args.voice,
+        "tts_rate": args.rate,
+    }
+    config = config.replace(**{k: v for k, v in overrides.items() if v is not None})
+    if args.no_response_cache:
+        config = config.replace(cache_responses=False)
+    if args.no_transcript_cache:
+        config = config.replace(transcript_cache_path=None)
+    return config
 
 def main():
     """Main entry point."""
@@ -113,19 +646,49 @@ def main():
         ]
     )
 
+    if args.metrics_file:
+        metrics.open_jsonl(args.metrics_file)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    assistant = None
     try:
-        assistant = AIAssistant(voice_id=args.voice, rate=args.rate)
-        if args.mode == 'file':
-            if not args.input:
-                raise ValueError("Input file required for file mode")
-            assistant.transcribe_file(args.input, args.output)
-        else:
-            assistant.run()
+        assistant = AIAssistant(config_from_args(args))
+        assistant.timings["cli ready (since start)"] = time.perf_counter() - _START
+        with profiled(args.profile, args.profile_output):
+            if args.mode == 'file':
+                if not args.input:
+                    raise ValueError("Input file required for file mode")
+                assistant.transcribe_file(args.input, args.output, words_path=args.words)
+            elif args.mode == 'batch':
+                if not args.input:
+                    raise ValueError("Input directory or glob required for batch mode")
+                assistant.transcribe_batch(args.input, args.output, words_dir=args.words,
+                                           words_format=args.words_format)
+            elif args.mode == 'server':
+                assistant.serve(args.host, args.port)
+            elif args.mode == 'calibrate':
+                assistant.calibrate(args.output or Path("config.json"))
+            elif args.mode == 'llm-bench':
+                assistant.benchmark_llm(args.llm_backends.split(','), args.llm_profiles.split(','))
+            elif args.mode == 'long':
+                if not args.input:
+                    raise ValueError("Input file required for long mode")
+                assistant.transcribe_long(args.input, args.output,
+                                          split_on_silence=not args.fixed_windows,
+                                          words_path=args.words)
+            else:
+                assistant.run(barge_in=not args.no_barge_in, warm_up=not args.no_warm_up,
+                              speculative=args.speculative)
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
         logging.error(f"Error: {e}")
         return 1
+    finally:
+        if args.startup_report and assistant is not None:
+            assistant.startup_report()
+        metrics.close()
     return 0
 
 if __name__ == "__main__":
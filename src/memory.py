@@ -0,0 +1,94 @@
+import logging
+from typing import List, Optional
+import numpy as np
+
+class ConversationMemory:
+    def __init__(self, tokenizer, max_context: int = 2048, reserve: int = 256):
+        """Conversation history stored as token ids, tokenized once per turn.
+
+        The prompt is built from the most recent turns that fit in
+        ``max_context - reserve`` tokens, leaving ``reserve`` tokens for the
+        reply. Assistant turns keep the exact ids the model generated, so each
+        new prompt starts with the same tokens as the previous
+        prompt-plus-reply and the model's key/value cache stays reusable.
+
+        Args:
+            tokenizer: Hugging Face tokenizer
+            max_context (int): Model context length in tokens
+            reserve (int): Tokens kept free for generation
+        """
+        self.tokenizer = tokenizer
+        self.max_context = max_context
+        self.reserve = reserve
+        # uint16 halves storage for vocabularies that fit in it
+        self.dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max else np.int32
+
+        self.prefix_ids = self._encode("", add_special_tokens=True)
+        self.user_prefix = self._encode("Human:")
+        self.assistant_prefix = self._encode("Assistant:")
+        self.separator = self._encode("\n")
+        self.stop_ids = {i for i in (tokenizer.eos_token_id, tokenizer.pad_token_id) if i is not None}
+
+        self.turns = []  # (role, content, token ids)
+        self._start = 0  # index of the oldest turn in the context window
+
+    def _encode(self, text: str, add_special_tokens: bool = False) -> np.ndarray:
+        ids = self.tokenizer(text, add_special_tokens=add_special_tokens)["input_ids"]
+        return np.asarray(ids, dtype=self.dtype)
+
+    @property
+    def budget(self) -> int:
+        """Tokens available for history in the prompt."""
+        return self.max_context - self.reserve - len(self.prefix_ids) - len(self.assistant_prefix)
+
+    def add_user(self, content: str) -> None:
+        """Tokenize and store a user turn."""
+        ids = np.concatenate([self.user_prefix, self._encode(f" {content}"), self.separator])
+        self.turns.append(("user", content, ids.astype(self.dtype)))
+
+    def add_assistant(self, content: str, generated_ids: Optional[List[int]] = None) -> None:
+        """Store an assistant turn, reusing the generated ids when available."""
+        if generated_ids is None:
+            body = self._encode(f" {content}")
+        else:
+            body = np.asarray([i for i in generated_ids if i not in self.stop_ids], dtype=self.dtype)
+        ids = np.concatenate([self.assistant_prefix, body, self.separator])
+        self.turns.append(("assistant", content, ids.astype(self.dtype)))
+
+    def build(self) -> List[int]:
+        """Build prompt ids from the newest turns that fit in the budget.
+
+        When the window has to slide, it drops turns down to three quarters of
+        the budget, so the cache-invalidating shift happens rarely.
+        """
+        lengths = [len(ids) for _, _, ids in self.turns]
+        total = sum(lengths[self._start:])
+        if total > self.budget:
+            target = self.budget * 3 // 4
+            while self._start < len(self.turns) - 1 and total > target:
+                total -= lengths[self._start]
+                self._start += 1
+            logging.debug(f"Context window now starts at turn {self._start}")
+
+        parts = [self.prefix_ids]
+        parts.extend(ids for _, _, ids in self.turns[self._start:])
+        parts.append(self.assistant_prefix)
+        ids = np.concatenate(parts).astype(np.int64)
+        # A single oversized turn still has to fit
+        limit = self.max_context - self.reserve
+        if len(ids) > limit:
+            ids = np.concatenate([self.prefix_ids.astype(np.int64), ids[len(ids) - limit + len(self.prefix_ids):]])
+        return ids.tolist()
+
+    def messages(self) -> List[dict]:
+        """Full history as ``{"role", "content"}`` dicts."""
+        return [{"role": role, "content": content} for role, content, _ in self.turns]
+
+    def truncate(self, length: int) -> None:
+        """Drop turns after the first ``length``, e.g. to undo a speculative turn."""
+        del self.turns[length:]
+        self._start = min(self._start, max(0, len(self.turns) - 1))
+
+    def clear(self) -> None:
+        self.turns = []
+        self._start = 0
@@ -0,0 +1,173 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Sequence
+
+# Bucket upper bounds for durations in seconds, roughly 1-2.5-5 per decade
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+# Bucket upper bounds for ratios and rates (real-time factor, tokens per second)
+RATE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0)
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = TIME_BUCKETS):
+        """Fixed-bucket histogram; observing is a bisect and two additions.
+
+        Args:
+            buckets (sequence): Sorted bucket upper bounds
+        """
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+class Metrics:
+    def __init__(self):
+        """Process-wide registry of latency histograms and utterance events.
+
+        Components observe into named histograms; the pipeline adds one
+        event per utterance. Histograms can be scraped in Prometheus text
+        format, and events (plus a final summary) appended to a JSONL file.
+        """
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self._server = None
+
+    def histogram(self, name: str, buckets: Sequence[float] = TIME_BUCKETS) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(buckets))
+        return histogram
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = TIME_BUCKETS) -> None:
+        """Record a value in the named histogram."""
+        self.histogram(name, buckets).observe(value)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block into the ``name`` histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def event(self, kind: str, **fields) -> None:
+        """Append a record to the JSONL export, if one is open."""
+        if self._jsonl is None:
+            return
+        line = json.dumps({"time": time.time(), "event": kind, **fields})
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.write(line + "\n")
+                self._jsonl.flush()
+
+    def summary(self) -> dict:
+        return {
+            "histograms": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def prometheus_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum {histogram.sum}")
+            lines.append(f"{name}_count {histogram.count}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def open_jsonl(self, path: Path) -> None:
+        """Start appending events to a JSONL file."""
+        self._jsonl = open(path, "a", encoding="utf-8")
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Serve ``/metrics`` in Prometheus text format on a background thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{self._server.server_port}/metrics")
+
+    def close(self) -> None:
+        """Write a final summary and stop exporting."""
+        if self._jsonl:
+            self.event("summary", **self.summary())
+            with self._lock:
+                self._jsonl.close()
+                self._jsonl = None
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+# Shared by every component in the process
+metrics = Metrics()
@@ -1,30 +1,49 @@
-import pyaudio
 import wave
 import numpy as np
 import threading
+import time
 import logging
+import shutil
 from pathlib import Path
+from .audio import NoiseSuppressor
+from .metrics import metrics
+from .ringbuffer import RingBuffer, WavSpillWriter
 
 class MicrophoneHandler:
-    def __init__(self, rate=16000, chunk_size=1024, channels=1):
+    def __init__(self, rate=16000, chunk_size=1024, channels=1, buffer_seconds=30,
+                 spill_path=None, denoise=False, noise_floor=0.1):
         """Initialize microphone handler.
         
         Args:
             rate (int): Sample rate
             chunk_size (int): Recording chunk size
             channels (int): Number of audio channels
+            buffer_seconds (float): Capacity of the capture ring buffer; without a
+                spill file, a recording is cut off once this much audio is unread
+            spill_path (str): Optional WAV file that receives all captured audio
+            denoise (bool): Suppress background noise on the capture thread (mono only)
+            noise_floor (float): Lowest gain the noise suppressor applies
         """
         self.rate = rate
         self.chunk_size = chunk_size
         self.channels = channels
-        self.audio = pyaudio.PyAudio()
+        # Set before the import so __del__ works if PyAudio is missing
+        self.audio = None
         self.stream = None
         self.recording = False
-        self.frames = []
+        import pyaudio
+        self.audio = pyaudio.PyAudio()
+        self.buffer = RingBuffer(int(rate * channels * buffer_seconds))
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.spill = None
         self.record_thread = None
+        self._reported_overruns = 0
+        self.suppressor = (NoiseSuppressor(rate, gain_floor=noise_floor)
+                           if denoise and channels == 1 else None)
 
     def start_recording(self):
         """Start recording audio from microphone."""
+        import pyaudio
         self.stream = self.audio.open(
             format=pyaudio.paInt16,
             channels=self.channels,
@@ -32,14 +51,24 @@ class MicrophoneHandler:
             input=True,
             frames_per_buffer=self.chunk_size
         )
-        self.frames = []
+        self.buffer.clear()
+        self.buffer.overruns = 0
+        self._reported_overruns = 0
+        if self.spill_path:
+            self.spill = WavSpillWriter(self.spill_path, self.rate, self.channels)
         self.recording = True
         
         def record():
             while self.recording:
                 try:
                     data = self.stream.read(self.chunk_size)
-                    self.frames.append(data)
+                    start = time.perf_counter()
+                    if self.suppressor:
+                        data = self.suppressor.process(data)
+                    self.buffer.write(data)
+                    if self.spill:
+                        self.spill.write(data)
+                    metrics.observe("mic_chunk_processing_seconds", time.perf_counter() - start)
                 except Exception as e:
                     logging.error(f"Error recording audio: {e}")
                     break
@@ -58,22 +87,59 @@ class MicrophoneHandler:
             self.stream.close()
             self.stream = None
 
+        if self.spill:
+            self.spill.close()
+            self.spill = None
+
     def save_recording(self, filename="output.wav"):
         """Save recorded audio to WAV file.
         
+        With a spill file the full session is copied from disk; otherwise the
+        audio still held in the ring buffer is written, and a warning is
+        logged if the buffer filled up and later audio was dropped.
+
         Args:
             filename (str): Output WAV file path
         """
-        if not self.frames:
+        if self.spill_path and self.spill_path.exists():
+            if self.spill:
+                raise ValueError("Stop recording before saving the spill file")
+            if Path(filename).resolve() != self.spill_path.resolve():
+                shutil.copyfile(self.spill_path, filename)
+            return
+
+        views = self.buffer.peek()
+        if not views:
             raise ValueError("No audio data recorded")
-            
+        if self.buffer.overruns:
+            samples_per_s = self.rate * self.channels
+            logging.warning(f"Recording truncated: {self.buffer.overruns / samples_per_s:.1f}s of audio "
+                            f"did not fit the {self.buffer.capacity / samples_per_s:.0f}s buffer; "
+                            f"set a spill file (--mic-spill) to keep whole sessions")
+
         wf = wave.open(str(filename), 'wb')
         wf.setnchannels(self.channels)
-        wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
+        wf.setsampwidth(2)  # paInt16
         wf.setframerate(self.rate)
-        wf.writeframes(b''.join(self.frames))
+        for view in views:
+            wf.writeframes(view)
         wf.close()
 
+    def read_views(self, max_samples: int = None) -> tuple:
+        """Get zero-copy views of unread audio without consuming it.
+
+        Call ``release`` with the number of samples processed when done.
+
+        Returns:
+            tuple: int16 sample views (empty if no new data)
+        """
+        self._check_overruns()
+        return self.buffer.peek(max_samples)
+
+    def release(self, n: int) -> None:
+        """Mark ``n`` samples returned by ``read_views`` as consumed."""
+        self.buffer.advance(n)
+
     def get_audio(self) -> bytes:
         """Get the latest audio data.
         
@@ -82,14 +148,20 @@ class MicrophoneHandler:
         """
         if not self.recording:
             return None
-            
-        if len(self.frames) > 0:
-            # Get and clear the current frames
-            data = b''.join(self.frames)
-            self.frames.clear()
-            return data
+
+        self._check_overruns()
+        if self.buffer.available() > 0:
+            return self.buffer.read_bytes()
         return None 
 
+    def _check_overruns(self) -> None:
+        """Log samples dropped because the consumer fell behind."""
+        overruns = self.buffer.overruns
+        if overruns != self._reported_overruns:
+            logging.warning(f"Audio buffer overrun: dropped {overruns - self._reported_overruns} samples")
+            metrics.increment("mic_dropped_samples_total", overruns - self._reported_overruns)
+            self._reported_overruns = overruns
+
     def __del__(self):
         """Cleanup resources on deletion."""
         if self.recording:
@@ -97,6 +169,8 @@ class MicrophoneHandler:
         if self.audio:
             self.audio.terminate()
 
+# Run from the repository root with ``python -m src.mic``; the relative imports
+# above do not resolve when this file is run as a script
 if __name__ == "__main__":
     import time
     
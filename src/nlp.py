@@ -1,12 +1,164 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (AutoTokenizer, AutoModelForCausalLM, StoppingCriteria,
+                          StoppingCriteriaList, TextIteratorStreamer)
 import torch
 import logging
+import re
+import statistics
+import threading
+import time
+from typing import Iterator, List, Optional
+from .cache import ResponseCache
+from .memory import ConversationMemory
+from .metrics import RATE_BUCKETS, metrics
+
+class CancelCriteria(StoppingCriteria):
+    """Stop generation as soon as any of the given events is set."""
+
+    def __init__(self, *events: threading.Event):
+        self.events = [event for event in events if event is not None]
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return any(event.is_set() for event in self.events)
+
+class FirstTokenTimer(StoppingCriteria):
+    """Note when the first token comes out, i.e. when prefill has finished."""
+
+    def __init__(self):
+        self.time = None
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if self.time is None:
+            self.time = time.perf_counter()
+        return False
+
+class StopOnText(StoppingCriteria):
+    """Stop once the generated text starts a new turn, e.g. ``Human:``.
+
+    In a batch, generation stops when every row has produced a stop string
+    or an end-of-sequence token.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, stop_strings=("Human:",), window: int = 8):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_strings = stop_strings
+        self.window = window
+        self.done = []
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if len(self.done) != input_ids.shape[0]:
+            self.done = [False] * input_ids.shape[0]
+        start = max(self.prompt_length, input_ids.shape[1] - self.window)
+        eos = self.tokenizer.eos_token_id
+        for row, finished in enumerate(self.done):
+            if finished:
+                continue
+            if eos is not None and (input_ids[row, self.prompt_length:] == eos).any():
+                self.done[row] = True
+                continue
+            tail = self.tokenizer.decode(input_ids[row, start:], skip_special_tokens=True)
+            self.done[row] = any(stop in tail for stop in self.stop_strings)
+        return all(self.done)
+
+class SentenceChunker:
+    """Split streamed text into complete sentences for early TTS handoff."""
+
+    _boundary = re.compile(r"(?<=[.!?;:])[\"')\]]*\s+|\n+")
+
+    def __init__(self, min_chars: int = 12):
+        """Initialize sentence chunker.
+
+        Args:
+            min_chars (int): Shorter fragments are merged into the next sentence
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return any sentences it completes."""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in self._boundary.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text remains at the end of the stream."""
+        sentence, self.buffer = self.buffer.strip(), ""
+        return [sentence] if sentence else []
+
+# Inference backends: weight dtype to load with
+BACKENDS = {
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+    "int8": torch.float32,  # quantized after loading
+    "fp32": torch.float32,
+}
+
+# Decoding profiles: generate() settings layered over the sampling parameters
+DECODING_PROFILES = {
+    "greedy": {"do_sample": False, "num_beams": 1},
+    "sample": {"do_sample": True, "num_beams": 1},
+    "beam": {"do_sample": True, "num_beams": 4},
+    # A small draft model proposes tokens that the main model verifies
+    "assisted": {"do_sample": False, "num_beams": 1},
+}
+
+STOP_STRINGS = ("Human:",)
+
+def find_stop(text: str) -> int:
+    """Index of the first stop string in ``text``, or -1."""
+    return min((text.find(stop) for stop in STOP_STRINGS if stop in text), default=-1)
 
 class NLPHandler:
-    def __init__(self, model_name="decapoda-research/llama-7b-hf"):
-        """Initialize with a publicly available LLaMA model."""
+    def __init__(self, model_name="decapoda-research/llama-7b-hf", backend: str = "auto",
+                 num_threads: Optional[int] = None, use_safetensors: Optional[bool] = None,
+                 decoding: str = "sample", draft_model: Optional[str] = None,
+                 response_cache: Optional[ResponseCache] = None, max_new_tokens: int = 256,
+                 temperature: float = 0.7, top_p: float = 0.9,
+                 repetition_penalty: float = 1.2):
+        """Initialize with a publicly available LLaMA model.
+
+        Args:
+            model_name (str): Hugging Face model id or local path
+            backend (str): "auto", "fp16", "bf16", "int8" or "fp32". "auto" picks
+                fp16 on GPU and bf16 on CPU, where fp16 kernels are slow or missing.
+                "int8" applies dynamic quantization to Linear layers and runs on CPU.
+            num_threads (int): Intra-op threads for CPU inference (default: torch's choice)
+            use_safetensors (bool): Require memory-mapped safetensors weights
+                (default: use them when the checkpoint has them)
+            decoding (str): Decoding profile, one of ``DECODING_PROFILES``
+            draft_model (str): Small model sharing the tokenizer, required by the
+                "assisted" profile
+            response_cache (ResponseCache): Answers repeated queries without
+                running the model (default: no caching)
+            max_new_tokens (int): Longest reply in tokens
+            temperature (float): Sampling temperature for the "sample" profile
+            top_p (float): Nucleus sampling threshold for the "sample" profile
+            repetition_penalty (float): Penalty on repeating earlier tokens
+        """
         try:
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            # Checked before loading anything so a bad profile fails fast
+            if decoding not in DECODING_PROFILES:
+                raise ValueError(f"Unknown decoding profile: {decoding}")
+            if decoding == "assisted" and not draft_model:
+                raise ValueError("The assisted decoding profile needs a draft_model")
+            if backend == "auto":
+                backend = "fp16" if torch.cuda.is_available() else "bf16"
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown backend: {backend}")
+            self.backend = backend
+            self.device = "cuda" if torch.cuda.is_available() and backend != "int8" else "cpu"
+            if self.device == "cpu" and backend == "fp16":
+                logging.warning("float16 on CPU is slow; consider backend='bf16' or 'int8'")
+            if num_threads:
+                torch.set_num_threads(num_threads)
+
             self.tokenizer = AutoTokenizer.from_pretrained(
                 model_name,
                 use_fast=True,
@@ -15,67 +167,395 @@ class NLPHandler:
             self.model = AutoModelForCausalLM.from_pretrained(
                 model_name,
                 low_cpu_mem_usage=True,
-                torch_dtype=torch.float16,
+                torch_dtype=BACKENDS[backend],
+                use_safetensors=use_safetensors,
                 trust_remote_code=True
             )
-            self.model.to(self.device)
-            self.conversation_history = []
-            logging.info(f"AI Assistant initialized with model: {model_name}")
+            self.model = self._prepare_model(self.model)
+
+            self.draft_model = None
+            if draft_model:
+                self.draft_model = self._prepare_model(AutoModelForCausalLM.from_pretrained(
+                    draft_model,
+                    low_cpu_mem_usage=True,
+                    torch_dtype=BACKENDS[backend],
+                    use_safetensors=use_safetensors,
+                    trust_remote_code=True
+                ))
+                logging.info(f"Loaded draft model for assisted decoding: {draft_model}")
+            logging.info(f"AI Assistant initialized with model: {model_name} "
+                         f"({backend} on {self.device}, {torch.get_num_threads()} threads)")
+
+            # Key/value cache carried across turns so only new tokens are prefilled
+            self.reuse_cache = True
+            self._past_key_values = None
+            self._cache_ids = None
 
             # Generation parameters
-            self.max_length = 256
-            self.temperature = 0.7
-            self.top_p = 0.9
-            self.repetition_penalty = 1.2
-            self.num_beams = 4
+            self.max_new_tokens = max_new_tokens
+            self.temperature = temperature
+            self.top_p = top_p
+            self.repetition_penalty = repetition_penalty
+            self.decoding = decoding
+            # Per-profile totals: calls, seconds, generated tokens
+            self.profile_stats = {}
+            self.last_stats = {}
+
+            # Token-budgeted history; the reply budget is reserved out of the context
+            max_context = getattr(self.model.config, "max_position_embeddings", 2048)
+            self.memory = ConversationMemory(self.tokenizer, max_context=max_context,
+                                             reserve=self.max_new_tokens)
+            self.response_cache = response_cache
 
         except Exception as e:
             logging.error(f"Error initializing NLPHandler: {e}")
             raise
 
-    def process_input(self, text: str) -> str:
-        """Generate a response using the model."""
+    def _prepare_model(self, model):
+        """Apply the backend's quantization and move the model to the device."""
+        if self.backend == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.to(self.device)
+        model.eval()
+        return model
+
+    def _generation_kwargs(self, profile: Optional[str] = None) -> dict:
+        """generate() arguments for a decoding profile."""
+        profile = profile or self.decoding
+        kwargs = dict(DECODING_PROFILES[profile],
+                      max_new_tokens=self.max_new_tokens,
+                      repetition_penalty=self.repetition_penalty,
+                      pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id)
+        if kwargs["do_sample"]:
+            kwargs.update(temperature=self.temperature, top_p=self.top_p)
+        if profile == "assisted":
+            if self.draft_model is None:
+                raise ValueError("The assisted profile needs a draft_model")
+            kwargs["assistant_model"] = self.draft_model
+        return kwargs
+
+    def _record(self, profile: str, seconds: float, tokens: int,
+                prefill: Optional[float] = None) -> None:
+        """Accumulate latency and throughput for a decoding profile."""
+        stats = self.profile_stats.setdefault(profile, {"calls": 0, "seconds": 0.0, "tokens": 0})
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["tokens"] += tokens
+        logging.debug(f"{profile}: {tokens} tokens in {seconds:.2f}s "
+                      f"({tokens / max(seconds, 1e-9):.1f} tokens/s)")
+
+        self.last_stats = {"profile": profile, "generate_s": seconds, "tokens": tokens}
+        metrics.observe("llm_generate_seconds", seconds)
+        if prefill is not None:
+            # The first token comes out of the prefill pass; the rest are decode steps
+            decode_rate = (tokens - 1) / max(seconds - prefill, 1e-9)
+            self.last_stats.update(prefill_s=prefill, decode_tokens_per_s=decode_rate)
+            metrics.observe("llm_prefill_seconds", prefill)
+            if tokens > 1:
+                metrics.observe("llm_decode_tokens_per_second", decode_rate, RATE_BUCKETS)
+
+    def profile_report(self) -> dict:
+        """Mean latency and tokens per second for each decoding profile used."""
+        return {
+            profile: {
+                "calls": stats["calls"],
+                "mean_latency_s": stats["seconds"] / stats["calls"],
+                "tokens_per_s": stats["tokens"] / max(stats["seconds"], 1e-9),
+            }
+            for profile, stats in self.profile_stats.items()
+        }
+
+    def _finish(self, sequences: torch.Tensor, prompt_length: int) -> str:
+        """Decode a reply, cut it at the next turn and add it to history."""
+        generated = sequences[0, prompt_length:].tolist()
+        response = self.tokenizer.decode(generated, skip_special_tokens=True)
+        cut = find_stop(response)
+        if cut >= 0:
+            # Re-tokenize the trimmed reply so history does not carry the stop text
+            response = response[:cut].strip()
+            self.memory.add_assistant(response)
+        else:
+            response = response.strip()
+            self.memory.add_assistant(response, generated)
+        return response
+
+    def _cached_response(self, text: str) -> Optional[str]:
+        """Answer from the response cache, recording the turn on a hit."""
+        if self.response_cache is None:
+            return None
+        response = self.response_cache.get(text, self.memory.messages())
+        metrics.increment("llm_response_cache_hits_total" if response is not None
+                          else "llm_response_cache_misses_total")
+        if response is not None:
+            logging.debug(f"Response cache hit for: {text}")
+            self.last_stats = {"cached": True}
+            self.memory.add_user(text)
+            self.memory.add_assistant(response)
+        return response
+
+    def _cache_response(self, text: str, response: str) -> None:
+        """Store a finished reply keyed by the context it was generated in."""
+        if self.response_cache is not None and response:
+            # History now ends with this user turn and the reply
+            self.response_cache.put(text, self.memory.messages()[:-2], response)
+
+    def process_input(self, text: str, cancel_event: Optional[threading.Event] = None) -> str:
+        """Generate a response using the model.
+
+        Args:
+            text (str): User message
+            cancel_event (threading.Event): Stops generation early when set
+        """
+        checkpoint = self.checkpoint()
         try:
+            cached = self._cached_response(text)
+            if cached is not None:
+                return cached
+
             # Add user message to history
-            self.conversation_history.append({"role": "user", "content": text})
-            
-            # Format conversation for model
-            prompt = self._format_prompt()
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
-            
-            # Generate with improved parameters
-            outputs = self.model.generate(
-                **inputs,
-                max_length=self.max_length,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                num_beams=self.num_beams,
-                repetition_penalty=self.repetition_penalty,
-                do_sample=True
-            )
-            
-            # Extract only the new response
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            response = response.replace(prompt, "").strip()
+            self.memory.add_user(text)
+            inputs = self._build_inputs()
+            prompt_length = inputs["input_ids"].shape[1]
+            kwargs = self._generation_kwargs()
             
-            # Add to conversation history
-            self.conversation_history.append({"role": "assistant", "content": response})
+            use_cache = self._can_reuse_cache(kwargs)
+            past = self._reuse_cache(inputs["input_ids"]) if use_cache else None
+
+            first_token = FirstTokenTimer()
+            start = time.perf_counter()
+            with torch.inference_mode():
+                outputs = self.model.generate(
+                    **inputs,
+                    **kwargs,
+                    past_key_values=past,
+                    return_dict_in_generate=True,
+                    stopping_criteria=StoppingCriteriaList([
+                        StopOnText(self.tokenizer, prompt_length, STOP_STRINGS),
+                        CancelCriteria(cancel_event),
+                        first_token])
+                )
+            self._record(self.decoding, time.perf_counter() - start,
+                         outputs.sequences.shape[1] - prompt_length,
+                         first_token.time - start if first_token.time else None)
+            if use_cache:
+                self._store_cache(outputs.sequences, outputs.past_key_values)
+            if cancel_event and cancel_event.is_set():
+                # An unanswered turn would leave two user turns in a row
+                self.rollback(checkpoint)
+                return ""
             
+            # Extract only the new response and add it to history
+            response = self._finish(outputs.sequences, prompt_length)
+            self._cache_response(text, response)
             return response
             
         except Exception as e:
             logging.error(f"Error processing input: {e}")
+            self.rollback(checkpoint)
             return "I'm sorry, I had trouble processing that."
 
-    def _format_prompt(self) -> str:
-        """Format conversation history for better context."""
-        prompt = []
-        # Keep last 5 turns for context
-        for msg in self.conversation_history[-5:]:
-            role = "Human:" if msg["role"] == "user" else "Assistant:"
-            prompt.append(f"{role} {msg['content']}")
-        return "\n".join(prompt) + "\nAssistant:"
+    def stream_input(self, text: str, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Generate a response, yielding text as soon as tokens are decoded.
+
+        Generation runs on a background thread feeding a ``TextIteratorStreamer``.
+        Streaming needs a single beam, so the "beam" profile falls back to
+        "sample". Text from the next ``Human:`` turn is never yielded. Closing
+        the iterator early stops generation. A response cache hit is yielded
+        whole without running the model. A reply that is cancelled, closed
+        early or fails leaves the conversation as it was before the call.
+
+        Args:
+            text (str): User message
+            cancel_event (threading.Event): Stops generation early when set
+
+        Yields:
+            str: Decoded text fragments
+        """
+        called = time.perf_counter()
+        cached = self._cached_response(text)
+        if cached is not None:
+            yield cached
+            return
+
+        checkpoint = self.checkpoint()
+        self.memory.add_user(text)
+        inputs = self._build_inputs()
+        prompt_length = inputs["input_ids"].shape[1]
+        profile = "sample" if DECODING_PROFILES[self.decoding]["num_beams"] > 1 else self.decoding
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop = threading.Event()
+        generation_kwargs = self._generation_kwargs(profile)
+        use_cache = self._can_reuse_cache(generation_kwargs)
+        past = self._reuse_cache(inputs["input_ids"]) if use_cache else None
+        result = {}
+        first_token = FirstTokenTimer()
+        kwargs = dict(
+            **inputs,
+            **generation_kwargs,
+            past_key_values=past,
+            return_dict_in_generate=True,
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([
+                StopOnText(self.tokenizer, prompt_length, STOP_STRINGS),
+                CancelCriteria(stop, cancel_event),
+                first_token])
+        )
+
+        def generate():
+            try:
+                with torch.inference_mode():
+                    result["outputs"] = self.model.generate(**kwargs)
+            except Exception as e:
+                logging.error(f"Error processing input: {e}")
+                streamer.end()
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=generate, name="nlp-generate", daemon=True)
+        thread.start()
+        pending = ""
+        first_text = True
+        finished = False
+        try:
+            for piece in streamer:
+                if first_text:
+                    metrics.observe("llm_time_to_first_text_seconds", time.perf_counter() - called)
+                    first_text = False
+                pending += piece
+                cut = find_stop(pending)
+                if cut >= 0:
+                    if pending[:cut]:
+                        yield pending[:cut]
+                    pending = ""
+                    break
+                # Hold back text that could be the start of a stop string
+                hold = max((n for s in STOP_STRINGS for n in range(1, len(s))
+                            if pending.endswith(s[:n])), default=0)
+                if len(pending) > hold:
+                    yield pending[:len(pending) - hold]
+                    pending = pending[len(pending) - hold:]
+            if pending:
+                yield pending
+            finished = not (cancel_event and cancel_event.is_set())
+        finally:
+            stop.set()
+            thread.join()
+            if "outputs" in result:
+                sequences = result["outputs"].sequences
+                self._record(profile, time.perf_counter() - start, sequences.shape[1] - prompt_length,
+                             first_token.time - start if first_token.time else None)
+                if use_cache:
+                    self._store_cache(sequences, result["outputs"].past_key_values)
+            if not (finished and "outputs" in result):
+                # An unanswered turn would leave two user turns in a row
+                self.rollback(checkpoint)
+
+        if finished and "outputs" in result:
+            self._cache_response(text, self._finish(result["outputs"].sequences, prompt_length))
+
+    def benchmark(self, prompt: str = "Human: Tell me about the weather today.\nAssistant:",
+                  max_new_tokens: int = 64, runs: int = 3, profile: str = "greedy") -> dict:
+        """Measure prefill latency and decode throughput.
+
+        Args:
+            prompt (str): Prompt to time
+            max_new_tokens (int): Tokens generated per run
+            runs (int): Timed runs after one warm-up run
+            profile (str): Decoding profile to time
+
+        Returns:
+            dict: Median ``prefill_s``, ``decode_tokens_per_s`` and ``total_s``
+        """
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+        kwargs = dict(self._generation_kwargs(profile), max_new_tokens=max_new_tokens,
+                      min_new_tokens=max_new_tokens)
+        prefill, decode, total = [], [], []
+        with torch.inference_mode():
+            self.model.generate(**inputs, **dict(kwargs, max_new_tokens=2, min_new_tokens=2))
+            for _ in range(runs):
+                start = time.perf_counter()
+                self.model(**inputs)
+                prefilled = time.perf_counter()
+                outputs = self.model.generate(**inputs, **kwargs)
+                end = time.perf_counter()
+                generated = outputs.shape[1] - inputs["input_ids"].shape[1]
+                prefill.append(prefilled - start)
+                total.append(end - prefilled)
+                decode.append(generated / max(end - prefilled - (prefilled - start), 1e-9))
+        return {
+            "backend": self.backend,
+            "profile": profile,
+            "device": self.device,
+            "threads": torch.get_num_threads(),
+            "prefill_s": statistics.median(prefill),
+            "decode_tokens_per_s": statistics.median(decode),
+            "total_s": statistics.median(total),
+        }
+
+    @property
+    def conversation_history(self) -> List[dict]:
+        """Conversation so far as ``{"role", "content"}`` dicts."""
+        return self.memory.messages()
+
+    def _build_inputs(self) -> dict:
+        """Prompt tensors built from the token-budgeted conversation memory."""
+        self.memory.reserve = self.max_new_tokens
+        input_ids = torch.tensor([self.memory.build()], device=self.device)
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+    def _can_reuse_cache(self, kwargs: dict) -> bool:
+        """Whether the cross-turn cache applies to these generate() arguments.
+
+        Beam search expands the batch and assisted decoding keeps a separate
+        draft cache, so only plain single-beam decoding carries it over.
+        """
+        return self.reuse_cache and kwargs["num_beams"] == 1 and "assistant_model" not in kwargs
+
+    def _reuse_cache(self, input_ids: torch.Tensor):
+        """Return cached key/values for the longest prefix shared with ``input_ids``.
+
+        ``generate`` then prefills only the uncached suffix. When the prompt no
+        longer starts with the cached tokens (e.g. the history window slid) the
+        cache is dropped and rebuilt on this turn.
+        """
+        if self._past_key_values is None:
+            return None
+        ids = input_ids[0]
+        # At least one token has to be fed to the model
+        n = min(len(self._cache_ids), len(ids) - 1)
+        mismatch = (self._cache_ids[:n] != ids[:n]).nonzero()
+        common = int(mismatch[0]) if len(mismatch) else n
+        if common <= 0:
+            self._past_key_values = None
+            self._cache_ids = None
+            return None
+        logging.debug(f"Reusing {common}/{len(ids)} cached prompt tokens")
+        return tuple((k[:, :, :common], v[:, :, :common]) for k, v in self._past_key_values)
+
+    def _store_cache(self, sequences: torch.Tensor, past_key_values) -> None:
+        """Keep the key/values produced by ``generate`` for the next turn."""
+        if past_key_values is None:
+            return
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+        length = past_key_values[0][0].shape[2]
+        self._cache_ids = sequences[0, :length].detach()
+        self._past_key_values = past_key_values
+
+    def checkpoint(self) -> int:
+        """Mark the current point in the conversation for ``rollback``."""
+        return len(self.memory.turns)
+
+    def rollback(self, checkpoint: int) -> None:
+        """Forget turns added since ``checkpoint``.
+
+        The key/value cache is left alone; the next turn reuses whatever
+        prefix it still shares with the new prompt.
+        """
+        self.memory.truncate(checkpoint)
 
     def clear_history(self):
         """Clear the conversation history."""
-        self.conversation_history = []
\ No newline at end of file
+        self.memory.clear()
+        self._past_key_values = None
+        self._cache_ids = None
\ No newline at end of file
@@ -0,0 +1,337 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+from .cache import normalize_text
+from .metrics import metrics
+from .nlp import SentenceChunker
+
+class _Speculation:
+    def __init__(self, text: str):
+        self.text = text
+        self.key = normalize_text(text)
+        self.confirmed = threading.Event()
+        self.rejected = threading.Event()
+        self.utterance = None  # timings, attached on confirmation
+
+class Pipeline:
+    def __init__(self, mic, stt, nlp, tts, vad, queue_size: int = 32, barge_in: bool = True,
+                 on_transcript: Optional[Callable[[str], None]] = None,
+                 on_response: Optional[Callable[[str], None]] = None,
+                 speculative: bool = False, stable_ms: int = 120):
+        """Run capture, recognition, generation and synthesis concurrently.
+
+        Each stage has its own thread and hands work to the next through a
+        bounded queue, so a slow stage blocks its producer instead of letting
+        buffers grow. Items carry the epoch they were produced in; a barge-in
+        bumps the epoch, which cancels generation and playback and makes
+        downstream stages skip stale work. Each utterance carries a timing
+        record that is reported to ``metrics`` once its reply has been spoken.
+
+        In speculative mode, generation starts as soon as the partial
+        hypothesis has been stable for ``stable_ms``, before the recognizer
+        finalizes. Its sentences are held back until the final text matches;
+        otherwise the speculative turn is cancelled and rolled back and the
+        final text is answered as usual.
+
+        Args:
+            mic (MicrophoneHandler): Audio source
+            stt (SpeechToText): Speech recognizer
+            nlp (NLPHandler): Response generator
+            tts (TextToSpeech): Speech synthesizer
+            vad (VoiceActivityDetector): Speech gate in front of the recognizer
+            queue_size (int): Capacity of each inter-stage queue
+            barge_in (bool): Interrupt the reply when the user starts speaking
+            on_transcript (callable): Called with each recognized utterance
+            on_response (callable): Called with each generated response
+            speculative (bool): Start generating from stable partial hypotheses
+            stable_ms (int): How long a partial must stay unchanged to be used
+        """
+        self.mic = mic
+        self.stt = stt
+        self.nlp = nlp
+        self.tts = tts
+        self.vad = vad
+        self.barge_in = barge_in
+        self.on_transcript = on_transcript
+        self.on_response = on_response
+        self.speculative = speculative
+        self.stable_s = stable_ms / 1000
+
+        self.queues = {
+            "audio": queue.Queue(maxsize=queue_size),
+            "text": queue.Queue(maxsize=queue_size),
+            "speech": queue.Queue(maxsize=queue_size)
+        }
+        self.epoch = 0
+        self._cancel = threading.Event()
+        self._running = threading.Event()
+        self._generating = False
+        self._speaking = False
+        self._threads = []
+
+        self._speculation = None
+        self._hypothesis = ""
+        self._hypothesis_since = 0.0
+        self.speculation_stats = {"started": 0, "confirmed": 0, "rejected": 0}
+        self._utterances = 0
+
+    def start(self) -> None:
+        """Start recording (unless already capturing) and all stage threads."""
+        if not self.mic.recording:
+            self.mic.start_recording()
+        self._running.set()
+        for name, target in (("capture", self._capture), ("recognition", self._recognize),
+                             ("generation", self._generate), ("synthesis", self._synthesize)):
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop all stages and recording."""
+        self._running.clear()
+        self.interrupt()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.mic.stop_recording()
+
+    def queue_depths(self) -> dict:
+        """Current number of items waiting in each inter-stage queue."""
+        return {name: q.qsize() for name, q in self.queues.items()}
+
+    def busy(self) -> bool:
+        """True while a reply is being generated, queued or spoken.
+
+        Undecided speculative replies do not count, so the user's own
+        continuing speech does not trigger a barge-in.
+        """
+        return (self._generating or self._speaking
+                or self._replies_queued() or not self.queues["speech"].empty())
+
+    def _replies_queued(self) -> bool:
+        """Whether the text queue holds anything besides speculative turns."""
+        q = self.queues["text"]
+        with q.mutex:
+            return any(speculation is None for _, _, speculation, _ in q.queue)
+
+    def interrupt(self) -> None:
+        """Cancel in-flight generation and playback and drop queued replies."""
+        self.epoch += 1
+        self._cancel.set()
+        self._reject_speculation()
+        for name in ("text", "speech"):
+            self._drain(self.queues[name])
+        self.tts.stop()
+
+    def _drain(self, q: queue.Queue) -> None:
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, name: str, item) -> bool:
+        """Put with backpressure, waking periodically to honour ``stop``."""
+        while self._running.is_set():
+            try:
+                self.queues[name].put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, name: str):
+        try:
+            return self.queues[name].get(timeout=0.1)
+        except queue.Empty:
+            return None
+
+    def _capture(self) -> None:
+        while self._running.is_set():
+            data = self.mic.get_audio()
+            if not data:
+                time.sleep(0.01)
+                continue
+            self._put("audio", data)
+
+    def _recognize(self) -> None:
+        pieces = []
+        speech_start = None
+        while self._running.is_set():
+            data = self._get("audio")
+            if data is None:
+                continue
+            try:
+                speech, end_of_utterance = self.vad.process(data)
+                if speech and self.barge_in and self.busy():
+                    logging.info("Barge-in: interrupting response")
+                    self.interrupt()
+                if speech:
+                    speech_start = speech_start or time.perf_counter()
+                    pieces.append(self.stt.transcribe_audio(speech))
+                    if self.speculative:
+                        self._watch_partial(pieces)
+                if not end_of_utterance:
+                    continue
+                pieces.append(self.stt.finalize())
+                text = " ".join(p for p in pieces if p).strip()
+                pieces = []
+                end = time.perf_counter()
+                utterance = {"capture_s": end - (speech_start or end), "stt": self.stt.last_utterance,
+                             "end": end, "tts_s": 0.0}
+                speech_start = None
+                if text:
+                    if self.on_transcript:
+                        self.on_transcript(text)
+                    if not self._confirm_speculation(text, utterance):
+                        self._put("text", (self.epoch, text, None, utterance))
+                else:
+                    self._reject_speculation()
+            except Exception as e:
+                logging.error(f"Error in recognition stage: {e}")
+
+    def _watch_partial(self, pieces: List[str]) -> None:
+        """Start a speculative reply once the hypothesis stops changing."""
+        hypothesis = " ".join(p for p in pieces + [self.stt.partial()] if p).strip()
+        now = time.monotonic()
+        if self._speculation and normalize_text(hypothesis) != self._speculation.key:
+            # The user kept talking
+            self._reject_speculation()
+        if hypothesis != self._hypothesis:
+            self._hypothesis = hypothesis
+            self._hypothesis_since = now
+            return
+        if hypothesis and self._speculation is None and now - self._hypothesis_since >= self.stable_s:
+            self._speculation = _Speculation(hypothesis)
+            self.speculation_stats["started"] += 1
+            logging.debug(f"Speculating on: {hypothesis}")
+            self._put("text", (self.epoch, hypothesis, self._speculation, None))
+
+    def _confirm_speculation(self, text: str, utterance: dict) -> bool:
+        """Release a speculative reply if the final text matches it."""
+        speculation, self._speculation = self._speculation, None
+        self._hypothesis = ""
+        if speculation is None:
+            return False
+        if normalize_text(text) == speculation.key:
+            self.speculation_stats["confirmed"] += 1
+            speculation.utterance = dict(utterance, speculative=True)
+            speculation.confirmed.set()
+            return True
+        self.speculation_stats["rejected"] += 1
+        speculation.rejected.set()
+        return False
+
+    def _reject_speculation(self) -> None:
+        speculation, self._speculation = self._speculation, None
+        if speculation and not speculation.confirmed.is_set():
+            self.speculation_stats["rejected"] += 1
+            speculation.rejected.set()
+
+    def _generate(self) -> None:
+        while self._running.is_set():
+            item = self._get("text")
+            if item is None:
+                continue
+            epoch, text, speculation, utterance = item
+            if epoch != self.epoch or (speculation and speculation.rejected.is_set()):
+                continue
+            self._cancel.clear()
+            if epoch != self.epoch:
+                continue
+            # A speculative reply only counts as busy once it is confirmed
+            self._generating = speculation is None
+            checkpoint = self.nlp.checkpoint()
+            cancel = speculation.rejected if speculation else self._cancel
+            chunker = SentenceChunker()
+            held = []
+            try:
+                # Hand each finished sentence to TTS while the rest is generated
+                for piece in self.nlp.stream_input(text, cancel_event=cancel):
+                    if epoch != self.epoch or cancel.is_set():
+                        break
+                    for sentence in chunker.feed(piece):
+                        self._deliver(epoch, sentence, speculation, held, utterance)
+                if epoch == self.epoch and not cancel.is_set():
+                    for sentence in chunker.flush():
+                        self._deliver(epoch, sentence, speculation, held, utterance)
+                if speculation and self._await_decision(epoch, speculation):
+                    self._deliver(epoch, None, speculation, held, utterance)
+                    utterance = speculation.utterance
+                elif speculation:
+                    logging.debug(f"Discarding speculative reply to: {text}")
+                    self.nlp.rollback(checkpoint)
+                if utterance is not None and epoch == self.epoch:
+                    utterance["llm"] = dict(self.nlp.last_stats)
+                    # Marks the end of this reply for the synthesis stage
+                    self._put("speech", (epoch, None, utterance))
+            except Exception as e:
+                logging.error(f"Error in generation stage: {e}")
+            finally:
+                self._generating = False
+
+    def _await_decision(self, epoch: int, speculation: _Speculation) -> bool:
+        """Wait until the final transcript confirms or rejects a speculation."""
+        while self._running.is_set() and epoch == self.epoch:
+            if speculation.rejected.is_set():
+                return False
+            if speculation.confirmed.wait(0.05):
+                return True
+        return False
+
+    def _deliver(self, epoch: int, sentence: Optional[str], speculation: Optional[_Speculation],
+                 held: List[str], utterance: Optional[dict]) -> None:
+        """Emit a sentence, or hold it while its speculation is undecided."""
+        if speculation and not speculation.confirmed.is_set():
+            if sentence:
+                held.append(sentence)
+            return
+        if speculation:
+            utterance = speculation.utterance
+        if held:
+            self._generating = True
+            for pending in held:
+                self._emit(epoch, pending, utterance)
+            held.clear()
+        if sentence:
+            self._emit(epoch, sentence, utterance)
+
+    def _emit(self, epoch: int, sentence: str, utterance: Optional[dict] = None) -> None:
+        """Queue a response sentence for synthesis."""
+        if utterance is not None and "first_response_s" not in utterance:
+            utterance["first_response_s"] = time.perf_counter() - utterance["end"]
+        if self.on_response:
+            self.on_response(sentence)
+        self._put("speech", (epoch, sentence, utterance))
+
+    def _synthesize(self) -> None:
+        while self._running.is_set():
+            item = self._get("speech")
+            if item is None:
+                continue
+            epoch, response, utterance = item
+            if epoch != self.epoch:
+                continue
+            if response is None:
+                self._report(utterance)
+                continue
+            self._speaking = True
+            start = time.perf_counter()
+            try:
+                self.tts.speak(response, wait=True)
+            finally:
+                self._speaking = False
+                if utterance is not None:
+                    utterance["tts_s"] += time.perf_counter() - start
+
+    def _report(self, utterance: dict) -> None:
+        """Record the timings of an utterance whose reply has been spoken."""
+        self._utterances += 1
+        metrics.observe("utterance_capture_seconds", utterance["capture_s"])
+        metrics.observe("utterance_tts_seconds", utterance["tts_s"])
+        if "first_response_s" in utterance:
+            metrics.observe("utterance_response_latency_seconds", utterance["first_response_s"])
+        fields = {key: value for key, value in utterance.items() if key != "end"}
+        metrics.event("utterance", utterance=self._utterances, **fields)
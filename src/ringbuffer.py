@@ -0,0 +1,114 @@
+import wave
+import numpy as np
+from pathlib import Path
+from typing import Tuple, Union
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        """Fixed-size single-producer/single-consumer int16 ring buffer.
+
+        The producer only advances the write index and the consumer only
+        advances the read index, so no lock is needed between one capture
+        thread and one reader. When the buffer is full, incoming samples are
+        dropped and counted in ``overruns`` rather than overwriting data the
+        consumer may still be viewing.
+
+        Args:
+            capacity (int): Buffer size in samples
+        """
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self._write = 0  # total samples written
+        self._read = 0   # total samples consumed
+        self.overruns = 0  # total samples dropped
+
+    def write(self, data: Union[bytes, np.ndarray]) -> int:
+        """Append samples (producer side).
+
+        Args:
+            data (bytes | np.ndarray): 16-bit PCM samples
+
+        Returns:
+            int: Number of samples stored
+        """
+        samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        free = self.capacity - (self._write - self._read)
+        if len(samples) > free:
+            self.overruns += len(samples) - free
+            samples = samples[:free]
+        n = len(samples)
+        if n == 0:
+            return 0
+
+        start = self._write % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:n - first] = samples[first:]
+        # Publish only after the samples are in place
+        self._write += n
+        return n
+
+    def available(self) -> int:
+        """Number of samples ready to read."""
+        return self._write - self._read
+
+    def peek(self, max_samples: int = None) -> Tuple[np.ndarray, ...]:
+        """Return zero-copy views of unread samples without consuming them.
+
+        The views stay valid until ``advance`` releases them.
+
+        Args:
+            max_samples (int): Limit on samples returned (None for all)
+
+        Returns:
+            tuple: One view, or two when the data wraps around the buffer end
+        """
+        n = self.available()
+        if max_samples is not None:
+            n = min(n, max_samples)
+        if n == 0:
+            return ()
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        if first == n:
+            return (self._buffer[start:start + n],)
+        return (self._buffer[start:], self._buffer[:n - first])
+
+    def advance(self, n: int) -> None:
+        """Release ``n`` samples previously returned by ``peek`` (consumer side)."""
+        self._read += min(n, self.available())
+
+    def read_bytes(self, max_samples: int = None) -> bytes:
+        """Consume unread samples as a single bytes object."""
+        views = self.peek(max_samples)
+        data = b"".join(views)
+        self.advance(sum(len(v) for v in views))
+        return data
+
+    def clear(self) -> None:
+        """Drop all unread samples."""
+        self._read = self._write
+
+class WavSpillWriter:
+    def __init__(self, path: Union[str, Path], rate: int, channels: int = 1):
+        """Stream captured audio straight to a 16-bit WAV file.
+
+        Args:
+            path (str | Path): Output WAV file path
+            rate (int): Sample rate
+            channels (int): Number of audio channels
+        """
+        self.path = Path(path)
+        self._wf = wave.open(str(self.path), 'wb')
+        self._wf.setnchannels(channels)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(rate)
+
+    def write(self, data: bytes) -> None:
+        self._wf.writeframesraw(data)
+
+    def close(self) -> None:
+        if self._wf:
+            # Patches the header with the final length
+            self._wf.close()
+            self._wf = None
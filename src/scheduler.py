@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+import torch
+from transformers import StoppingCriteriaList
+from .memory import ConversationMemory
+from .nlp import STOP_STRINGS, StopOnText, find_stop
+
+class _Request:
+    def __init__(self, session_id: str, text: str, deadline: Optional[float]):
+        self.session_id = session_id
+        self.text = text
+        self.deadline = deadline
+        self.future = Future()
+
+def _fail(request: _Request, error: Exception) -> None:
+    """Fail a queued request unless its caller already cancelled it."""
+    if request.future.set_running_or_notify_cancel():
+        request.future.set_exception(error)
+
+class BatchScheduler:
+    def __init__(self, nlp, max_batch: int = 8, max_wait: float = 0.02):
+        """Serve many conversations from one model by batching their requests.
+
+        Concurrent ``submit`` calls are collected into left-padded batches
+        and decoded with a single ``generate`` call. A batch is launched once
+        it holds ``max_batch`` requests, once the first request has waited
+        ``max_wait`` seconds, or earlier if a queued deadline would otherwise
+        be missed. Requests are served earliest-deadline first, and those
+        whose deadline has already passed fail with ``TimeoutError``.
+
+        The scheduler owns the model while it runs; do not call
+        ``nlp.process_input`` concurrently. Cancelling a returned future
+        before its batch starts withdraws the request.
+
+        This is a library API for embedding the assistant in a multi-user
+        service; the command-line modes serve a single conversation and do
+        not use it.
+
+        Args:
+            nlp (NLPHandler): Loaded model, tokenizer and generation settings
+            max_batch (int): Maximum requests per batch
+            max_wait (float): Seconds to wait for a batch to fill
+        """
+        self.nlp = nlp
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.sessions: Dict[str, ConversationMemory] = {}
+        self.stats = {"batches": 0, "requests": 0, "expired": 0}
+
+        self._queue: List[_Request] = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the batching thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the batching thread and fail any queued requests."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            for request in self._queue:
+                _fail(request, RuntimeError("Scheduler stopped"))
+            self._queue = []
+
+    def session(self, session_id: str) -> ConversationMemory:
+        """Return a session's history, creating it on first use."""
+        if session_id not in self.sessions:
+            self.sessions[session_id] = ConversationMemory(
+                self.nlp.tokenizer, max_context=self.nlp.memory.max_context,
+                reserve=self.nlp.max_new_tokens)
+        return self.sessions[session_id]
+
+    def close_session(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+    def submit(self, session_id: str, text: str, timeout: Optional[float] = None) -> Future:
+        """Queue a user message for a session.
+
+        Args:
+            session_id (str): Conversation the message belongs to
+            text (str): User message
+            timeout (float): Seconds until the request must be answered
+
+        Returns:
+            Future: Resolves to the response text
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        request = _Request(session_id, text, deadline)
+        with self._cond:
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def process_input(self, session_id: str, text: str, timeout: Optional[float] = None) -> str:
+        """Blocking wrapper around ``submit``."""
+        return self.submit(session_id, text, timeout).result()
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _next_batch(self) -> List[_Request]:
+        """Wait for requests and take up to ``max_batch`` of them."""
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            # Let the batch fill, but never past the most urgent deadline
+            fill_until = time.monotonic() + self.max_wait
+            deadlines = [r.deadline for r in self._queue if r.deadline is not None]
+            if deadlines:
+                fill_until = min(fill_until, min(deadlines))
+            while self._running and len(self._queue) < self.max_batch:
+                remaining = fill_until - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            now = time.monotonic()
+            expired = [r for r in self._queue if r.deadline is not None and r.deadline < now]
+            for request in expired:
+                self._queue.remove(request)
+                _fail(request, TimeoutError("Request deadline passed"))
+            self.stats["expired"] += len(expired)
+
+            # Earliest deadline first, at most one request per session per batch
+            self._queue.sort(key=lambda r: r.deadline if r.deadline is not None else float("inf"))
+            batch, rest, sessions = [], [], set()
+            for request in self._queue:
+                if len(batch) < self.max_batch and request.session_id not in sessions:
+                    batch.append(request)
+                    sessions.add(request.session_id)
+                else:
+                    rest.append(request)
+            self._queue = rest
+            # Drop requests whose caller cancelled; the rest can no longer be cancelled
+            return [r for r in batch if r.future.set_running_or_notify_cancel()]
+
+    def _loop(self) -> None:
+        while self._running:
+            batch = []
+            try:
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                responses = self._generate(batch)
+                for request, response in zip(batch, responses):
+                    request.future.set_result(response)
+            except Exception as e:
+                # Fail this batch but keep serving later ones
+                logging.error(f"Error generating batch: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _generate(self, batch: List[_Request]) -> List[str]:
+        """Decode one left-padded batch and update each session's history."""
+        tokenizer = self.nlp.tokenizer
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        prompts = []
+        for request in batch:
+            memory = self.session(request.session_id)
+            memory.reserve = self.nlp.max_new_tokens
+            memory.add_user(request.text)
+            prompts.append(memory.build())
+
+        length = max(len(ids) for ids in prompts)
+        input_ids = torch.full((len(prompts), length), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(prompts), length), dtype=torch.long)
+        for row, ids in enumerate(prompts):
+            input_ids[row, length - len(ids):] = torch.tensor(ids)
+            attention_mask[row, length - len(ids):] = 1
+
+        kwargs = self.nlp._generation_kwargs()
+        if len(batch) > 1:
+            # Assisted decoding only supports a batch of one
+            kwargs.pop("assistant_model", None)
+        start = time.perf_counter()
+        with torch.inference_mode():
+            outputs = self.nlp.model.generate(
+                input_ids=input_ids.to(self.nlp.device),
+                attention_mask=attention_mask.to(self.nlp.device),
+                **kwargs,
+                stopping_criteria=StoppingCriteriaList([StopOnText(tokenizer, length, STOP_STRINGS)])
+            )
+        elapsed = time.perf_counter() - start
+
+        responses = []
+        for request, row in zip(batch, outputs[:, length:].tolist()):
+            response = tokenizer.decode(row, skip_special_tokens=True)
+            cut = find_stop(response)
+            response = response[:cut].strip() if cut >= 0 else response.strip()
+            self.session(request.session_id).add_assistant(response)
+            responses.append(response)
+
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(batch)
+        logging.debug(f"Batch of {len(batch)} generated in {elapsed:.2f}s")
+        return responses
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import List, Optional
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+from .audio import AudioNormalizer
+from .metrics import metrics
+from .stt import _parse_result
+
+# WebSocket close code for "try again later" (RFC 6455 registry)
+TRY_AGAIN_LATER = 1013
+
+class _Session:
+    def __init__(self, recognizer, sample_rate: int, partials: bool, queue_chunks: int):
+        self.recognizer = recognizer
+        self.partials = partials
+        self.normalizer = None
+        self.sample_rate = sample_rate
+        self.queue = asyncio.Queue(maxsize=queue_chunks)
+        self.last_partial = ""
+        self.audio_s = 0.0
+        self.closed = False
+
+class TranscriptionServer:
+    def __init__(self, pool, workers: Optional[int] = None, max_sessions: Optional[int] = None,
+                 queue_chunks: int = 32, partials: bool = True):
+        """Stream transcription to many WebSocket clients from one shared model.
+
+        Each connection gets its own recognizer from ``pool``; decoding runs
+        on a bounded thread pool so sessions are multiplexed over ``workers``
+        threads. Clients send 16-bit mono PCM as binary messages and receive
+        JSON results in the ``SpeechToText.stream_audio`` format. A text
+        message ``{"config": {"sample_rate": 44100, "partials": false}}``
+        before the audio changes the input rate or turns partials off, and
+        ``{"eof": 1}`` asks for the final result, after which the server
+        closes the connection.
+
+        Connections beyond ``max_sessions`` are refused with HTTP 503 (or
+        close code 1013 if they race past the handshake check). Each session
+        buffers at most ``queue_chunks`` undecoded messages; once full, the
+        server stops reading that socket and TCP flow control slows the
+        client down instead of memory growing. ``GET /health`` returns the
+        current load as JSON.
+
+        Args:
+            pool (RecognizerPool): Recognizers sharing one loaded model
+            workers (int): Decoding threads (default: CPU count)
+            max_sessions (int): Concurrent sessions admitted (default: 4 per worker)
+            queue_chunks (int): Undecoded messages buffered per session
+            partials (bool): Send partial results by default
+        """
+        self.pool = pool
+        self.workers = workers or os.cpu_count()
+        self.max_sessions = max_sessions or 4 * self.workers
+        self.queue_chunks = queue_chunks
+        self.partials = partials
+        self.active = 0
+        self.stats = {"sessions": 0, "rejected": 0, "audio_s": 0.0}
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="stt-server")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 2700):
+        """Start listening and return the websockets server (port 0 picks a free port)."""
+        server = await serve(self._handle, host, port, process_request=self._process_request,
+                             max_queue=self.queue_chunks)
+        bound = server.sockets[0].getsockname()
+        logging.info(f"Transcription server listening on ws://{bound[0]}:{bound[1]} "
+                     f"({self.workers} workers, {self.max_sessions} sessions)")
+        return server
+
+    def run(self, host: str = "127.0.0.1", port: int = 2700) -> None:
+        """Serve until interrupted."""
+        async def main():
+            server = await self.start(host, port)
+            await server.serve_forever()
+
+        try:
+            asyncio.run(main())
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def health(self) -> dict:
+        return {"active": self.active, "max_sessions": self.max_sessions,
+                "workers": self.workers, **self.stats}
+
+    def _process_request(self, connection, request):
+        """Answer health checks and refuse upgrades when the server is full."""
+        if request.path.rstrip("/") == "/health":
+            return connection.respond(HTTPStatus.OK, json.dumps(self.health()) + "\n")
+        if self.active >= self.max_sessions:
+            self.stats["rejected"] += 1
+            metrics.increment("server_sessions_rejected_total")
+            return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy\n")
+        return None
+
+    async def _handle(self, websocket) -> None:
+        if self.active >= self.max_sessions:
+            self.stats["rejected"] += 1
+            metrics.increment("server_sessions_rejected_total")
+            await websocket.close(TRY_AGAIN_LATER, "Server busy")
+            return
+
+        self.active += 1
+        self.stats["sessions"] += 1
+        metrics.increment("server_sessions_total")
+        loop = asyncio.get_running_loop()
+        recognizer = await loop.run_in_executor(self._executor, self.pool.acquire)
+        session = _Session(recognizer, self.pool.sample_rate, self.partials, self.queue_chunks)
+        recognizer.SetPartialWords(session.partials)
+        decoder = asyncio.create_task(self._decode_loop(websocket, session))
+        try:
+            async for message in websocket:
+                if decoder.done():
+                    break
+                if isinstance(message, bytes):
+                    # Waits while the session is backlogged, which stops reading the socket
+                    await session.queue.put(message)
+                    continue
+                request = json.loads(message)
+                if "config" in request:
+                    self._configure(session, request["config"])
+                if request.get("eof"):
+                    break
+            if not decoder.done():
+                await session.queue.put(None)
+            await decoder
+            await websocket.close()
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logging.error(f"Transcription session failed: {e}")
+            try:
+                await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+            except ConnectionClosed:
+                pass
+        finally:
+            session.closed = True
+            if not session.queue.full():
+                session.queue.put_nowait(None)
+            # The recognizer may still be decoding on a worker thread
+            await asyncio.gather(decoder, return_exceptions=True)
+            await loop.run_in_executor(self._executor, self.pool.release, recognizer)
+            self.stats["audio_s"] += session.audio_s
+            self.active -= 1
+
+    def _configure(self, session: _Session, config: dict) -> None:
+        if "partials" in config:
+            session.partials = bool(config["partials"])
+            session.recognizer.SetPartialWords(session.partials)
+        rate = int(config.get("sample_rate", session.sample_rate))
+        if rate != self.pool.sample_rate:
+            session.normalizer = AudioNormalizer(rate, out_rate=self.pool.sample_rate)
+        session.sample_rate = rate
+
+    async def _decode_loop(self, websocket, session: _Session) -> None:
+        """Decode a session's audio in order, one worker call at a time."""
+        loop = asyncio.get_running_loop()
+        final = False
+        try:
+            while not final and not session.closed:
+                data = [await session.queue.get()]
+                # Coalesce whatever arrived meanwhile so a backlog costs one call
+                while not session.queue.empty():
+                    data.append(session.queue.get_nowait())
+                final = data[-1] is None
+                audio = b"".join(chunk for chunk in data if chunk)
+                if session.normalizer and audio:
+                    audio = session.normalizer.process(audio)
+                start = time.perf_counter()
+                results = await loop.run_in_executor(self._executor, self._decode, session,
+                                                     audio, final)
+                metrics.observe("server_decode_seconds", time.perf_counter() - start)
+                for result in results:
+                    await websocket.send(json.dumps(result))
+        except Exception:
+            session.closed = True
+            # Unblock a reader waiting on the full queue
+            while not session.queue.empty():
+                session.queue.get_nowait()
+            raise
+
+    def _decode(self, session: _Session, audio: bytes, final: bool) -> List[dict]:
+        """Feed audio to the session's recognizer; runs on a worker thread."""
+        recognizer = session.recognizer
+        results = []
+        if audio:
+            session.audio_s += len(audio) / (2 * self.pool.sample_rate)
+            if recognizer.AcceptWaveform(audio):
+                session.last_partial = ""
+                result = _parse_result(recognizer.Result())
+                if result["text"]:
+                    results.append(result)
+            elif session.partials:
+                partial = json.loads(recognizer.PartialResult())
+                text = partial.get("partial", "")
+                if text and text != session.last_partial:
+                    session.last_partial = text
+                    results.append({"type": "partial", "text": text,
+                                    "words": partial.get("partial_result", [])})
+        if final:
+            result = _parse_result(recognizer.FinalResult())
+            if result["text"]:
+                results.append(result)
+        return results
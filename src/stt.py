@@ -1,65 +1,210 @@
 import json
 import os
+import threading
+import time
 import wave
-import numpy as np
 import logging
+from contextlib import contextmanager
+from .audio import SAMPLE_WIDTHS, NoiseSuppressor, open_wav, read_normalized
+from .metrics import RATE_BUCKETS, metrics
+from .words import transcript_text
 from vosk import Model, KaldiRecognizer
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Optional, Callable, Iterable, Iterator
+
+# Process-wide registries so each model is loaded only once
+_models = {}
+_pools = {}
+_registry_lock = threading.Lock()
+
+def get_model(model_path) -> Model:
+    """Load a Vosk model once per process and share it.
+
+    Args:
+        model_path (str): Path to Vosk model directory
+
+    Returns:
+        Model: The shared model
+    """
+    key = os.path.abspath(str(model_path))
+    with _registry_lock:
+        if key not in _models:
+            _models[key] = Model(str(model_path))
+            logger.info(f"Loaded Vosk model: {model_path}")
+        return _models[key]
+
+def get_recognizer_pool(model_path, sample_rate: int) -> "RecognizerPool":
+    """Return the shared recognizer pool for a model and sample rate."""
+    key = (os.path.abspath(str(model_path)), sample_rate)
+    model = get_model(model_path)
+    with _registry_lock:
+        if key not in _pools:
+            _pools[key] = RecognizerPool(model, sample_rate)
+        return _pools[key]
+
+class RecognizerPool:
+    def __init__(self, model: Model, sample_rate: int, max_idle: int = 16):
+        """Pool of recognizers sharing one model.
+
+        Recognizers are checked out per stream and reset when returned, so
+        concurrent streams never share decoder state.
+
+        Args:
+            model (Model): Loaded Vosk model
+            sample_rate (int): Audio sample rate in Hz
+            max_idle (int): Idle recognizers kept for reuse
+        """
+        self.model = model
+        self.sample_rate = sample_rate
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> KaldiRecognizer:
+        """Check out a recognizer with word timings enabled."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+
+    def release(self, recognizer: KaldiRecognizer) -> None:
+        """Reset a recognizer and return it to the pool."""
+        recognizer.Reset()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(recognizer)
+
+    @contextmanager
+    def recognizer(self):
+        """Context manager that checks a recognizer out and back in."""
+        recognizer = self.acquire()
+        try:
+            yield recognizer
+        finally:
+            self.release(recognizer)
 
 class SpeechToText:
-    def __init__(self, model_path="models/vosk-model-small-en-us-0.15", sample_rate=16000):
+    def __init__(self, model_path="models/vosk-model-small-en-us-0.15", sample_rate=16000,
+                 denoise: bool = False, chunk_frames: int = 4000, noise_floor: float = 0.1):
         """Initialize STT with Vosk model.
         
         Args:
             model_path (str): Path to Vosk model directory
             sample_rate (int): Audio sample rate in Hz
+            denoise (bool): Run file audio through a noise suppressor before decoding
+            chunk_frames (int): Frames read from files (and the microphone) per decode call
+            noise_floor (float): Lowest gain the noise suppressor applies
         """
         try:
-            self.model = Model(model_path)
-            self.recognizer = KaldiRecognizer(self.model, sample_rate)
+            self.model = get_model(model_path)
+            self.pool = get_recognizer_pool(model_path, sample_rate)
+            # Live-stream recognizer used by transcribe_audio/finalize
+            self.recognizer = self.pool.acquire()
             self.sample_rate = sample_rate
+            self.denoise = denoise
+            self.chunk_frames = chunk_frames
+            self.noise_floor = noise_floor
+            # Live-stream decode time and audio length since the last finalize
+            self._live_decode_s = 0.0
+            self._live_audio_s = 0.0
+            self.last_utterance = {}
             logger.info(f"Initialized STT with model: {model_path}")
         except Exception as e:
             logger.error(f"Error loading Vosk model: {e}")
             raise
 
-    def transcribe_wav(self, wav_file: str) -> str:
+    def transcribe_wav(self, wav_file: str, min_confidence: float = 0.0) -> str:
         """Transcribe audio from a WAV file.
         
         Args:
             wav_file (str): Path to WAV file
+            min_confidence (float): Drop segments whose mean word confidence is lower
             
         Returns:
             str: Transcribed text
         """
+        return transcript_text(self.stream_wav(wav_file), min_confidence)
+
+    def stream_wav(self, wav_file: str, partials: bool = False,
+                   chunk_frames: Optional[int] = None) -> Iterator[dict]:
+        """Yield recognition results from a WAV file as Vosk produces them.
+
+        The file is read in fixed-size chunks, so memory use does not grow
+        with the length of the recording. Files that are not 16-bit mono at
+        ``sample_rate`` are downmixed, converted and resampled on the fly.
+
+        Args:
+            wav_file (str): Path to WAV file
+            partials (bool): Also yield partial hypotheses
+            chunk_frames (int): File frames read per chunk (default: ``self.chunk_frames``)
+
+        Yields:
+            dict: ``{"type": "partial" | "final", "text": str, "words": list}``; final
+                words carry ``word``, ``start``, ``end`` (seconds) and ``conf``
+        """
         if not os.path.exists(wav_file):
             raise ValueError(f"File not found: {wav_file}")
-            
+
         try:
-            wf = wave.open(wav_file, "rb")
-            self._validate_audio(wf)
-            
-            results = []
-            while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
-                    break
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    if result["text"]:
-                        results.append(result["text"])
-            
-            # Get final bits
-            final = json.loads(self.recognizer.FinalResult())
-            if final["text"]:
-                results.append(final["text"])
-                    
-            return " ".join(results)
-        except wave.Error:
+            wf = open_wav(wav_file)
+        except (wave.Error, EOFError):
             raise ValueError("Invalid WAV file format")
-        finally:
-            wf.close()
+        with wf:
+            self._validate_audio(wf)
+            with self.pool.recognizer() as recognizer:
+                chunks = self._file_chunks(wf, chunk_frames)
+                yield from self._stream(recognizer, chunks, partials)
+
+    def stream_audio(self, chunks: Iterable[bytes], partials: bool = True) -> Iterator[dict]:
+        """Yield recognition results for a stream of raw audio buffers.
+
+        Args:
+            chunks (iterable): 16-bit mono PCM buffers at ``sample_rate``
+            partials (bool): Also yield partial hypotheses
+
+        Yields:
+            dict: ``{"type": "partial" | "final", "text": str, "words": list}``
+        """
+        with self.pool.recognizer() as recognizer:
+            yield from self._stream(recognizer, chunks, partials)
+
+    def transcribe_segment(self, wav_file: str, start_frame: int = 0,
+                           end_frame: Optional[int] = None) -> list:
+        """Transcribe a frame range of a WAV file with word timings.
+
+        Uses a fresh recognizer so segments can be decoded independently.
+
+        Args:
+            wav_file (str): Path to WAV file
+            start_frame (int): First frame to decode
+            end_frame (int): Frame to stop at (None for end of file)
+
+        Returns:
+            list: Word dicts with ``word``, ``start``, ``end`` and ``conf``,
+                timed from the start of the file
+        """
+        with open_wav(wav_file) as wf:
+            self._validate_audio(wf)
+            end_frame = wf.getnframes() if end_frame is None else end_frame
+            offset = start_frame / wf.getframerate()
+            wf.setpos(start_frame)
+
+            words = []
+
+            def collect(result):
+                for word in json.loads(result).get("result", []):
+                    word["start"] += offset
+                    word["end"] += offset
+                    words.append(word)
+
+            with self.pool.recognizer() as recognizer:
+                for data in self._file_chunks(wf, frames=end_frame - start_frame):
+                    if recognizer.AcceptWaveform(data):
+                        collect(recognizer.Result())
+                collect(recognizer.FinalResult())
+            return words
 
     def transcribe_audio(self, audio_data: bytes) -> str:
         """Transcribe raw audio data.
@@ -71,7 +216,11 @@ class SpeechToText:
             str: Transcribed text
         """
         try:
-            if self.recognizer.AcceptWaveform(audio_data):
+            start = time.perf_counter()
+            accepted = self.recognizer.AcceptWaveform(audio_data)
+            self._live_decode_s += time.perf_counter() - start
+            self._live_audio_s += len(audio_data) / (2 * self.sample_rate)
+            if accepted:
                 result = json.loads(self.recognizer.Result())
                 return result.get("text", "")
             return ""
@@ -79,43 +228,121 @@ class SpeechToText:
             logger.error(f"Error transcribing audio data: {e}")
             return ""
 
-    def transcribe_microphone(self, callback: Callable[[str], None]) -> None:
+    def partial(self) -> str:
+        """Current partial hypothesis of the live-stream recognizer."""
+        try:
+            return json.loads(self.recognizer.PartialResult()).get("partial", "")
+        except Exception as e:
+            logger.error(f"Error reading partial result: {e}")
+            return ""
+
+    def finalize(self) -> str:
+        """Flush the recognizer at end of utterance and return the remaining text.
+
+        Returns:
+            str: Text not yet returned by ``transcribe_audio``
+        """
+        try:
+            start = time.perf_counter()
+            text = json.loads(self.recognizer.FinalResult()).get("text", "")
+            self._live_decode_s += time.perf_counter() - start
+            self.last_utterance = self._record_decode(self._live_decode_s, self._live_audio_s)
+            return text
+        except Exception as e:
+            logger.error(f"Error finalizing transcription: {e}")
+            return ""
+        finally:
+            self._live_decode_s = 0.0
+            self._live_audio_s = 0.0
+
+    def transcribe_microphone(self, callback: Callable[[str], None], mic=None) -> None:
         """Transcribe audio from microphone in real-time.
         
         Args:
             callback (callable): Function to call with transcribed text
+            mic (MicrophoneHandler): Microphone to read from (default: open one)
         """
-        import pyaudio
-        
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16,
-                       channels=1,
-                       rate=self.sample_rate,
-                       input=True,
-                       frames_per_buffer=8000)
+        from .mic import MicrophoneHandler
+
+        own_mic = mic is None
+        if own_mic:
+            mic = MicrophoneHandler(rate=self.sample_rate, chunk_size=self.chunk_frames)
+        if not mic.recording:
+            mic.start_recording()
         
         logger.info("Starting microphone transcription")
-        stream.start_stream()
-        
         try:
-            while True:
-                data = stream.read(4000)
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    text = result["text"]
-                    if text:
-                        callback(text)
+            with self.pool.recognizer() as recognizer:
+                while True:
+                    data = mic.get_audio()
+                    if not data:
+                        time.sleep(0.01)
+                        continue
+                    if recognizer.AcceptWaveform(data):
+                        result = json.loads(recognizer.Result())
+                        text = result["text"]
+                        if text:
+                            callback(text)
         except KeyboardInterrupt:
             logger.info("Stopping microphone transcription")
         except Exception as e:
             logger.error(f"Error in microphone transcription: {e}")
         finally:
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+            if own_mic:
+                mic.stop_recording()
+
+    def _stream(self, recognizer: KaldiRecognizer, chunks: Iterable[bytes],
+                partials: bool) -> Iterator[dict]:
+        """Feed chunks to a recognizer and yield results as they appear."""
+        recognizer.SetPartialWords(partials)
+        last_partial = ""
+        decode_s = audio_s = 0.0
+        for data in chunks:
+            start = time.perf_counter()
+            accepted = recognizer.AcceptWaveform(data)
+            decode_s += time.perf_counter() - start
+            audio_s += len(data) / (2 * self.sample_rate)
+            if accepted:
+                last_partial = ""
+                result = _parse_result(recognizer.Result())
+                if result["text"]:
+                    yield result
+            elif partials:
+                partial = json.loads(recognizer.PartialResult())
+                text = partial.get("partial", "")
+                if text and text != last_partial:
+                    last_partial = text
+                    yield {"type": "partial", "text": text,
+                           "words": partial.get("partial_result", [])}
+
+        # Get final bits
+        start = time.perf_counter()
+        result = _parse_result(recognizer.FinalResult())
+        self._record_decode(decode_s + time.perf_counter() - start, audio_s)
+        if result["text"]:
+            yield result
+
+    def _record_decode(self, decode_s: float, audio_s: float) -> dict:
+        """Record decode time and real-time factor for a stretch of audio."""
+        stats = {"audio_s": audio_s, "decode_s": decode_s,
+                 "rtf": decode_s / audio_s if audio_s else 0.0}
+        metrics.observe("stt_decode_seconds", decode_s)
+        if audio_s:
+            metrics.observe("stt_real_time_factor", stats["rtf"], RATE_BUCKETS)
+        return stats
+
+    def _file_chunks(self, wf: wave.Wave_read, chunk_frames: Optional[int] = None,
+                     frames: Optional[int] = None) -> Iterator[bytes]:
+        """Read normalized and, if enabled, denoised audio from an open WAV file."""
+        chunks = read_normalized(wf, self.sample_rate, chunk_frames or self.chunk_frames, frames)
+        if self.denoise:
+            chunks = NoiseSuppressor(self.sample_rate, gain_floor=self.noise_floor).stream(chunks)
+        return chunks
 
     def _validate_audio(self, wf: wave.Wave_read) -> None:
         """Validate WAV file format.
+
+        Any rate and channel count is accepted and normalized while reading.
         
         Args:
             wf (wave.Wave_read): Wave file object
@@ -123,12 +350,16 @@ class SpeechToText:
         Raises:
             ValueError: If audio format is invalid
         """
-        if wf.getsampwidth() != 2:
-            raise ValueError("Audio must be 16-bit PCM WAV")
-        if wf.getnchannels() != 1:
-            raise ValueError("Audio must be mono, not stereo")
-        if wf.getframerate() != self.sample_rate:
-            raise ValueError(f"Audio must have {self.sample_rate}Hz sample rate")
+        if wf.getsampwidth() not in SAMPLE_WIDTHS:
+            raise ValueError("Audio must be 8, 16, 24 or 32-bit PCM WAV")
+        if wf.getnchannels() < 1 or wf.getframerate() <= 0:
+            raise ValueError("Audio has no channels or no sample rate")
+
+def _parse_result(result: str) -> dict:
+    """Convert a Vosk final result into the streaming result format."""
+    result = json.loads(result)
+    return {"type": "final", "text": result.get("text", ""),
+            "words": result.get("result", [])}
 
 def test_microphone():
     """Test microphone transcription."""
@@ -149,28 +380,10 @@ logging.basicConfig(
     ]
 )
 
-def preprocess_audio(self, audio_data: bytes) -> bytes:
-    """Apply audio preprocessing.
-    
-    Args:
-        audio_data (bytes): Raw audio data
-    Returns:
-        bytes: Processed audio data
-    """
-    # Convert to numpy array
-    audio = np.frombuffer(audio_data, dtype=np.int16)
-    
-    # Normalize
-    normalized = audio / np.max(np.abs(audio))
-    
-    # Noise reduction
-    noise_threshold = 0.1
-    normalized[np.abs(normalized) < noise_threshold] = 0
-    
-    return (normalized * 32767).astype(np.int16).tobytes()
-
 logger = logging.getLogger(__name__)
 
+# Run from the repository root with ``python -m src.stt``; the relative imports
+# above do not resolve when this file is run as a script
 if __name__ == "__main__":
     import argparse
     
@@ -1,46 +1,189 @@
 import pyttsx3
 import logging
+import queue
+import threading
+import time
+import wave
+from pathlib import Path
 from typing import Optional
+from .cache import AudioCache
+from .metrics import metrics
 
 class TextToSpeech:
-    def __init__(self, voice_id: Optional[str] = None, rate: int = 175):
-        """Initialize TTS engine.
-        
+    def __init__(self, voice_id: Optional[str] = None, rate: int = 175,
+                 cache_dir: Optional[str] = "cache/tts", cache_max_bytes: int = 64 << 20):
+        """Initialize TTS engine on a dedicated worker thread.
+
+        ``speak`` queues text and returns immediately; the worker renders each
+        phrase with ``save_to_file`` into a disk cache keyed by text, voice and
+        rate, then plays the WAV in small chunks so ``stop`` can cut it off.
+        Repeated phrases play straight from the cache. Without PyAudio or a
+        cache directory, the worker speaks through the engine directly.
+
         Args:
             voice_id (str): Voice ID to use (None for default)
             rate (int): Speech rate (default: 175)
+            cache_dir (str): Directory for rendered audio (None to disable caching)
+            cache_max_bytes (int): Size bound of the audio cache
         """
-        try:
-            self.engine = pyttsx3.init()
-            
-            # List available voices
+        self.voice_id = voice_id
+        self.rate = rate
+        self.cache = AudioCache(Path(cache_dir), max_bytes=cache_max_bytes) if cache_dir else None
+
+        self.engine = None
+        self._audio = None
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._speaking = False
+        self._ready = threading.Event()
+        self._init_error = None
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+
+        # The engine is created on the worker thread, which owns it from then on
+        self._ready.wait()
+        if self._init_error:
+            logging.error(f"Error initializing TTS: {self._init_error}")
+            raise self._init_error
+
+    def _init_engine(self) -> None:
+        self.engine = pyttsx3.init()
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
             voices = self.engine.getProperty('voices')
-            logging.info(f"Available voices: {len(voices)}")
+            logging.debug(f"Available voices: {len(voices)}")
             for voice in voices:
-                logging.info(f"Voice ID: {voice.id}")
-            
-            # Set voice if specified
-            if voice_id:
-                self.engine.setProperty('voice', voice_id)
-                
-            # Set speech rate
-            self.engine.setProperty('rate', rate)
-            
-        except Exception as e:
-            logging.error(f"Error initializing TTS: {e}")
-            raise
+                logging.debug(f"Voice ID: {voice.id}")
+
+        # Set voice if specified
+        if self.voice_id:
+            self.engine.setProperty('voice', self.voice_id)
+
+        # Set speech rate
+        self.engine.setProperty('rate', self.rate)
+
+        if self.cache:
+            try:
+                import pyaudio
+                self._audio = pyaudio.PyAudio()
+            except Exception as e:
+                logging.warning(f"Cached TTS playback unavailable, speaking directly: {e}")
+
+    def speak(self, text: str, wait: bool = False) -> threading.Event:
+        """Queue text to be spoken.
 
-    def speak(self, text: str) -> None:
-        """Convert text to speech and play it.
-        
         Args:
             text (str): Text to speak
+            wait (bool): Block until the text has been spoken or interrupted
+
+        Returns:
+            threading.Event: Set once the text has been spoken or dropped
         """
+        done = threading.Event()
+        self._queue.put((self._generation, text, done))
+        if wait:
+            done.wait()
+        return done
+
+    def busy(self) -> bool:
+        """True while speech is playing or queued."""
+        return self._speaking or not self._queue.empty()
+
+    def stop(self) -> None:
+        """Interrupt any speech in progress and drop queued text."""
+        self._generation += 1
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set()
+        if self.engine is None:
+            return
         try:
-            self.engine.say(text)
-            self.engine.runAndWait()
+            self.engine.stop()
+        except Exception as e:
+            logging.error(f"Error stopping speech: {e}")
+
+    def close(self) -> None:
+        """Stop speaking and shut down the worker thread."""
+        self.stop()
+        self._queue.put(None)
+        self._thread.join()
+        if self._audio:
+            self._audio.terminate()
+            self._audio = None
+
+    def _run(self) -> None:
+        try:
+            self._init_engine()
         except Exception as e:
-            logging.error(f"Error speaking text: {e}")
+            self._init_error = e
+            return
+        finally:
+            self._ready.set()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            generation, text, done = item
+            if generation != self._generation:
+                done.set()
+                continue
+            self._speaking = True
+            try:
+                self._say(text, generation)
+            except Exception as e:
+                logging.error(f"Error speaking text: {e}")
+            finally:
+                self._speaking = False
+                done.set()
+
+    def _say(self, text: str, generation: int) -> None:
+        if self._audio is None:
+            with metrics.span("tts_speak_seconds"):
+                self.engine.say(text)
+                self.engine.runAndWait()
+            return
+
+        key = self.cache.key(text, self.voice_id, self.rate)
+        path = self.cache.get(key)
+        if path is None:
+            metrics.increment("tts_cache_misses_total")
+            rendered = self.cache.temp_path(key)
+            start = time.perf_counter()
+            self.engine.save_to_file(text, str(rendered))
+            self.engine.runAndWait()
+            if generation != self._generation:
+                # Rendering may have been cut short; never cache a partial file
+                rendered.unlink(missing_ok=True)
+                return
+            metrics.observe("tts_synthesis_seconds", time.perf_counter() - start)
+            path = self.cache.put(key, rendered)
+        else:
+            metrics.increment("tts_cache_hits_total")
+        with metrics.span("tts_playback_seconds"):
+            self._play(path, generation)
+
+    def _play(self, path: Path, generation: int, chunk_frames: int = 1024) -> None:
+        """Play a WAV file, stopping between chunks once interrupted."""
+        with wave.open(str(path), 'rb') as wf:
+            stream = self._audio.open(
+                format=self._audio.get_format_from_width(wf.getsampwidth()),
+                channels=wf.getnchannels(),
+                rate=wf.getframerate(),
+                output=True
+            )
+            try:
+                data = wf.readframes(chunk_frames)
+                while data and generation == self._generation:
+                    stream.write(data)
+                    data = wf.readframes(chunk_frames)
+            finally:
+                stream.stop_stream()
+                stream.close()
 
     def __del__(self):
         """Cleanup resources."""
@@ -49,13 +192,15 @@ class TextToSpeech:
         except:
             pass
 
+# Run from the repository root with ``python -m src.tts``; the relative imports
+# above do not resolve when this file is run as a script
 if __name__ == "__main__":
     # Configure logging
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
+
     # Test different voices
     tts = TextToSpeech()
     test_texts = [
@@ -63,7 +208,8 @@ if __name__ == "__main__":
         "The quick brown fox jumps over the lazy dog.",
         "How does this voice sound?"
     ]
-    
+
     for text in test_texts:
         print(f"Speaking: {text}")
-        tts.speak(text)
\ No newline at end of file
+        tts.speak(text, wait=True)
+    tts.close()
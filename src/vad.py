@@ -0,0 +1,146 @@
+import logging
+from collections import deque
+from typing import Tuple
+import numpy as np
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_ratio=4.0, zcr_threshold=0.25,
+                 hangover_ms=300, preroll_ms=150, min_rms=60.0, floor_adapt=0.05,
+                 floor_rise_db=3.0, max_utterance_ms=15000):
+        """Initialize energy/zero-crossing voice activity detector.
+
+        A frame counts as speech when its energy is well above the tracked
+        noise floor, or moderately above it with a high zero-crossing rate
+        (unvoiced consonants). Speech is held open for ``hangover_ms`` after
+        the last speech frame before end of utterance is reported.
+
+        During speech the floor still creeps up by ``floor_rise_db`` per
+        second, so a step in background noise is absorbed within a few
+        seconds instead of holding the utterance open forever; pauses between
+        words pull it back down. Utterances longer than ``max_utterance_ms``
+        are ended regardless.
+
+        Args:
+            sample_rate (int): Audio sample rate in Hz
+            frame_ms (int): Analysis frame length in milliseconds
+            energy_ratio (float): Energy over noise floor that marks voiced speech
+            zcr_threshold (float): Zero-crossing rate that marks unvoiced speech
+            hangover_ms (int): Silence kept after speech before the utterance ends
+            preroll_ms (int): Audio kept before speech onset
+            min_rms (float): Lower bound on the noise floor, in int16 RMS units
+            floor_adapt (float): Noise floor smoothing factor for non-speech frames
+            floor_rise_db (float): Noise floor rise during speech, in dB per second
+            max_utterance_ms (int): Longest utterance before end of utterance is forced
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.energy_ratio = energy_ratio
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_floor = min_rms * min_rms
+        self.floor_adapt = floor_adapt
+        self.floor_rise = 10 ** (floor_rise_db / 10 * frame_ms / 1000)
+        self.max_utterance_frames = max(1, max_utterance_ms // frame_ms)
+
+        self.noise_floor = None
+        self.in_speech = False
+        self._hangover = 0
+        self._utterance_frames = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._preroll = deque(maxlen=max(0, preroll_ms // frame_ms))
+
+    def reset(self) -> None:
+        """Forget utterance state but keep the learned noise floor."""
+        self.in_speech = False
+        self._hangover = 0
+        self._utterance_frames = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._preroll.clear()
+
+    def frame_features(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute per-frame energy and zero-crossing rate.
+
+        Args:
+            audio (np.ndarray): int16 samples, a whole number of frames long
+
+        Returns:
+            tuple: (mean-square energy, zero-crossing rate) arrays, one value per frame
+        """
+        frames = audio.reshape(-1, self.frame_len).astype(np.float32)
+        energy = np.mean(frames * frames, axis=1)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_len - 1)
+        return energy, zcr
+
+    def process(self, audio_data: bytes) -> Tuple[bytes, bool]:
+        """Filter a chunk of audio down to its speech frames.
+
+        Args:
+            audio_data (bytes): 16-bit mono PCM
+
+        Returns:
+            tuple: (speech audio, True if an utterance ended in this chunk)
+        """
+        audio = np.frombuffer(audio_data, dtype=np.int16)
+        if len(self._pending):
+            audio = np.concatenate([self._pending, audio])
+        n_frames = len(audio) // self.frame_len
+        self._pending = audio[n_frames * self.frame_len:].copy()
+        if n_frames == 0:
+            return b"", False
+
+        audio = audio[:n_frames * self.frame_len]
+        energy, zcr = self.frame_features(audio)
+        if self.noise_floor is None:
+            self.noise_floor = max(float(np.min(energy)), self.min_floor)
+
+        keep = np.zeros(n_frames, dtype=bool)
+        end_of_utterance = False
+        for i in range(n_frames):
+            threshold = self.noise_floor * self.energy_ratio
+            speech = energy[i] > threshold or (
+                energy[i] > np.sqrt(self.energy_ratio) * self.noise_floor
+                and zcr[i] > self.zcr_threshold)
+
+            if speech:
+                self._hangover = self.hangover_frames
+                if not self.in_speech:
+                    self.in_speech = True
+                    self._utterance_frames = 0
+                    logging.debug("VAD: speech started")
+                # Creep up so a louder background cannot pass for speech indefinitely
+                self.noise_floor = min(self.noise_floor * self.floor_rise, float(energy[i]))
+            else:
+                # Outside speech the floor falls fast and rises slowly
+                if energy[i] < self.noise_floor:
+                    self.noise_floor = max(float(energy[i]), self.min_floor)
+                else:
+                    self.noise_floor += self.floor_adapt * (float(energy[i]) - self.noise_floor)
+
+                if self.in_speech:
+                    self._hangover -= 1
+                    if self._hangover <= 0:
+                        self.in_speech = False
+                        end_of_utterance = True
+                        logging.debug("VAD: end of utterance")
+
+            keep[i] = speech or self.in_speech
+            if self.in_speech:
+                self._utterance_frames += 1
+                if self._utterance_frames >= self.max_utterance_frames:
+                    self.in_speech = False
+                    self._hangover = 0
+                    end_of_utterance = True
+                    logging.debug("VAD: utterance too long, ending it")
+
+        frames = audio.reshape(n_frames, self.frame_len)
+        out = []
+        for i in range(n_frames):
+            if keep[i]:
+                # Prepend the frames just before onset so word starts are not clipped
+                out.extend(self._preroll)
+                self._preroll.clear()
+                out.append(frames[i])
+            elif self._preroll.maxlen:
+                self._preroll.append(frames[i])
+        return b"".join(out), end_of_utterance
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+
+def segment_confidence(words: List[dict]) -> float:
+    """Mean word confidence of a recognized segment (1.0 when it has no word data)."""
+    if not words:
+        return 1.0
+    return sum(word.get("conf", 1.0) for word in words) / len(words)
+
+def keep_result(result: dict, min_confidence: float = 0.0) -> bool:
+    """Whether a final result passes the confidence filter."""
+    return not min_confidence or segment_confidence(result.get("words", [])) >= min_confidence
+
+def transcript_text(results: List[dict], min_confidence: float = 0.0) -> str:
+    """Join the text of final results that pass the confidence filter."""
+    return " ".join(r["text"] for r in results
+                    if r.get("type", "final") == "final" and r["text"]
+                    and keep_result(r, min_confidence))
+
+class WordWriter:
+    def __init__(self, path: Path, fmt: Optional[str] = None):
+        """Stream word timings and confidences to a sidecar file while decoding.
+
+        ``jsonl`` writes one line per segment with its time span, mean
+        confidence, text and a ``words`` array of ``[word, start, end, conf]``.
+        ``tsv`` writes one row per word: segment index, start, end,
+        confidence and word. Times are in seconds from the start of the
+        audio. Each segment is flushed as soon as it is written, so the
+        sidecar can be indexed without another pass over the audio.
+
+        Args:
+            path (Path): Sidecar file to create
+            fmt (str): "jsonl" or "tsv" (default: from the file suffix, else jsonl)
+        """
+        self.path = Path(path)
+        self.fmt = fmt or ("tsv" if self.path.suffix.lower() == ".tsv" else "jsonl")
+        if self.fmt not in ("jsonl", "tsv"):
+            raise ValueError(f"Unknown word sidecar format: {self.fmt}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.segments = 0
+        self._file = open(self.path, "w", encoding="utf-8")
+        if self.fmt == "tsv":
+            self._file.write("segment\tstart\tend\tconf\tword\n")
+
+    def write(self, result: dict) -> None:
+        """Append one final recognition result; partial results are ignored."""
+        if result.get("type", "final") != "final" or not result["text"]:
+            return
+        words = result.get("words", [])
+        if self.fmt == "tsv":
+            for word in words:
+                self._file.write(f"{self.segments}\t{word['start']:.2f}\t{word['end']:.2f}\t"
+                                 f"{word.get('conf', 1.0):.3f}\t{word['word']}\n")
+        else:
+            record = {
+                "start": round(words[0]["start"], 2) if words else None,
+                "end": round(words[-1]["end"], 2) if words else None,
+                "conf": round(segment_confidence(words), 3),
+                "text": result["text"],
+                "words": [[w["word"], round(w["start"], 2), round(w["end"], 2),
+                           round(w.get("conf", 1.0), 3)] for w in words],
+            }
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.segments += 1
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "WordWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
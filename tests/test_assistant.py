@@ -1,34 +1,72 @@
+import asyncio
+import json
+import logging
+import struct
+import threading
+import time
+import wave
 import pytest
+import numpy as np
 from pathlib import Path
 from src.main import AIAssistant
 from src.stt import SpeechToText
 from src.mic import MicrophoneHandler
+from src.batch import (BatchWriter, LongFileTranscriber, collect_inputs, input_root,
+                       merge_segments, plan_segments)
+from src.ringbuffer import RingBuffer
+from src.vad import VoiceActivityDetector
+from src.nlp import SentenceChunker
+from src.cache import ResponseCache, TranscriptCache
+from src.audio import NoiseSuppressor, StreamResampler, open_wav, pcm_to_float, read_normalized
+from src.metrics import Metrics
+from src.config import Config
+from src.words import WordWriter, transcript_text
+from src.server import TranscriptionServer
+from src.nlp import NLPHandler
+from src.scheduler import BatchScheduler
+from benchmarks.tiny_lm import build_tiny_lm
+
 
 @pytest.fixture
 def assistant():
     return AIAssistant()
 
+
 @pytest.fixture
 def test_wav():
     return Path("tests/data/test.wav")
 
+
+@pytest.fixture(scope="session")
+def tiny_lm(tmp_path_factory):
+    return build_tiny_lm(tmp_path_factory.mktemp("tiny_lm"))
+
+
 def test_assistant_initialization(assistant):
     assert assistant.mic is not None
     assert assistant.stt is not None
     assert assistant.nlp is not None
     assert assistant.tts is not None
 
+
+def test_components_load_lazily():
+    assistant = AIAssistant()
+    assert not any(assistant.is_loaded(name) for name in ("mic", "stt", "nlp", "tts"))
+
+
 def test_transcribe_file(assistant, test_wav, tmp_path):
     output_file = tmp_path / "transcription.txt"
     assistant.transcribe_file(test_wav, output_file)
     assert output_file.exists()
     assert output_file.read_text().strip() != ""
 
+
 def test_invalid_audio_format():
     with pytest.raises(ValueError):
         stt = SpeechToText()
         stt.transcribe_wav("tests/data/invalid.mp3")
 
+
 def test_microphone_recording(tmp_path):
     mic = MicrophoneHandler()
     output_file = tmp_path / "recording.wav"
@@ -42,4 +80,873 @@ def test_microphone_recording(tmp_path):
         assert output_file.exists()
         assert output_file.stat().st_size > 0
     finally:
-        mic.stop_recording()  # Ensure cleanup
\ No newline at end of file
+        mic.stop_recording()  # Ensure cleanup
+
+
+def test_collect_inputs(tmp_path):
+    (tmp_path / "a.wav").write_bytes(b"")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.WAV").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("skip")
+
+    assert [p.name for p in collect_inputs(tmp_path)] == ["a.wav", "b.WAV"]
+    assert [p.name for p in collect_inputs(tmp_path / "*.wav")] == ["a.wav"]
+    assert input_root(tmp_path / "**" / "*.wav") == tmp_path
+
+
+def test_batch_writer_mirrors_input_tree_and_rewrites_jsonl(tmp_path):
+    source = tmp_path / "in"
+    for name in ("a/x.wav", "b/x.wav"):
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(b"")
+    files = collect_inputs(source)
+
+    writer = BatchWriter(tmp_path / "out", input_root(source))
+    for i, wav_file in enumerate(files):
+        writer.write(str(wav_file), f"text {i}")
+    assert (tmp_path / "out" / "a" / "x.txt").read_text() == "text 0"
+    assert (tmp_path / "out" / "b" / "x.txt").read_text() == "text 1"
+
+    for _ in range(2):
+        writer = BatchWriter(tmp_path / "out.jsonl", input_root(source))
+        writer.write(str(files[0]), "text 0")
+        writer.close()
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 1
+
+
+def test_merge_segments_drops_overlap_duplicates():
+    rate = 16000
+    segments = [(0, 30 * rate), (29 * rate, 60 * rate)]
+    results = [
+        [{"word": "hello", "start": 28.0, "end": 28.4}, {"word": "there", "start": 29.1, "end": 29.6}],
+        [{"word": "there", "start": 29.1, "end": 29.6}, {"word": "friend", "start": 30.0, "end": 30.4}],
+    ]
+    merged = merge_segments(segments, results, rate)
+    assert " ".join(seg["text"] for seg in merged) == "hello there friend"
+    assert merged[1]["start"] == 29.5
+
+
+def test_ring_buffer_wraps_and_reports_overruns():
+    buffer = RingBuffer(8)
+    buffer.write(np.arange(6, dtype=np.int16).tobytes())
+    buffer.advance(4)
+    buffer.write(np.arange(6, 12, dtype=np.int16))
+
+    views = buffer.peek()
+    assert len(views) == 2
+    assert np.concatenate(views).tolist() == [4, 5, 6, 7, 8, 9, 10, 11]
+
+    buffer.write(np.array([12, 13], dtype=np.int16))
+    assert buffer.overruns == 2
+    assert np.frombuffer(buffer.read_bytes(), dtype=np.int16).tolist() == [4, 5, 6, 7, 8, 9, 10, 11]
+    assert buffer.available() == 0
+
+
+def test_plan_segments_handles_short_windows_and_large_overlaps(tmp_path):
+    rate = 16000
+    rng = np.random.default_rng(0)
+    path = tmp_path / "long.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes((rng.standard_normal(10 * rate) * 1000).astype(np.int16).tobytes())
+
+    # A window shorter than the silence search span
+    segments = plan_segments(str(path), window=3.0)
+    assert segments[0][0] == 0 and segments[-1][1] == 10 * rate
+    assert all(start < end <= start + 4 * rate for start, end in segments)
+
+    # Overlaps that would stop fixed windows moving forward are rejected
+    with pytest.raises(ValueError, match="overlap"):
+        plan_segments(str(path), window=2.0, overlap=2.0, split_on_silence=False)
+    with pytest.raises(ValueError, match="overlap"):
+        LongFileTranscriber(window=2.0, overlap=2.0)
+    with pytest.raises(ValueError, match="segment_overlap"):
+        Config(segment_window=2.0, segment_overlap=2.0)
+
+
+def test_vad_drops_silence_and_marks_end_of_utterance():
+    rate = 16000
+    rng = np.random.default_rng(0)
+    noise = (rng.standard_normal(rate) * 100).astype(np.int16)
+    tone = (np.sin(2 * np.pi * 200 * np.arange(rate) / rate) * 6000).astype(np.int16)
+    audio = np.concatenate([noise, tone, noise]).tobytes()
+
+    vad = VoiceActivityDetector(sample_rate=rate)
+    kept, ended = 0, 0
+    for i in range(0, len(audio), 2048):
+        speech, end_of_utterance = vad.process(audio[i:i + 2048])
+        kept += len(speech) // 2
+        ended += end_of_utterance
+
+    assert rate <= kept < 1.6 * rate
+    assert ended == 1
+
+
+def test_vad_closes_after_background_noise_step():
+    rate = 16000
+    rng = np.random.default_rng(0)
+    # No speech: the background gets 12 dB louder and stays there
+    audio = np.concatenate([rng.standard_normal(2 * rate) * 100,
+                            rng.standard_normal(24 * rate) * 400]).astype(np.int16).tobytes()
+
+    vad = VoiceActivityDetector(sample_rate=rate)
+    kept, ends = 0, []
+    for i in range(0, len(audio), 2048):
+        speech, end_of_utterance = vad.process(audio[i:i + 2048])
+        kept += len(speech) // 2
+        if end_of_utterance:
+            ends.append(i / 2 / rate)
+
+    # Closed by the adapting floor, well before the utterance cap
+    assert ends and ends[0] < 10
+    assert not vad.in_speech
+    assert kept < 6 * rate
+
+
+def test_sentence_chunker_emits_complete_sentences():
+    chunker = SentenceChunker()
+    sentences = []
+    for piece in ["Sure. ", "The weather is ni", "ce today. Want a fore", "cast"]:
+        sentences += chunker.feed(piece)
+    assert sentences == ["Sure. The weather is nice today."]
+    assert chunker.flush() == ["Want a forecast"]
+
+
+def test_response_cache_normalizes_and_persists(tmp_path):
+    path = tmp_path / "responses.json"
+    cache = ResponseCache(max_entries=2, path=path)
+    cache.put("What time is it?", [], "It is noon.")
+    assert cache.get("what time is it", []) == "It is noon."
+    assert cache.get("what time is it", [{"role": "user", "content": "hi"}]) is None
+    cache.put("stop", [], "Stopping.")
+    cache.put("repeat that", [], "Sure.")
+    assert cache.get("what time is it", []) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 1)
+
+    cache.save()
+    assert ResponseCache(path=path).get("Stop.", []) == "Stopping."
+
+
+def test_transcript_cache_keys_on_content_and_checkpoints_segments(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    cache = TranscriptCache(tmp_path / "t.sqlite")
+    key = cache.key(audio, "long", "model", 16000)
+    cache.put_segment(key, 0, [{"word": "hi"}])
+    cache.close()
+
+    cache = TranscriptCache(tmp_path / "t.sqlite")
+    assert cache.segments(key) == {0: [{"word": "hi"}]}
+    assert cache.get(key) is None
+    cache.put(key, ["done"])
+    assert cache.get(key) == ["done"]
+    assert cache.segments(key) == {}
+    assert cache.key(audio, "long", "other-model", 16000) != key
+    audio.write_bytes(b"RIFF" + b"\1" * 100)
+    assert cache.key(audio, "long", "model", 16000) != key
+
+
+def test_config_profiles_load_and_reach_components(tmp_path):
+    settings = tmp_path / "config.json"
+    settings.write_text(json.dumps({"profile": "low-latency", "max_new_tokens": 64}))
+    config = Config.load(settings)
+    assert config.decoding == "greedy" and config.chunk_size == 512
+    assert config.max_new_tokens == 64
+
+    config.save(tmp_path / "saved.json")
+    assert Config.load(tmp_path / "saved.json") == config
+    with pytest.raises(ValueError):
+        config.replace(chunk=1)
+    with pytest.raises(ValueError, match="stable_ms"):
+        config.replace(stable_ms=config.vad_hangover_ms)
+
+    assistant = AIAssistant(config, file_chunk_frames=8000)
+    assert assistant._component_args["mic"]["chunk_size"] == 512
+    assert assistant._component_args["stt"]["chunk_frames"] == 8000
+    assert assistant._component_args["nlp"]["max_new_tokens"] == 64
+
+    low_memory = AIAssistant(Config.profile("low-memory"), denoise_gain_floor=0.2)
+    assert low_memory.response_cache.ttl == 600.0
+    assert low_memory._component_args["tts"]["cache_max_bytes"] == 16 << 20
+    assert low_memory._component_args["mic"]["noise_floor"] == 0.2
+
+
+def test_transcript_key_tracks_denoise_settings(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"audio")
+    keys = set()
+    for settings in ({}, {"denoise": True}, {"denoise": True, "denoise_gain_floor": 0.3}):
+        assistant = AIAssistant(transcript_cache_path=tmp_path / "transcripts.sqlite", **settings)
+        keys.add(assistant._transcript_key(audio, "file"))
+        assistant.transcript_cache.close()
+    assert len(keys) == 3
+
+
+def test_word_sidecar_streams_timings_and_filters_low_confidence(tmp_path):
+    results = [
+        {"type": "final", "text": "good morning", "words": [
+            {"word": "good", "start": 0.1, "end": 0.4, "conf": 0.95},
+            {"word": "morning", "start": 0.4, "end": 0.9, "conf": 0.85}]},
+        {"type": "final", "text": "uh", "words": [
+            {"word": "uh", "start": 1.0, "end": 1.2, "conf": 0.2}]},
+    ]
+    assert transcript_text(results) == "good morning uh"
+    assert transcript_text(results, min_confidence=0.5) == "good morning"
+
+    with WordWriter(tmp_path / "words.tsv") as words:
+        words.write(results[0])
+        assert (tmp_path / "words.tsv").read_text().splitlines()[1] == "0\t0.10\t0.40\t0.950\tgood"
+    with WordWriter(tmp_path / "words.jsonl") as words:
+        words.write(results[0])
+    record = json.loads((tmp_path / "words.jsonl").read_text())
+    assert record["conf"] == 0.9 and record["words"][1] == ["morning", 0.4, 0.9, 0.85]
+
+
+def test_stream_resampler_is_chunk_invariant():
+    audio = np.sin(np.arange(44100) * 2 * np.pi * 440 / 44100).astype(np.float32)
+    whole = StreamResampler(44100, 16000).process(audio)
+    resampler = StreamResampler(44100, 16000)
+    chunked = np.concatenate([resampler.process(audio[i:i + 1234]) for i in range(0, len(audio), 1234)])
+    assert len(whole) == 16000
+    assert np.allclose(whole, chunked, atol=1e-5)
+
+    samples = np.array([-8388608, 0, 4194304], dtype=np.int32)
+    packed = samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    assert np.allclose(pcm_to_float(packed, 3), [-1.0, 0.0, 0.5])
+
+
+def test_extensible_24bit_stereo_wav_is_read_and_normalized(tmp_path):
+    rate, channels = 48000, 2
+    tone = np.sin(2 * np.pi * 440 * np.arange(rate) / rate) * 0.5
+    samples = np.repeat((tone * 8388607).astype(np.int32), channels)
+    data = samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    # WAVE_FORMAT_EXTENSIBLE header with the PCM SubFormat GUID
+    fmt = struct.pack("<HHIIHHHHI", 0xFFFE, channels, rate, rate * channels * 3, channels * 3, 24,
+                      22, 24, 0x3) + bytes.fromhex("0100000000001000800000aa00389b71")
+    path = tmp_path / "extensible.wav"
+    path.write_bytes(b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE"
+                     + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+                     + b"data" + struct.pack("<I", len(data)) + data)
+
+    with pytest.raises(wave.Error):
+        wave.open(str(path), "rb")
+    with open_wav(path) as wf:
+        assert (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) == (2, 3, 48000)
+        assert wf.getnframes() == rate
+        audio = np.frombuffer(b"".join(read_normalized(wf, 16000)), dtype=np.int16)
+    assert abs(len(audio) - 16000) <= 1
+    assert 0.45 < np.abs(audio[1000:-1000]).max() / 32768 < 0.55
+
+
+def test_noise_suppressor_attenuates_steady_noise():
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 300, 16000 * 3).astype(np.int16)
+    suppressor = NoiseSuppressor()
+    out = b"".join(suppressor.stream(noise[i:i + 1000].tobytes() for i in range(0, len(noise), 1000)))
+    out = np.frombuffer(out, dtype=np.int16).astype(np.float32)
+    assert len(out) == len(noise)
+    assert np.sqrt(np.mean(out[16000:] ** 2)) < 0.5 * np.sqrt(np.mean(noise[16000:].astype(np.float32) ** 2))
+
+
+def test_noise_suppressor_skips_leading_digital_silence():
+    rng = np.random.default_rng(0)
+    noise = np.concatenate([np.zeros(4000), rng.normal(0, 300, 16000 * 3)]).astype(np.int16)
+    suppressor = NoiseSuppressor()
+    out = b"".join(suppressor.stream(noise[i:i + 1000].tobytes() for i in range(0, len(noise), 1000)))
+    out = np.frombuffer(out, dtype=np.int16).astype(np.float32)
+    assert not out[:4000].any()
+    assert np.sqrt(np.mean(out[20000:] ** 2)) < 0.5 * np.sqrt(np.mean(noise[20000:].astype(np.float32) ** 2))
+
+
+def test_metrics_histograms_export_prometheus_text():
+    registry = Metrics()
+    for value in (0.002, 0.03, 0.04, 0.5):
+        registry.observe("stage_seconds", value)
+    assert 0.025 <= registry.histogram("stage_seconds").quantile(0.5) <= 0.05
+    text = registry.prometheus_text()
+    assert 'stage_seconds_bucket{le="0.05"} 3' in text
+    assert 'stage_seconds_bucket{le="+Inf"} 4' in text
+    assert "stage_seconds_count 4" in text
+
+
+class _CountingRecognizer:
+    """Recognizer stand-in: reports how many bytes it has heard."""
+
+    def __init__(self):
+        self.heard = 0
+
+    def SetPartialWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        self.heard += len(data)
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": f"{self.heard} bytes"})
+
+    def FinalResult(self):
+        return json.dumps({"text": f"{self.heard} bytes"})
+
+
+class _CountingPool:
+    sample_rate = 16000
+
+    def acquire(self):
+        return _CountingRecognizer()
+
+    def release(self, recognizer):
+        pass
+
+
+def test_transcription_server_streams_and_refuses_when_full():
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import InvalidStatus
+
+    async def scenario():
+        server = TranscriptionServer(_CountingPool(), workers=2, max_sessions=1)
+        listener = await server.start("127.0.0.1", 0)
+        url = f"ws://127.0.0.1:{listener.sockets[0].getsockname()[1]}"
+        try:
+            async with connect(url) as websocket:
+                with pytest.raises(InvalidStatus):
+                    async with connect(url):
+                        pass
+                for _ in range(3):
+                    await websocket.send(b"\0" * 3200)
+                await websocket.send(json.dumps({"eof": 1}))
+                return [json.loads(message) async for message in websocket]
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+
+    results = asyncio.run(scenario())
+    assert results[-1] == {"type": "final", "text": "9600 bytes", "words": []}
+    assert all(result["type"] == "partial" for result in results[:-1])
+
+
+def test_batch_scheduler_matches_single_requests_and_skips_cancelled(tiny_lm):
+    nlp = NLPHandler(str(tiny_lm), backend="fp32", decoding="greedy", max_new_tokens=16)
+    texts = ["hi", "tell me about the weather please, what is it like today?", "repeat that"]
+    expected = []
+    for text in texts:
+        nlp.clear_history()
+        expected.append(nlp.process_input(text))
+
+    scheduler = BatchScheduler(nlp, max_batch=4, max_wait=0.5)
+    cancelled = scheduler.submit("gone", "hello")
+    assert cancelled.cancel()
+    scheduler.start()
+    try:
+        futures = [scheduler.submit(f"s{i}", text) for i, text in enumerate(texts)]
+        # Mixed prompt lengths in one left-padded batch decode like batches of one
+        assert [future.result(timeout=60) for future in futures] == expected
+        assert scheduler.stats["batches"] == 1
+        assert "gone" not in scheduler.sessions
+        assert scheduler.process_input("s0", "hi", timeout=60) is not None
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop()
+
+
+def test_assisted_decoding_requires_draft_model(tiny_lm):
+    with pytest.raises(ValueError, match="draft_model"):
+        NLPHandler(str(tiny_lm), backend="fp32", decoding="assisted")
+
+
+class _IdleMic:
+    """Microphone stand-in for driving pipeline stages by hand."""
+
+    recording = True
+
+    def get_audio(self):
+        return None
+
+    def stop_recording(self):
+        pass
+
+
+class _ScriptedNLP:
+    """Generator stand-in that echoes the text it answers, two sentences per reply."""
+
+    def __init__(self):
+        self.turns = []
+        self.last_stats = {}
+
+    def checkpoint(self):
+        return len(self.turns)
+
+    def rollback(self, checkpoint):
+        del self.turns[checkpoint:]
+
+    def stream_input(self, text, cancel_event=None):
+        self.turns.append(text)
+        yield f"You said {text}. "
+        yield "Anything else?"
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_interactive_session_logs_llm_profile_report(caplog, tmp_path):
+    from benchmarks.suite import RecordingTTS, ScriptedSTT
+
+    class ReportingNLP(_ScriptedNLP):
+        def profile_report(self):
+            return {"greedy": {"calls": 1, "mean_latency_s": 0.5, "tokens_per_s": 40.0}}
+
+    assistant = AIAssistant(response_cache_path=tmp_path / "responses.json")
+    assistant._components.update(mic=_IdleMic(), stt=ScriptedSTT([]), nlp=ReportingNLP(),
+                                 tts=RecordingTTS())
+    stop = threading.Event()
+    stop.set()
+    with caplog.at_level(logging.INFO):
+        assistant.run(warm_up=False, stop_event=stop)
+    assert "LLM profiles: {'greedy'" in caplog.text
+
+
+def test_speculative_reply_is_held_then_confirmed_or_discarded():
+    from benchmarks.suite import RecordingTTS, ScriptedSTT
+    from src.pipeline import Pipeline
+
+    stt = ScriptedSTT(["what time is it", "what time is it in tokyo"])
+    stt.partial = lambda: "what time is it"
+    nlp, tts = _ScriptedNLP(), RecordingTTS()
+    pipeline = Pipeline(_IdleMic(), stt, nlp, tts, VoiceActivityDetector(),
+                        speculative=True, stable_ms=0)
+    pipeline.start()
+    try:
+        def final(text):
+            utterance = {"capture_s": 0.0, "stt": {}, "end": time.perf_counter(), "tts_s": 0.0}
+            if not pipeline._confirm_speculation(text, utterance):
+                pipeline._put("text", (pipeline.epoch, text, None, utterance))
+
+        # Stable partial: the reply is generated but held until the final text
+        for _ in range(2):
+            pipeline._watch_partial([])
+        _wait_for(lambda: nlp.turns == ["what time is it"])
+        time.sleep(0.1)
+        assert tts.spoken == [] and not pipeline.busy()
+        final(stt.finalize())
+        _wait_for(lambda: len(tts.spoken) == 2)
+        assert [text for _, text in tts.spoken] == ["You said what time is it.", "Anything else?"]
+
+        # Different final text: the speculative turn is rolled back and the final answered
+        tts.spoken.clear()
+        for _ in range(2):
+            pipeline._watch_partial([])
+        _wait_for(lambda: len(nlp.turns) == 2)
+        final(stt.finalize())
+        _wait_for(lambda: len(tts.spoken) == 2)
+        assert tts.spoken[0][1] == "You said what time is it in tokyo."
+        assert nlp.turns == ["what time is it", "what time is it in tokyo"]
+        assert pipeline.speculation_stats == {"started": 2, "confirmed": 1, "rejected": 1}
+    finally:
+        pipeline.stop()
+
+
+def test_kv_cache_reuse_keeps_greedy_output_across_window_slide(tiny_lm):
+    texts = ["hello there", "what time is it?", "tell me about the weather.",
+             "repeat that please.", "hello there", "what time is it?"]
+
+    def converse(reuse_cache):
+        nlp = NLPHandler(str(tiny_lm), backend="fp32", decoding="greedy", max_new_tokens=12)
+        nlp.reuse_cache = reuse_cache
+        # A small window so the history slides part way through
+        nlp.memory.max_context = 120
+        reused = []
+        reuse = nlp._reuse_cache
+
+        def spy(input_ids):
+            past = reuse(input_ids)
+            reused.append(0 if past is None else past[0][0].shape[2])
+            return past
+
+        nlp._reuse_cache = spy
+        return [nlp.process_input(text) for text in texts], reused, nlp.memory._start
+
+    with_cache, reused, start = converse(True)
+    without_cache, _, _ = converse(False)
+    assert with_cache == without_cache
+    assert start > 0
+    # The cached prefix grows turn by turn, then shrinks when the window slides
+    assert reused[1] > 0 and reused[2] > reused[1]
+    assert min(reused[3:]) < max(reused)
+
+
+def test_conversation_memory_slides_to_three_quarters_of_budget(tiny_lm):
+    from transformers import AutoTokenizer
+    from src.memory import ConversationMemory
+
+    tokenizer = AutoTokenizer.from_pretrained(str(tiny_lm))
+    memory = ConversationMemory(tokenizer, max_context=120, reserve=20)
+    assert memory.dtype == np.uint16
+    for i in range(10):
+        memory.add_user(f"tell me about the weather number {i}")
+        memory.add_assistant("The weather is sunny with a light breeze.")
+    assert all(ids.dtype == np.uint16 for _, _, ids in memory.turns)
+
+    prompt = memory.build()
+    kept = sum(len(ids) for _, _, ids in memory.turns[memory._start:])
+    assert memory._start > 0 and kept <= memory.budget * 3 // 4
+    assert len(prompt) <= memory.max_context - memory.reserve
+    assert prompt[-len(memory.assistant_prefix):] == memory.assistant_prefix.tolist()
+
+    # The slack left by the slide absorbs the next turn without moving the window again
+    start = memory._start
+    memory.add_user("hi")
+    memory.build()
+    assert memory._start == start
+
+    class LargeVocabulary:
+        """The tiny tokenizer, reporting a vocabulary too big for uint16."""
+        eos_token_id, pad_token_id = tokenizer.eos_token_id, tokenizer.pad_token_id
+
+        def __len__(self):
+            return 70000
+
+        def __call__(self, text, **kwargs):
+            return tokenizer(text, **kwargs)
+
+    memory = ConversationMemory(LargeVocabulary())
+    memory.add_user("hello")
+    assert memory.dtype == np.int32 and memory.turns[0][2].dtype == np.int32
+
+
+class _EndlessNLP(_ScriptedNLP):
+    """Generator stand-in that keeps talking until it is cancelled."""
+
+    def __init__(self):
+        super().__init__()
+        self.stopped = threading.Event()
+
+    def stream_input(self, text, cancel_event=None):
+        self.turns.append(text)
+        try:
+            yield f"You said {text}. "
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not cancel_event.is_set():
+                time.sleep(0.01)
+                yield "and more "
+        finally:
+            self.stopped.set()
+
+
+def test_barge_in_cancels_reply_and_drops_stale_epochs():
+    from benchmarks.suite import RecordingTTS, ScriptedSTT
+    from src.pipeline import Pipeline
+
+    rate = 16000
+    rng = np.random.default_rng(0)
+    quiet = (rng.standard_normal(rate // 2) * 100).astype(np.int16).tobytes()
+    speech = (np.sin(2 * np.pi * 200 * np.arange(rate // 2) / rate) * 6000).astype(np.int16).tobytes()
+    nlp, tts = _EndlessNLP(), RecordingTTS()
+    pipeline = Pipeline(_IdleMic(), ScriptedSTT(["hello"]), nlp, tts, VoiceActivityDetector(rate))
+    pipeline.start()
+    try:
+        utterance = {"capture_s": 0.0, "stt": {}, "end": time.perf_counter(), "tts_s": 0.0}
+        pipeline._put("text", (pipeline.epoch, "hello", None, utterance))
+        _wait_for(lambda: tts.spoken)
+        assert pipeline.busy()
+
+        # The user talks over the reply
+        pipeline._put("audio", quiet)
+        pipeline._put("audio", speech)
+        _wait_for(nlp.stopped.is_set, timeout=2)
+        assert pipeline.epoch == 1
+
+        # Work queued under the old epoch is skipped by both stages
+        spoken = len(tts.spoken)
+        pipeline._put("text", (0, "stale", None, None))
+        pipeline._put("speech", (0, "Stale sentence.", None))
+        pipeline._put("text", (pipeline.epoch, "again", None, None))
+        _wait_for(lambda: "again" in nlp.turns)
+        _wait_for(lambda: len(tts.spoken) > spoken)
+        assert "stale" not in nlp.turns
+        assert [text for _, text in tts.spoken[spoken:]][0] == "You said again."
+    finally:
+        pipeline.stop()
+
+
+class _FakeVoskModel:
+    loads = 0
+
+    def __init__(self, path):
+        _FakeVoskModel.loads += 1
+
+
+class _FakeVoskRecognizer:
+    """KaldiRecognizer stand-in: a final result every 8000 bytes, partials in between."""
+
+    def __init__(self, model, sample_rate):
+        self.pending = 0
+        self.finals = 0
+        self.resets = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def SetPartialWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        self.pending += len(data)
+        return self.pending >= 8000
+
+    def Result(self):
+        self.pending = 0
+        self.finals += 1
+        return json.dumps({"text": f"phrase {self.finals}",
+                           "result": [{"word": "phrase", "start": 0.0, "end": 0.1, "conf": 1.0}]})
+
+    def PartialResult(self):
+        return json.dumps({"partial": f"{self.pending} bytes"})
+
+    def FinalResult(self):
+        text, self.pending = (f"tail {self.pending}" if self.pending else ""), 0
+        return json.dumps({"text": text})
+
+    def Reset(self):
+        self.pending = self.finals = 0
+        self.resets += 1
+
+
+@pytest.fixture
+def fake_vosk(monkeypatch):
+    import src.stt
+    monkeypatch.setattr(src.stt, "Model", _FakeVoskModel)
+    monkeypatch.setattr(src.stt, "KaldiRecognizer", _FakeVoskRecognizer)
+    monkeypatch.setattr(src.stt, "_models", {})
+    monkeypatch.setattr(src.stt, "_pools", {})
+    _FakeVoskModel.loads = 0
+
+
+def test_stt_streams_results_as_audio_arrives(fake_vosk, tmp_path):
+    stt = SpeechToText(model_path=str(tmp_path), chunk_frames=1000)
+    consumed = []
+
+    def chunks():
+        for i in range(9):
+            consumed.append(i)
+            yield b"\0" * 2000
+
+    stream = stt.stream_audio(chunks())
+    assert next(stream) == {"type": "partial", "text": "2000 bytes", "words": []}
+    first_final = next(r for r in stream if r["type"] == "final")
+    # The first final comes out after four chunks, not after the whole stream
+    assert first_final["text"] == "phrase 1" and len(consumed) == 4
+    assert [r["text"] for r in stream if r["type"] == "final"] == ["phrase 2", "tail 2000"]
+
+    path = tmp_path / "speech.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(b"\0" * 32000)
+    results = list(stt.stream_wav(str(path)))
+    assert all(r["type"] == "final" for r in results)
+    assert [r["text"] for r in results] == ["phrase 1", "phrase 2", "phrase 3", "phrase 4"]
+    assert results[0]["words"][0]["word"] == "phrase"
+
+
+def test_stt_instances_share_model_and_pool_recognizers(fake_vosk, tmp_path):
+    first = SpeechToText(model_path=str(tmp_path))
+    second = SpeechToText(model_path=str(tmp_path))
+    assert _FakeVoskModel.loads == 1
+    assert first.pool is second.pool and first.recognizer is not second.recognizer
+
+    # Concurrent streams decode on separate recognizers
+    a = first.stream_audio([b"\0" * 2000] * 4, partials=False)
+    b = second.stream_audio([b"\0" * 2000] * 4, partials=False)
+    assert next(a)["text"] == "phrase 1" and next(b)["text"] == "phrase 1"
+    assert len(first.pool._idle) == 0
+    for stream in (a, b):
+        list(stream)
+
+    # Returned recognizers are reset and handed out again
+    idle = list(first.pool._idle)
+    assert len(idle) == 2 and all(r.resets == 1 for r in idle)
+    with first.pool.recognizer() as recognizer:
+        assert recognizer in idle
+
+
+def test_streamed_reply_matches_blocking_reply_and_closes_cleanly(tiny_lm):
+    nlp = NLPHandler(str(tiny_lm), backend="fp32", decoding="greedy", max_new_tokens=24)
+    expected = nlp.process_input("tell me about the weather.")
+    nlp.clear_history()
+
+    pieces = list(nlp.stream_input("tell me about the weather."))
+    assert len(pieces) > 1
+    assert "".join(pieces).strip() == expected
+    assert nlp.conversation_history[-1] == {"role": "assistant", "content": expected}
+    chunker = SentenceChunker()
+    sentences = [s for piece in pieces for s in chunker.feed(piece)] + chunker.flush()
+    assert " ".join(sentences).split() == expected.split()
+
+    # Closing the stream early stops the generate thread and drops the unanswered turn
+    history = list(nlp.conversation_history)
+    stream = nlp.stream_input("hello there")
+    next(stream)
+    stream.close()
+    assert not any(t.name == "nlp-generate" and t.is_alive() for t in threading.enumerate())
+    assert nlp.conversation_history == history
+
+    # So does cancelling it, as barge-in does
+    cancel = threading.Event()
+    stream = nlp.stream_input("hello there", cancel_event=cancel)
+    next(stream)
+    cancel.set()
+    list(stream)
+    assert nlp.conversation_history == history
+
+
+def test_stop_on_text_waits_for_every_row(tiny_lm):
+    import torch
+    from transformers import AutoTokenizer
+    from src.nlp import StopOnText
+
+    tokenizer = AutoTokenizer.from_pretrained(str(tiny_lm))
+    prompt = tokenizer("Assistant:")["input_ids"]
+    stopped = tokenizer(" Sure.\nHuman:")["input_ids"]
+    talking = tokenizer(" The weather is")["input_ids"]
+    filler = tokenizer(" a")["input_ids"]
+    width = max(len(stopped), len(talking))
+    rows = [prompt + filler * (width - len(ids)) + ids for ids in (stopped, talking)]
+    criteria = StopOnText(tokenizer, len(prompt), ("Human:",))
+
+    assert not criteria(torch.tensor(rows), None)
+    assert criteria.done == [True, False]
+    # The second row ends with end-of-sequence; the first stays stopped
+    rows = [rows[0] + filler, rows[1] + [tokenizer.eos_token_id]]
+    assert criteria(torch.tensor(rows), None)
+
+
+class _FakeEngine:
+    """pyttsx3 engine stand-in; ``gate`` holds runAndWait until stop()."""
+
+    def __init__(self):
+        self.said = []
+        self.rendered = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._pending = None
+
+    def setProperty(self, name, value):
+        pass
+
+    def getProperty(self, name):
+        return []
+
+    def say(self, text):
+        self._pending = (text, None)
+
+    def save_to_file(self, text, path):
+        self._pending = (text, path)
+
+    def runAndWait(self):
+        self.gate.wait(5)
+        text, path = self._pending
+        if path is None:
+            self.said.append(text)
+            return
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(b"\0" * 3200)
+        self.rendered.append(text)
+
+    def stop(self):
+        self.gate.set()
+
+
+class _FakeAudio:
+    """PyAudio stand-in that counts bytes played."""
+
+    def __init__(self):
+        self.played = 0
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, **kwargs):
+        audio = self
+
+        class Stream:
+            def write(self, data):
+                audio.played += len(data)
+
+            def stop_stream(self):
+                pass
+
+            def close(self):
+                pass
+
+        return Stream()
+
+    def terminate(self):
+        pass
+
+
+def test_tts_worker_plays_from_cache_and_stops_cleanly(monkeypatch, tmp_path):
+    import src.tts
+    from src.tts import TextToSpeech
+
+    engine = _FakeEngine()
+    monkeypatch.setattr(src.tts.pyttsx3, "init", lambda: engine)
+    tts = TextToSpeech(cache_dir=str(tmp_path / "tts"))
+    tts._audio = _FakeAudio()
+
+    tts.speak("Hello there.", wait=True)
+    tts.speak("Hello there.", wait=True)
+    assert engine.rendered == ["Hello there."]
+    assert tts.cache.stats()["hits"] == 1 and tts._audio.played == 2 * 3200
+
+    # Stop drops queued text and never caches the interrupted rendering
+    engine.gate.clear()
+    first = tts.speak("One.")
+    _wait_for(tts.busy)
+    queued = [tts.speak("Two."), tts.speak("Three.")]
+    tts.stop()
+    assert all(done.is_set() for done in queued)
+    assert first.wait(5)
+    assert engine.rendered == ["Hello there."]
+    assert tts.cache.stats()["files"] == 1
+
+    tts.close()
+    assert not tts._thread.is_alive() and tts._audio is None
+
+
+def test_audio_cache_evicts_least_recent_and_survives_restart(tmp_path):
+    from src.cache import AudioCache
+
+    (tmp_path / "stale.tmp.wav").write_bytes(b"\0")
+    cache = AudioCache(tmp_path, max_bytes=250)
+    assert not (tmp_path / "stale.tmp.wav").exists()
+    for name in ("a", "b", "c"):
+        rendered = cache.temp_path(name)
+        rendered.write_bytes(b"\0" * 100)
+        cache.put(name, rendered)
+        if name == "b":
+            time.sleep(0.01)
+            assert cache.get("a") is not None
+    # "a" was used after it was stored, so "b" is the oldest
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    restarted = AudioCache(tmp_path, max_bytes=250)
+    assert restarted.get("c") is not None and restarted.stats()["files"] == 2
+
+
+def test_batch_workers_denoise_like_file_mode(fake_vosk, monkeypatch, tmp_path):
+    import src.batch
+
+    monkeypatch.setattr(src.batch, "_worker_stt", None)
+    src.batch._init_worker(str(tmp_path), 16000, 1000, True, 0.2)
+    assert src.batch._worker_stt.denoise and src.batch._worker_stt.noise_floor == 0.2